@@ -0,0 +1,182 @@
+"""
+Benchmarks the pipeline stages on synthetic fleets of different sizes.
+
+For every fleet size a workspace with its own config/, data/ and out/ folder is created. The
+pipeline scripts are run there as separate processes, so wall time and peak memory (RSS) of every
+stage are measured independently. The results are written as JSON and can be compared against an
+earlier result file to catch regressions.
+
+Example:
+    python benchmarks/run_benchmarks.py --cars 100 1000 --points-per-car 200 --compare baseline.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import yaml  # noqa: E402
+
+from src.synthetic_fleet import write_fleet_csv  # noqa: E402
+
+FLEET_FILENAME = "synthetic_fleet.csv"
+INGEST_CODE = ("import sys; from src.dataloader import build_cache, load_data; "
+               "build_cache(sys.argv[1]); load_data(sys.argv[1])")
+ML_PREPARE_CODE = "import machine_learning; machine_learning.prepare()"
+STAGES = ['ingest', 'separate_singles', 'seperate_singles_2', 'main', 'ml_prepare']
+
+
+def stage_command(stage: str, workers: int) -> list:
+    csv_path = os.path.join("data", FLEET_FILENAME)
+    commands = {
+        'ingest': ["-c", INGEST_CODE, csv_path],
+        'separate_singles': [os.path.join(REPO_ROOT, "separate_singles.py"), "--workers", str(workers)],
+        'seperate_singles_2': [os.path.join(REPO_ROOT, "seperate_singles_2.py"), "--workers", str(workers)],
+        'main': [os.path.join(REPO_ROOT, "main.py")],
+        'ml_prepare': ["-c", ML_PREPARE_CODE],
+    }
+    return [sys.executable] + commands[stage]
+
+
+def create_workspace(folder: str, car_count: int, points_per_car: int, seed: int) -> int:
+    """
+    Creates a workspace with the repository configs and a synthetic fleet as input file.
+
+    Returns:
+        int: The number of rows of the fleet.
+    """
+    shutil.copytree(os.path.join(REPO_ROOT, "config"), os.path.join(folder, "config"))
+    with open(os.path.join(folder, "config", "config.yaml"), 'w') as file:
+        yaml.dump({'input_folder': "data", 'output_folder': "out"}, file)
+    with open(os.path.join(folder, "config", "DataDownloader.yaml"), 'w') as file:
+        yaml.dump({'data_url': [f"synthetic://{FLEET_FILENAME}"], 'enable_auto_download': False}, file)
+    os.makedirs(os.path.join(folder, "out"))
+    with open(os.path.join(folder, "config", "seperate_singles.yaml")) as file:
+        time_threshold = yaml.safe_load(file).get("time_threshold", 300)
+    return write_fleet_csv(os.path.join(folder, "data", FLEET_FILENAME), car_count, points_per_car,
+                           time_threshold, seed)
+
+
+def run_stage(command: list, workspace: str) -> dict:
+    """
+    Runs one stage as child process and measures its wall time and peak RSS.
+    The peak RSS is only available where os.wait4 exists (Linux, macOS).
+    """
+    environment = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with open(os.path.join(workspace, "benchmark.log"), 'a') as log:
+        started = time.perf_counter()
+        process = subprocess.Popen(command, cwd=workspace, env=environment, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+            peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        else:
+            returncode, peak_rss = process.wait(), None
+        seconds = time.perf_counter() - started
+    return {'seconds': round(seconds, 4), 'peak_rss_mb': None if peak_rss is None else round(peak_rss / 2 ** 20, 1),
+            'returncode': returncode}
+
+
+def run_benchmarks(car_counts: list, points_per_car: int, stages: list, workers: int, repeat: int,
+                   seed: int, keep: bool) -> list:
+    results = []
+    for car_count in car_counts:
+        workspace = tempfile.mkdtemp(prefix=f"benchmark_{car_count}_")
+        row_count = create_workspace(workspace, car_count, points_per_car, seed)
+        print(f"{car_count} cars, {row_count} rows: {workspace}")
+        for stage in stages:
+            if stage == 'ml_prepare' and importlib.util.find_spec("tensorflow") is None:
+                print(f"  {stage}: skipped, TensorFlow is not installed")
+                continue
+            if stage == 'ingest':
+                shutil.rmtree(os.path.join(workspace, "data", FLEET_FILENAME + ".cache"), ignore_errors=True)
+            runs = [run_stage(stage_command(stage, workers), workspace) for _ in range(repeat)]
+            result = {
+                'stage': stage, 'cars': car_count, 'rows': row_count, 'workers': workers,
+                'seconds': sorted(run['seconds'] for run in runs)[len(runs) // 2],
+                'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None),
+                                   default=None),
+                'returncode': max(run['returncode'] for run in runs),
+            }
+            results.append(result)
+            print(f"  {stage}: {result['seconds']:.2f}s, {result['peak_rss_mb']} MB"
+                  + ("" if result['returncode'] == 0 else f", FAILED (see {workspace}/benchmark.log)"))
+        if not keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+    return results
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> bool:
+    """
+    Compares the results against a baseline result file.
+
+    Returns:
+        bool: True if no stage got slower or needs more memory than the tolerance allows.
+    """
+    with open(baseline_path) as file:
+        baseline = {(result['stage'], result['rows']): result for result in json.load(file)['results']}
+    passed = True
+    for result in results:
+        reference = baseline.get((result['stage'], result['rows']))
+        if reference is None:
+            continue
+        for metric in ['seconds', 'peak_rss_mb']:
+            if not result[metric] or not reference[metric]:
+                continue
+            ratio = result[metric] / reference[metric]
+            if ratio > 1 + tolerance:
+                passed = False
+                print(f"Regression {result['stage']} ({result['rows']} rows): {metric} "
+                      f"{reference[metric]} -> {result[metric]} ({ratio:.2f}x)")
+    return passed
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarkt die Pipeline auf synthetischen Flottendaten.")
+    parser.add_argument("--cars", type=int, nargs="+", default=[100, 1000], help="Anzahl Autos je Flottengröße")
+    parser.add_argument("--points-per-car", type=int, default=200, help="Mittlere Anzahl Punkte je Auto")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Zu messende Schritte")
+    parser.add_argument("--workers", type=int, default=1, help="Prozesse für die Segmentierung")
+    parser.add_argument("--repeat", type=int, default=1, help="Wiederholungen je Schritt (Median der Zeit)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed der synthetischen Daten")
+    parser.add_argument("--output", default=None, help="Ergebnisdatei (JSON)")
+    parser.add_argument("--compare", default=None, help="Ergebnisdatei, gegen die verglichen wird")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Erlaubte Verschlechterung beim Vergleich")
+    parser.add_argument("--keep", action="store_true", help="Arbeitsverzeichnisse nicht löschen")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.cars, args.points_per_car, args.stages, args.workers, args.repeat, args.seed,
+                             args.keep)
+    created = datetime.now()
+    output_path = args.output or os.path.join(REPO_ROOT, "benchmarks", "results",
+                                              f"benchmark_{created:%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump({'created': created.isoformat(timespec='seconds'), 'commit': git_commit(),
+                   'python': platform.python_version(), 'platform': platform.platform(),
+                   'points_per_car': args.points_per_car, 'seed': args.seed, 'results': results}, file, indent=2)
+    print(f"Results written to {output_path}")
+
+    failed = any(result['returncode'] != 0 for result in results)
+    if args.compare is not None and not compare(results, args.compare, args.tolerance):
+        failed = True
+    sys.exit(1 if failed else 0)
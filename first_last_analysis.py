@@ -1,12 +1,15 @@
+import argparse
 import os
-from datetime import datetime
-
-import pandas as pd
+import numpy as np
 import folium
 import itertools
 
 from src.ConfigManager.config_store import ConfigStoreManager
 from src.datadownloader import DataDownloader
+from src.dataloader import ID_CATEGORIES
+from src.instrumentation import Progress, run_report
+from src.spatial_index import DEFAULT_CELL_SIZE, add_query_arguments, query_columns
+from src.trip_summary import summarize_points
 
 
 # Funktion, um unterschiedliche Farben zu generieren
@@ -20,71 +23,81 @@ def get_colors(num_colors):
     return list(itertools.islice(itertools.cycle(colors), num_colors))
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Zeigt Start- und Endpunkt jedes Autos auf einer Karte.")
+    add_query_arguments(parser)
+    args = parser.parse_args()
+
     config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
     # Konfigurations- und Dateipfade (Beispielwerte)
     BASE_INPUT_FOLDER = config_store["input_folder"]
     BASE_OUTPUT_FOLDER = config_store["output_folder"]
-    input_file = DataDownloader().filenames[0]
-
-    # Laden der CSV-Daten in einen DataFrame
-    input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
-    data = pd.read_csv(input_file_path)
-
-    # Erstellen einer Karte zentriert um den durchschnittlichen Breiten- und Längengrad
-    map_center = [data['lat'].mean(), data['lon'].mean()]
-    car_map = folium.Map(location=map_center, zoom_start=12)
-
-    # Farben für jedes Auto generieren
-    unique_cars = data['id'].unique()
-    car_colors = get_colors(len(unique_cars))
-    color_dict = dict(zip(unique_cars, car_colors))
-
-    max_cars = 999999999
-    # Iterieren über jede Car_ID und deren Punkte
-    for car_id, group in data.groupby('id'):
-        color = color_dict[car_id]
-        first_point = group.iloc[0]
-        last_point = group.iloc[-1]
-
-        # Hinzufügen der Anfangs- und Endpunkte
-        folium.CircleMarker(
-            location=[first_point['lat'], first_point['lon']],
-            radius=5,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=1,
-            popup=f'Start: Car ID {car_id}, Time: {first_point["timestamp"]}'
-        ).add_to(car_map)
-
-        folium.CircleMarker(
-            location=[last_point['lat'], last_point['lon']],
-            radius=5,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=1,
-            popup=f'Ende: Car ID {car_id}, Time: {last_point["timestamp"]}'
-        ).add_to(car_map)
-
-
-        start_time = first_point['timestamp']
-        format_string = "%Y-%m-%dT%H:%M:%S.000Z"
-        start_time = datetime.strptime(start_time, format_string)
-
-        end_time =  last_point['timestamp']
-        end_time = datetime.strptime(end_time, format_string)
-
-        time_diff = end_time - start_time
-
-        # Verbindungslinie zwischen den Punkten zeichnen
-        line_points = [[first_point['lat'], first_point['lon']], [last_point['lat'], last_point['lon']]]
-        #line_points = [group[['lat', 'lon']].values.tolist()]
-        folium.PolyLine(line_points, color=color, weight=2.5, opacity=1).add_to(car_map)
-        max_cars = max_cars - 1
-        if max_cars < 0:
-            break
-
-    # Speichern der Karte als HTML-Datei
-    html_path = os.path.join(BASE_OUTPUT_FOLDER, "car_start_and_end.html")
-    car_map.save(html_path)
\ No newline at end of file
+    # Gleiche Zellgröße wie main.py, damit beide Skripte denselben gecachten Index verwenden
+    map_config_store = ConfigStoreManager.add("map", "config/map.yaml")
+    with run_report("first_last_analysis") as report:
+        with report.stage("download"):
+            input_file = DataDownloader().filenames[0]
+
+        # Laden der gecachten Spalten der CSV-Daten
+        input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
+        # Nur die Punkte im angefragten Bereich und Zeitfenster werden geladen
+        with report.stage("load") as record:
+            data = query_columns(input_file_path, args.bbox, args.start, args.end,
+                                 map_config_store.get("index_cell_size", DEFAULT_CELL_SIZE))
+            record.add(len(data['id']))
+        if len(data['id']) == 0:
+            raise SystemExit("No data points in the queried area and time window.")
+
+        # Start- und Endpunkt sowie Dauer und Strecke je Auto in einem Schritt statt einer Schleife über die Gruppen
+        car_codes = np.asarray(data['id'])
+        car_starts = np.flatnonzero(np.append(True, car_codes[1:] != car_codes[:-1]))
+        with report.stage("summarize", len(car_starts)):
+            cars = summarize_points(data, car_starts)
+            cars.insert(0, 'id', data[ID_CATEGORIES][car_codes[car_starts]])
+
+        # Erstellen einer Karte zentriert um den durchschnittlichen Breiten- und Längengrad
+        map_center = [float(np.mean(data['lat'])), float(np.mean(data['lon']))]
+        car_map = folium.Map(location=map_center, zoom_start=12)
+
+        # Farben für jedes Auto generieren
+        car_colors = get_colors(len(cars))
+
+        max_cars = 999999999
+        progress = Progress("Autos", len(cars))
+        # Iterieren über jedes Auto
+        with report.stage("render", len(cars)):
+            for car, color in zip(cars.itertuples(index=False), car_colors):
+                # Hinzufügen der Anfangs- und Endpunkte
+                folium.CircleMarker(
+                    location=[car.start_lat, car.start_lon],
+                    radius=5,
+                    color=color,
+                    fill=True,
+                    fill_color=color,
+                    fill_opacity=1,
+                    popup=f'Start: Car ID {car.id}, Time: {car.start_time}'
+                ).add_to(car_map)
+
+                folium.CircleMarker(
+                    location=[car.end_lat, car.end_lon],
+                    radius=5,
+                    color=color,
+                    fill=True,
+                    fill_color=color,
+                    fill_opacity=1,
+                    popup=f'Ende: Car ID {car.id}, Time: {car.end_time}, Dauer: {car.duration_s} s, '
+                          f'Strecke: {car.distance_m:.0f} m'
+                ).add_to(car_map)
+
+                # Verbindungslinie zwischen den Punkten zeichnen
+                line_points = [[car.start_lat, car.start_lon], [car.end_lat, car.end_lon]]
+                folium.PolyLine(line_points, color=color, weight=2.5, opacity=1).add_to(car_map)
+                progress.update()
+                max_cars = max_cars - 1
+                if max_cars < 0:
+                    break
+            progress.close()
+
+        # Speichern der Karte als HTML-Datei
+        html_path = os.path.join(BASE_OUTPUT_FOLDER, "car_start_and_end.html")
+        with report.stage("write"):
+            car_map.save(html_path)
\ No newline at end of file
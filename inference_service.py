@@ -0,0 +1,174 @@
+import argparse
+import json
+import sys
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.coordtools import CoordTools
+from src.inference import MicroBatcher, TripClassifier
+from src.numpy_predictor import TFLITE_FILES, WEIGHTS_FILE, NumpyPredictor
+from src.resampling import Resampling
+
+inference_config_store = ConfigStoreManager.add("inference", "config/inference.yaml")
+
+
+def load_tensorflow_predictor(window):
+    # imported here, so the service only pulls in TensorFlow when it is actually used
+    from machine_learning import checkpoint_path, create_model
+    from src.windowing import FEATURE_COLUMNS
+
+    model = create_model()
+    model.build((None, window - 1, len(FEATURE_COLUMNS)))
+    model.load_weights(checkpoint_path).expect_partial()
+    return lambda windows: model.predict_on_batch(windows)
+
+
+def load_tflite_predictor(model_path):
+    # the standalone tflite_runtime package is much smaller than TensorFlow, use it if installed
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+
+    interpreter = Interpreter(model_path=model_path)
+    input_detail = interpreter.get_input_details()[0]
+    output_detail = interpreter.get_output_details()[0]
+    lock = threading.Lock()
+
+    def predict(windows):
+        with lock:
+            interpreter.resize_tensor_input(input_detail['index'], windows.shape)
+            interpreter.allocate_tensors()
+            interpreter.set_tensor(input_detail['index'], windows.astype(input_detail['dtype']))
+            interpreter.invoke()
+            return interpreter.get_tensor(output_detail['index'])
+
+    return predict
+
+
+def load_predictor(backend, window, output_folder):
+    if backend == "numpy":
+        return NumpyPredictor.load(f"{output_folder}/{WEIGHTS_FILE}")
+    if backend in ("float16", "int8"):
+        return load_tflite_predictor(f"{output_folder}/{TFLITE_FILES[backend]}")
+    if backend == "tensorflow":
+        return load_tensorflow_predictor(window)
+    raise ValueError(f"Unknown backend: {backend}")
+
+
+def parse_trip(line):
+    trip = json.loads(line)
+    if 'points' not in trip:
+        raise ValueError("A trip needs a 'points' list.")
+    return trip
+
+
+def serve_stdin(batcher):
+    # results are written in input order, while reading continues in the background
+    futures = []
+    ready = threading.Condition()
+    done = []
+
+    def write_results():
+        written = 0
+        while True:
+            with ready:
+                ready.wait_for(lambda: written < len(futures) or done)
+                if written == len(futures):
+                    return
+                future = futures[written]
+            try:
+                result = future.result()
+            except Exception as exc:
+                result = {'error': str(exc)}
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+            written += 1
+
+    writer = threading.Thread(target=write_results)
+    writer.start()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            future = batcher.submit(parse_trip(line))
+        except ValueError as exc:
+            future = Future()
+            future.set_exception(exc)
+        with ready:
+            futures.append(future)
+            ready.notify()
+    with ready:
+        done.append(True)
+        ready.notify()
+    writer.join()
+    print(json.dumps(batcher.latency_report()), file=sys.stderr)
+
+
+def serve_http(batcher, host, port):
+    class RequestHandler(BaseHTTPRequestHandler):
+        def _send_json_lines(self, status, lines):
+            body = "".join(json.dumps(line) + "\n" for line in lines).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json_lines(200, [batcher.latency_report()])
+            else:
+                self._send_json_lines(404, [{'error': "unknown path"}])
+
+        def do_POST(self):
+            if self.path != "/classify":
+                self._send_json_lines(404, [{'error': "unknown path"}])
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            try:
+                futures = [batcher.submit(parse_trip(line)) for line in body.splitlines() if line.strip()]
+            except ValueError as exc:
+                self._send_json_lines(400, [{'error': str(exc)}])
+                return
+            self._send_json_lines(200, [future.result() for future in futures])
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    print(f"Serving trip classification on http://{host}:{port}/classify")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(batcher.latency_report()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Klassifiziert Fahrten mit dem trainierten Modell.")
+    parser.add_argument("--http", action="store_true", help="HTTP Schnittstelle statt stdin/stdout (JSONL)")
+    args = parser.parse_args()
+
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    ml_config_store = ConfigStoreManager.add("machine_learning", "config/machine_learning.yaml")
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
+
+    window = ml_config_store.get("window_size", 5)
+    backend = inference_config_store.get("backend", "numpy")
+    classifier = TripClassifier(load_predictor(backend, window, BASE_OUTPUT_FOLDER),
+                                CoordTools.load(f"{BASE_OUTPUT_FOLDER}/normalization.json"),
+                                window, ml_config_store.get("window_stride", 1),
+                                Resampling.from_config(ml_config_store))
+    batcher = MicroBatcher(classifier.classify, inference_config_store.get("max_batch_size", 256),
+                           inference_config_store.get("max_latency_ms", 10) / 1000)
+
+    if args.http:
+        serve_http(batcher, inference_config_store.get("host", "127.0.0.1"), inference_config_store.get("port", 8080))
+    else:
+        serve_stdin(batcher)
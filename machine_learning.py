@@ -4,41 +4,40 @@ import pandas as pd
 import tensorflow as tf
 
 from src.ConfigManager.config_store import ConfigStoreManager
+from src.coordtools import CoordTools
+from src.instrumentation import run_report
+from src.model_export import export_model
+from src.resampling import Resampling
+from src.trip_dataset import data_extent, make_dataset, trip_numbers_of
+from src.trip_split import SPLITS, TripSplit
+from src.trip_store import TripStore, get_store_path, is_store_current
+from src.trips import TripCollection
+from src.windowing import FEATURE_COLUMNS, collection_features, sliding_windows, window_inputs, window_targets
 
 config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+ml_config_store = ConfigStoreManager.add("machine_learning", "config/machine_learning.yaml")
 
 BASE_OUTPUT_FOLDER = config_store["output_folder"]
 
 checkpoint_path = './checkpoints/ui_poc'
+normalization_path = f"{BASE_OUTPUT_FOLDER}/normalization.json"
 
 
 def prepare():
     print(f"TensorFlow version = {tf.__version__}\n")
     BASE_OUTPUT_FOLDER = config_store["output_folder"]
 
-    df = pd.read_csv(f"{BASE_OUTPUT_FOLDER}/single_data.csv")
-    grouped = df.groupby('Fahrtnummer', sort=False)
-
-    min_lat = df['lat'].min()
-    min_lon = df['lon'].min()
-    max_lat = df['lat'].max()
-    max_lon = df['lon'].max()
-
-    inputs = []
-    outputs = []
-
-    drives = []  # yes, its a stupid intermediary copy
-    for _, drive_entry in grouped:
-        drive = []
-        for i in range(len(drive_entry)):
-            dp = drive_entry.iloc[i]
-            through_traffic = 0
-            if (dp['Typ'] == 'durch'):
-                through_traffic = 1
-            drive.append(
-                [(float(dp['lat']) - min_lat) / (max_lat - min_lat), (float(dp['lon']) - min_lon) / (max_lon - min_lon),
-                 float(dp['heading']), float(dp['speed']), float(through_traffic)])
-        drives.append(drive)
+    trip_file = f"{BASE_OUTPUT_FOLDER}/single_data.csv"
+    # resampled trips give windows of a fixed time span or distance, independent of the sampling rate
+    resampling = Resampling.from_config(ml_config_store)
+    # the trips share contiguous point columns, the binary trip store is memory mapped without copying
+    trips = TripCollection.from_store(TripStore(get_store_path(trip_file))) if is_store_current(trip_file) \
+        else TripCollection.from_frame(pd.read_csv(trip_file))
+    # the extent used for normalizing is saved, so the inference service normalizes the same way
+    coord_tools = CoordTools(trips.points, 0)
+    coord_tools.save(normalization_path)
+    features, trip_starts = collection_features(trips, coord_tools, resampling)
+    trip_numbers = trips.numbers
 
     # Set a fixed random seed value, for reproducibility, this will allow us to get
     # the same random numbers each time the notebook is run
@@ -46,38 +45,40 @@ def prepare():
     np.random.seed(SEED)
     tf.random.set_seed(SEED)
 
-    inputs = []
-    outputs = []
+    window = ml_config_store.get("window_size", 5)
+    stride = ml_config_store.get("window_stride", 1)
+    windows, starts = sliding_windows(features, trip_starts, window, stride)
 
-    window = 5
-    for drive in drives:
-        tensor = []
-        # for i in range(0, len(drive) - window + 1, window):  # segmenting window
-        for i in range(0, len(drive) - window + 1, 1):  # sliding window
-            inputs.append(drive[i:i + window][:-1])
-            outputs.append(drive[0][-1])
-
-    inputs = np.array(inputs).astype('float32')
-    outputs = np.array(outputs).astype('float32').reshape((-1, 1))
+    # the windows are views until here, selecting them copies them into the input array;
+    # the through traffic flag is the target, so it is cut off the inputs
+    inputs = window_inputs(windows, starts)
+    outputs = window_targets(features, starts)
+    window_trips = trip_numbers[np.searchsorted(trip_starts, starts, side='right') - 1]
 
     print("Data set parsing and preparation complete.")
-    return inputs, outputs
+    return inputs, outputs, window_trips
 
 
-def train(inputs, outputs):
-    # https://stackoverflow.com/a/37710486/2020087
-    num_inputs = len(inputs)
-    randomize = np.arange(num_inputs)
-    np.random.shuffle(randomize)
+def load_trip_split(trip_numbers):
+    # The split is persisted, so later runs and evaluations use the same trips for testing
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
+    return TripSplit.load_or_create(f"{BASE_OUTPUT_FOLDER}/trip_split.npz", trip_numbers,
+                                    ml_config_store.get("split_seed", 191285461),
+                                    ml_config_store.get("split_fractions", [0.6, 0.2, 0.2]))
 
-    inputs = inputs[randomize]
-    outputs = outputs[randomize]
 
-    TRAIN_SPLIT = int(0.6 * num_inputs)
-    TEST_SPLIT = int(0.2 * num_inputs + TRAIN_SPLIT)
+def train(inputs, outputs, window_trips):
+    # whole trips are assigned to one split, so overlapping windows of a trip can not leak into the test data
+    trip_split = load_trip_split(np.unique(window_trips))
+    split_codes = trip_split.split_of(window_trips)
+    train_indices, test_indices, validate_indices = [np.flatnonzero(split_codes == code)
+                                                     for code in range(len(SPLITS))]
+    np.random.shuffle(train_indices)
 
-    inputs_train, inputs_test, inputs_validate = np.split(inputs, [TRAIN_SPLIT, TEST_SPLIT])
-    outputs_train, outputs_test, outputs_validate = np.split(outputs, [TRAIN_SPLIT, TEST_SPLIT])
+    inputs_train, inputs_test, inputs_validate = [inputs[indices] for indices in
+                                                  (train_indices, test_indices, validate_indices)]
+    outputs_train, outputs_test, outputs_validate = [outputs[indices] for indices in
+                                                     (train_indices, test_indices, validate_indices)]
 
     print("Data set randomization and splitting complete.")
     # callback = tf.keras.callbacks.EarlyStopping(monitor='loss', patience=5)
@@ -91,8 +92,41 @@ def train(inputs, outputs):
     print("Data set training complete.")
 
 
+def train_streaming():
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
+    trip_file = f"{BASE_OUTPUT_FOLDER}/single_data.csv"
+    chunk_size = ml_config_store.get("chunk_size", 100000)
+
+    # Normalize with the extent of the trips like prepare(), the inference service loads the saved extent,
+    # so both training modes give models with the same input scaling
+    coord_tools = data_extent(trip_file, chunk_size)
+    coord_tools.save(normalization_path)
+    trip_split = load_trip_split(trip_numbers_of(trip_file, chunk_size))
+
+    SEED = 191285461
+    np.random.seed(SEED)
+    tf.random.set_seed(SEED)
+
+    cache_path = f"{BASE_OUTPUT_FOLDER}/window_cache" if ml_config_store.get("cache_windows", False) else None
+    datasets = {split: make_dataset(trip_file, split, trip_split, ml_config_store.get("window_size", 5),
+                                    ml_config_store.get("window_stride", 1), coord_tools,
+                                    batch_size=ml_config_store.get("batch_size", 32),
+                                    shuffle_buffer=ml_config_store.get("shuffle_buffer", 10000),
+                                    chunk_size=chunk_size, cache_path=cache_path, seed=SEED,
+                                    resampling=Resampling.from_config(ml_config_store))
+                for split in SPLITS}
+
+    model = create_model()
+    history = model.fit(datasets['train'], epochs=10, validation_data=datasets['validate'])
+    model.save_weights(checkpoint_path)
+    model.summary()
+    return model, datasets['test']
+
+
 def create_model():
     model = tf.keras.Sequential()
+    # the inputs are all but the last point of a window with the point features, without the through traffic flag
+    model.add(tf.keras.Input(shape=(ml_config_store.get("window_size", 5) - 1, len(FEATURE_COLUMNS))))
     model.add(tf.keras.layers.Flatten())
     model.add(tf.keras.layers.Dense(100, activation='relu'))
     model.add(tf.keras.layers.Dense(50, activation='relu'))
@@ -120,16 +154,37 @@ def run(model, inputs_test, outputs_test):
 inputs = []
 outputs = []
 
-if __name__ == '__main__':
-    inputs, outputs = prepare()
-    model, inputs_test, outputs_test = train(inputs, outputs)
-    # model = create_model()
-    # model.load_weights(checkpoint_path)
-    run(model, inputs_test, outputs_test)
+if __name__ == '__main__' and ml_config_store.get("streaming", False):
+    with run_report("machine_learning") as report:
+        with report.stage("train"):
+            model, test_dataset = train_streaming()
+        with report.stage("evaluate"):
+            model.evaluate(test_dataset)
+        with report.stage("export"):
+            # a few test batches calibrate the value ranges of the int8 model
+            test_batches = [batch for batch, _ in test_dataset.take(10).as_numpy_iterator()]
+            representative_windows = np.concatenate(test_batches)[:ml_config_store.get(
+                "representative_windows", 500)] if test_batches else None
+            print("Exported:", export_model(model, BASE_OUTPUT_FOLDER, representative_windows))
+elif __name__ == '__main__':
+    with run_report("machine_learning") as report:
+        with report.stage("prepare") as record:
+            inputs, outputs, window_trips = prepare()
+            record.add(len(inputs))
+        with report.stage("train", len(inputs)):
+            model, inputs_test, outputs_test = train(inputs, outputs, window_trips)
+        with report.stage("export"):
+            # without test windows (e.g. few trips) the int8 ranges are calibrated on all windows
+            representative_windows = inputs_test if len(inputs_test) > 0 else inputs
+            print("Exported:", export_model(model, BASE_OUTPUT_FOLDER,
+                                            representative_windows[:ml_config_store.get("representative_windows",
+                                                                                        500)]))
+        # model = create_model()
+        # model.load_weights(checkpoint_path)
+        with report.stage("evaluate", len(inputs_test)):
+            run(model, inputs_test, outputs_test)
     while True:
         i = int(input())
         print("Input: ", inputs[i:i + 1])
         print("Prediction:", model.predict(inputs[i:i + 1]))
         print("Actual:", outputs[i])
-
-
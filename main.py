@@ -1,75 +1,57 @@
 # This is a sample Python script.
+import argparse
 import os.path
 
 from src.ConfigManager.config_store import ConfigStoreManager
 from src.datadownloader import DataDownloader
-from src import  setup
+from src.grid_aggregation import aggregate_grid, add_grid_layer, add_heatmap_layer
+from src.instrumentation import run_report
+from src.setup import run_setup
+from src.spatial_index import DEFAULT_CELL_SIZE, add_query_arguments, query_columns
 
-import pandas as pd
 import folium
-import itertools
-
-
-
-
-# Function to generate distinct colors
-def get_colors(num_colors):
-    colors = [
-        "red", "blue", "green", "purple", "orange", "darkred",
-        "lightred", "beige", "darkblue", "darkgreen", "cadetblue",
-        "darkpurple", "white", "pink", "lightblue", "lightgreen",
-        "gray", "black", "lightgray"
-    ]
-    return list(itertools.islice(itertools.cycle(colors), num_colors))
-
-
 
 
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Erstellt eine Karte der Fahrzeugpositionen.")
+    add_query_arguments(parser)
+    args = parser.parse_args()
+
+    run_setup()
     config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
     BASE_INPUT_FOLDER = config_store["input_folder"]
     BASE_OUTPUT_FOLDER = config_store["output_folder"]
-    input_file = DataDownloader().filenames[0]
-    # Load the CSV data into a DataFrame
-    input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
-    data = pd.read_csv(input_file_path)
-
-    # Create a map centered around the average latitude and longitude
-    map_center = [data['lat'].mean(), data['lon'].mean()]
-    car_map = folium.Map(location=map_center, zoom_start=12)
-
-    # Generate colors for each car
-    car_colors = get_colors(len(data['id'].unique()))
-
-    # Iterate over each data point
-    map_center = [data['lat'].mean(), data['lon'].mean()]
-    car_map = folium.Map(location=map_center, zoom_start=12)
-
-    # Generate colors for each car
-    unique_cars = data['id'].unique()
-    car_colors = get_colors(len(unique_cars))
-    color_dict = dict(zip(unique_cars, car_colors))
-
-    # Group by car ID and plot each car's points
-    cars_amount = len(data.groupby('id'))
-    i = 0
-    for car_id, group in data.groupby('id'):
-        color = color_dict[car_id]
-        for _, row in group.iterrows():
-            folium.CircleMarker(
-                location=[row['lat'], row['lon']],
-                radius=3,
-                color=color,
-                fill=True,
-                fill_color=color,
-                fill_opacity=0.7,
-                popup=f'Car ID: {car_id}, Time: {row["timestamp"]}'
-            ).add_to(car_map)
-        print(f" {i} / {cars_amount} done.")
-        i += 1
-        if i > 6:
-            break
-    # Save the map to an HTML file
-    html_path = os.path.join(BASE_OUTPUT_FOLDER,"car_positions_map.html")
-    car_map.save(html_path)
+    map_config_store = ConfigStoreManager.add("map", "config/map.yaml")
+    with run_report("main") as report:
+        with report.stage("download"):
+            input_file = DataDownloader().filenames[0]
+        # Load the cached columns of the CSV data, restricted to the queried area and time window
+        input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
+        with report.stage("load") as record:
+            data = query_columns(input_file_path, args.bbox, args.start, args.end,
+                                 map_config_store.get("index_cell_size", DEFAULT_CELL_SIZE))
+            record.add(len(data['id']))
+        if len(data['id']) == 0:
+            raise SystemExit("No data points in the queried area and time window.")
+
+        # Create a map centered around the average latitude and longitude
+        map_center = [float(data['lat'].mean()), float(data['lon'].mean())]
+        car_map = folium.Map(location=map_center, zoom_start=12)
+
+        # Aggregate all points into grid cells instead of drawing one marker per point
+        with report.stage("aggregate", len(data['id'])):
+            grid = aggregate_grid(data['lat'], data['lon'], data['speed'],
+                                  map_config_store.get("grid_cell_size", 0.002),
+                                  map_config_store.get("max_grid_cells", 5000))
+        with report.stage("render", len(grid)):
+            add_grid_layer(car_map, grid)
+            if map_config_store.get("heatmap", True):
+                add_heatmap_layer(car_map, grid)
+            folium.LayerControl().add_to(car_map)
+        print(f"{len(grid)} grid cells created.")
+
+        # Save the map to an HTML file
+        html_path = os.path.join(BASE_OUTPUT_FOLDER,"car_positions_map.html")
+        with report.stage("write"):
+            car_map.save(html_path)
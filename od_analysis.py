@@ -0,0 +1,60 @@
+import argparse
+import os
+
+import folium
+import pandas as pd
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.instrumentation import run_report
+from src.od_matrix import DEFAULT_TIMEZONE, GridZones, PolygonZones, add_flow_layer, compute_od_matrix, top_flows
+from src.trip_store import TripStore, get_store_path, is_store_current
+from src.trips import TripCollection
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Berechnet die Quelle-Ziel-Matrix der Einzelfahrten je Tagesstunde.")
+    parser.add_argument("--trips", default="single_data.csv", help="Fahrtendatei im Ausgabeordner")
+    parser.add_argument("--zones", default=None, help="GeoJSON-Datei mit einer Zone je Feature statt des Gitters")
+    parser.add_argument("--top", type=int, default=None, help="Anzahl der stärksten Ströme auf der Karte")
+    args = parser.parse_args()
+
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    od_config_store = ConfigStoreManager.add("od_matrix", "config/od_matrix.yaml")
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
+    with run_report("od_analysis") as report:
+        # Laden der Einzelfahrten, der Fahrtenspeicher wird ohne Kopie eingeblendet
+        trip_file = os.path.join(BASE_OUTPUT_FOLDER, args.trips)
+        with report.stage("load") as record:
+            trips = TripCollection.from_store(TripStore(get_store_path(trip_file))) if is_store_current(trip_file) \
+                else TripCollection.from_frame(pd.read_csv(trip_file))
+            record.add(len(trips))
+        if len(trips) == 0:
+            raise SystemExit("No trips in the trip file.")
+
+        # Zonen aus einer GeoJSON-Datei oder Zellen eines regelmäßigen Gitters
+        zones_path = args.zones or od_config_store.get("zones", None)
+        zoning = PolygonZones.load(zones_path, od_config_store.get("zone_grid_size", 128)) if zones_path \
+            else GridZones(od_config_store.get("cell_size", 0.01))
+
+        # Alle Start- und Endpunkte werden in einem Schritt den Zonen zugeordnet und gezählt,
+        # die Tagesstunde wird in der konfigurierten Zeitzone der Daten bestimmt (Rohdaten sind UTC)
+        with report.stage("od_matrix", len(trips)):
+            matrix, zones = compute_od_matrix(trips, zoning, od_config_store.get("timezone", DEFAULT_TIMEZONE))
+        print(f"{int(matrix['trips'].sum())} / {len(trips)} Fahrten zwischen {len(zones)} Zonen, "
+              f"{len(matrix)} Einträge ungleich 0.")
+
+        with report.stage("write", len(matrix)):
+            matrix.to_csv(os.path.join(BASE_OUTPUT_FOLDER, "od_matrix.csv"), index=False)
+            zones.to_csv(os.path.join(BASE_OUTPUT_FOLDER, "od_zones.csv"), index=False)
+
+        # Die stärksten Ströme über den ganzen Tag als Linien zwischen den Zonenmittelpunkten
+        flows = top_flows(matrix, zones, args.top or od_config_store.get("top_flows", 50))
+        with report.stage("render", len(flows)):
+            map_center = [float(zones['lat'].mean()), float(zones['lon'].mean())]
+            flow_map = folium.Map(location=map_center, zoom_start=12)
+            add_flow_layer(flow_map, flows)
+            folium.LayerControl().add_to(flow_map)
+
+        # Speichern der Karte als HTML-Datei
+        html_path = os.path.join(BASE_OUTPUT_FOLDER, "od_flows.html")
+        with report.stage("write_map"):
+            flow_map.save(html_path)
@@ -0,0 +1,40 @@
+import os
+
+import folium
+import pandas as pd
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.instrumentation import run_report
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN
+from src.trip_rendering import add_trip_layers, meters_per_pixel, simplify_trips
+
+if __name__ == '__main__':
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    map_config_store = ConfigStoreManager.add("map", "config/map.yaml")
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
+
+    with run_report("render_trips") as report:
+        # Laden der extrahierten Einzelfahrten
+        with report.stage("load") as record:
+            trips = pd.read_csv(os.path.join(BASE_OUTPUT_FOLDER, "single_data.csv"),
+                                usecols=['lat', 'lon', TRIP_COLUMN, TYPE_COLUMN])
+            trips = trips.sort_values(TRIP_COLUMN, kind='stable', ignore_index=True)
+            record.add(len(trips))
+
+        # Toleranz entspricht einem Bruchteil eines Pixels auf der gewählten Zoomstufe
+        zoom_level = map_config_store.get("trip_zoom_level", 12)
+        map_center = [trips['lat'].mean(), trips['lon'].mean()]
+        tolerance = map_config_store.get("trip_pixel_tolerance", 1.0) * meters_per_pixel(zoom_level, map_center[0])
+        with report.stage("simplify", len(trips)):
+            simplified = simplify_trips(trips, tolerance, map_config_store.get("max_trip_vertices", 200000))
+        print(f"{len(simplified)} / {len(trips)} Punkte nach Vereinfachung.")
+
+        with report.stage("render", len(simplified)):
+            trip_map = folium.Map(location=map_center, zoom_start=zoom_level)
+            add_trip_layers(trip_map, simplified)
+            folium.LayerControl().add_to(trip_map)
+
+        # Speichern der Karte als HTML-Datei
+        html_path = os.path.join(BASE_OUTPUT_FOLDER, "trips_map.html")
+        with report.stage("write"):
+            trip_map.save(html_path)
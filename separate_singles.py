@@ -1,12 +1,21 @@
+import argparse
 import os
-from datetime import datetime
 
+import numpy as np
 import pandas as pd
 import folium
 import itertools
 
 from src.ConfigManager.config_store import ConfigStoreManager
+from src.cleaning import load_cleaning_rules
+from src.coordtools import CoordTools
 from src.datadownloader import DataDownloader
+from src.dataloader import load_columns, load_data, source_signature
+from src.instrumentation import run_report
+from src.regions import load_region
+from src.segmentation import segment_trips, segment_parallel, TRIP_COLUMN, TYPE_COLUMN
+from src.trip_store import TripStore, get_store_path, write_trip_store
+from src.trip_summary import write_trip_summary
 
 
 # Funktion, um unterschiedliche Farben zu generieren
@@ -20,136 +29,72 @@ def get_colors(num_colors):
     return list(itertools.islice(itertools.cycle(colors), num_colors))
 
 
-class CoordTools:
-    def __init__(self, data, quantile=0.01):
-        self.border_quantile = quantile
-        self.min_lat = data['lat'].min()
-        self.min_lon = data['lon'].min()
-        self.max_lat = data['lat'].max()
-        self.max_lon = data['lon'].max()
-        self.splat = self.max_lat - self.min_lat
-        self.splon = self.max_lon - self.min_lon
-        self.qslat = self.border_quantile * self.splat
-        self.qslon = self.border_quantile * self.splon
-        self.nthresh = self.max_lat - self.qslat  # north threshold
-        self.ethresh = self.max_lon - self.qslon  # ...
-        self.sthresh = self.min_lat + self.qslat
-        self.wthresh = self.min_lon + self.qslon
-
-        self.format_string = "%Y-%m-%dT%H:%M:%S.000Z"
-
-        # Erstellen einer Karte zentriert um den durchschnittlichen Breiten- und Längengrad
-        map_center = [data['lat'].mean(), data['lon'].mean()]
-        self.car_map = folium.Map(location=map_center, zoom_start=12)
-
-    def in_center(self, lat, lon):
-        # only expecting values according to min and max
-        return self.sthresh <= lat <= self.nthresh and self.wthresh <= lon <= self.ethresh
-
-    def at_border(self, lat, lon):
-        return not self.in_center(lat, lon)
-
-    def add_car(self, row):
-        folium.CircleMarker(
-            location=[row['lat'], row['lon']],
-            radius=5,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=1,
-            popup=""  # f'Ende: Car ID {car_id}, Time: {row["timestamp"]}'
-        ).add_to(car_map)
-
-    def to_time(self, time_string):
-        return datetime.strptime(time_string, self.format_string)
-
-    def to_typ(self, el_start, el_end):
-        start = self.in_center(float(el_start['lat']), float(el_start['lon']))
-        end = self.in_center(float(el_end['lat']), float(el_end['lon']))
-        if (start and end):
-            return "innen"
-        elif (start and not end):
-            return "raus"
-        elif (not start and end):
-            return "rein"
-        elif (not start and not end):
-            return "durch"
-
-
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extrahiert Einzelfahrten aus den Positionsdaten.")
+    parser.add_argument("--workers", type=int, default=1, help="Anzahl paralleler Prozesse für die Segmentierung")
+    args = parser.parse_args()
+
     config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
     # Konfigurations- und Dateipfade (Beispielwerte)
     BASE_INPUT_FOLDER = config_store["input_folder"]
     BASE_OUTPUT_FOLDER = config_store["output_folder"]
-    input_file = DataDownloader().filenames[0]
-
-    # Laden der CSV-Daten in einen DataFrame
-    input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
-    data = pd.read_csv(input_file_path)
+    with run_report("separate_singles") as report:
+        with report.stage("download"):
+            input_file = DataDownloader().filenames[0]
+
+        # Laden der CSV-Daten in einen DataFrame, mit mehreren Prozessen lesen die Worker ihre Zeilen selbst
+        # und hier werden die Spalten nur für Mittelbox und Kartenmitte eingeblendet
+        input_file_path = os.path.join(BASE_INPUT_FOLDER, input_file)
+        with report.stage("load") as record:
+            data = load_columns(input_file_path, mmap=True) if args.workers > 1 else load_data(input_file_path)
+            record.add(len(data['lat']))
+
+        time_threshold = 300  # in seconds
+        min_data_points = 1
+        # Die Mittelbox wird einmal berechnet und wiederverwendet, bis sich die Eingabedatei ändert
+        center_box_path = os.path.join(BASE_OUTPUT_FOLDER, "center_box.json")
+        signature = source_signature(input_file_path)
+        ct = CoordTools.load(center_box_path, signature) if os.path.exists(center_box_path) else None
+        if ct is None:
+            ct = CoordTools(data, 0.04)  # scalar for border size
+            ct.save(center_box_path, signature)
+        # Ein konfiguriertes Regionspolygon ersetzt die Mittelbox bei der Klassifizierung
+        region = load_region()
+        if region is not None:
+            ct = region
+
+        # Duplikate, GPS-Sprünge und Standpunkte werden vor der Segmentierung entfernt
+        cleaning = load_cleaning_rules()
+        with report.stage("segment", len(data['lat'])):
+            if args.workers > 1:
+                single_data: pd.DataFrame = segment_parallel(input_file_path, time_threshold, min_data_points,
+                                                             args.workers, ct, cleaning)
+            else:
+                single_data: pd.DataFrame = segment_trips(data, time_threshold, min_data_points, ct,
+                                                          cleaning=cleaning)
+        if cleaning is not None:
+            print(f"Entfernte Zeilen je Regel: {report.counters.get('cleaning', {})}")
+        # Anzahl der Fahrten je Typ
+        stats = single_data.drop_duplicates(TRIP_COLUMN)[TYPE_COLUMN].value_counts()
+
+        print(f"Innen: {stats.get('innen', 0)}, Durch: {stats.get('durch', 0)}, "
+              f"Rein: {stats.get('rein', 0)}, Raus: {stats.get('raus', 0)} ")
+        # single_data['lon'] -= ct.min_lon #for now dont normalize, so we can look at the data - maybe do it in the machinelearning part instead
+        # single_data['lat'] -= ct.min_lat
+        with report.stage("write", len(single_data)):
+            single_data_path = f"{BASE_OUTPUT_FOLDER}/single_data.csv"
+            single_data.to_csv(path_or_buf=single_data_path, index=False)
+            # Binärer Fahrtenspeicher für schnellen Zugriff auf einzelne Fahrten
+            write_trip_store(single_data, get_store_path(single_data_path))
+        # Eine Zeile mit Kennzahlen (Strecke, Dauer, Geschwindigkeit, ...) je Fahrt
+        with report.stage("summarize", single_data[TRIP_COLUMN].nunique()):
+            write_trip_summary(TripStore(get_store_path(single_data_path)), single_data_path, ct)
 
-    original_columns = data.columns.tolist()
-
-    new_columns = original_columns + ['Fahrtnummer'] + ['Typ']
-
-    single_data: pd.DataFrame = pd.DataFrame(columns=new_columns)
-
-    # Farben für jedes Auto generieren
-    unique_cars = data['id'].unique()
-    car_colors = get_colors(len(unique_cars))
-    color_dict = dict(zip(unique_cars, car_colors))
-
-    max_cars = 999999999
-    # Iterieren über jede Car_ID und deren Punkte
-    max_cars = data.nunique(0)[0]
-    car_count = 0
-    fahrt_id = 0
-    data['timestamp'] = pd.to_datetime(data['timestamp'], format="%Y-%m-%dT%H:%M:%S.000Z")
-
-    time_threshold = 300  # in seconds
-    ct = CoordTools(data, 0.04)  # scalar for border size
-    stats = {'innen': 0, 'durch': 0, 'rein': 0, 'raus': 0}
-
-    for car_id, group in data.groupby('id'):
-        # Hält den Start Datensatz der aktuellen Fahrt parat.
-        single_start_index = 0
-        group = group.sort_values('timestamp')
-
-        # setting initial start time
-        first_point = group.iloc[0]
-        prev_time = first_point['timestamp']
-        prev_time = ct.to_time(prev_time)
-
-        # for i, el in enumerate(group.iterrows()):
-        for i in range(len(group)):
-            current_timestamp = ct.to_time(group.iloc[i]['timestamp'])
-            time_diff = (current_timestamp - prev_time).seconds
-
-            if time_diff > time_threshold or i == len(group) - 1:
-                # Fahrtende erkannt. bzw. letzter Datensatz des Fahrzeugs
-                if i - single_start_index > 1:
-                    new_index_start = len(single_data)
-                    new_index_end = new_index_start + i - single_start_index
-                    single_data = single_data._append(group.iloc[single_start_index:i], ignore_index=True)
-                    typ = ct.to_typ(group.iloc[single_start_index], group.iloc[i])
-                    for j in range(new_index_start, new_index_end):
-                        single_data.loc[j, 'Fahrtnummer'] = fahrt_id
-                        single_data.loc[j, 'Typ'] = typ
-                    # single_data[new_index_start:new_index_end, 'Fahrtnummer'] = fahrt_id
-                    # print(f"Fahrtnummer: {fahrt_id}, erstellt.")
-                    fahrt_id += 1
-                single_start_index = i
-                stats[typ] += 1  # use some panda count fnc instead
-            prev_time = current_timestamp
-        car_count = car_count + 1
-        # if car_count > 5:
-        #    break
-        print(f"{car_count} / {max_cars} finished.")
-
-    print(f"Innen: {stats['innen']}, Durch: {stats['durch']}, Rein: {stats['rein']}, Raus: {stats['raus']} ")
-    # single_data['lon'] -= ct.min_lon #for now dont normalize, so we can look at the data - maybe do it in the machinelearning part instead
-    # single_data['lat'] -= ct.min_lat
-    single_data.to_csv(path_or_buf=f"{BASE_OUTPUT_FOLDER}/single_data.csv", index=False)
+        # Erstellen einer Karte zentriert um den durchschnittlichen Breiten- und Längengrad
+        with report.stage("render"):
+            map_center = [float(np.mean(data['lat'])), float(np.mean(data['lon']))]
+            car_map = folium.Map(location=map_center, zoom_start=12)
 
-    # Speichern der Karte als HTML-Datei
-    html_path = os.path.join(BASE_OUTPUT_FOLDER, "car_start_and_end.html")
-    ct.car_map.save(html_path)
+            # Speichern der Karte als HTML-Datei
+            html_path = os.path.join(BASE_OUTPUT_FOLDER, "car_start_and_end.html")
+            car_map.save(html_path)
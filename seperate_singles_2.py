@@ -1,86 +1,96 @@
+import argparse
 import os
-from typing import LiteralString
+import shutil
 
 import pandas as pd
-from pandas import Timedelta
 
 from src.ConfigManager.config_store import ConfigStoreManager
+from src.cleaning import load_cleaning_rules
 from src.datadownloader import DataDownloader
+from src.dataloader import load_data
+from src.incremental_segmentation import segment_incremental
+from src.instrumentation import run_report
+from src.segmentation import segment_trips, segment_csv_streaming, segment_parallel
+from src.regions import load_region
+from src.trip_store import TripStore, get_store_path, write_trip_store
+from src.trip_summary import write_trip_summary
 
 
 def get_prepared_input_data(file_location: str) -> None | pd.DataFrame:
-    loaded_data = load_input_data(file_location)
-    prepare_input_data(loaded_data)
-    return loaded_data
-
-
-def load_input_data(file_location: str) -> pd.DataFrame:
-    return pd.read_csv(file_location)
-
-
-def prepare_input_data(data: pd.DataFrame):
-    data['timestamp'] = pd.to_datetime(data['timestamp'], format="%Y-%m-%dT%H:%M:%S.000Z")
-
-
-def create_empty_target_data_frame(original_data: pd.DataFrame, new_columns: list = None) -> pd.DataFrame:
-    if not new_columns:
-        new_columns = []
-    original_columns: list = original_data.columns.tolist()
-    target_columns: list = original_columns + new_columns
-    return pd.DataFrame(columns=target_columns)
+    return load_data(file_location)
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extrahiert Einzelfahrten aus den Positionsdaten.")
+    parser.add_argument("--workers", type=int, default=1, help="Anzahl paralleler Prozesse für die Segmentierung")
+    parser.add_argument("--close-open-trips", action="store_true",
+                        help="Im inkrementellen Modus alle noch offenen Fahrten abschließen")
+    args = parser.parse_args()
+
     main_config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
     seperate_singles_config_store = ConfigStoreManager.add("seperate_singles", "config/seperate_singles.yaml")
     # Konfigurations- und Dateipfade (Beispielwerte)
     BASE_INPUT_FOLDER = main_config_store["input_folder"]
     BASE_OUTPUT_FOLDER = main_config_store["output_folder"]
-    # Set input file location
-    input_file = DataDownloader().filenames[0]
-
-    # Laden der CSV-Daten in einen DataFrame
-    input_file_path: str = str(os.path.join(BASE_INPUT_FOLDER, input_file))
-    data: pd.DataFrame = get_prepared_input_data(input_file_path)
-
-    # Erstellen des leeren DataFrames zur Speicherung der Einzelfahrten
-    trip_data_frame: pd.DataFrame = create_empty_target_data_frame(data, ['Fahrtnummer', 'Typ'])
-
-    time_threshold = seperate_singles_config_store["time_threshold"]
-    min_data_points = seperate_singles_config_store["min_data_points"]
-    fahrt_id = 0
-
-    count_cars =17000
-    processed_cars = 0
-    pd.options.mode.copy_on_write = False
-    pd.options.mode.chained_assignment = None
-
-    data = data.sort_values(by=['id', 'timestamp'], ascending=True)
-
-    for car_id, group in data.groupby('id', as_index=False):
-        # Get data for that car_id
-        group.reset_index(drop=True, inplace=True)
-        trip_start_index = 0
-        last_time_stamp = group['timestamp'][trip_start_index]
-        for row in group.index:
-            current_time_stamp = group['timestamp'][row]
-            time_difference: Timedelta = current_time_stamp - last_time_stamp
-            if time_difference.seconds > time_threshold or row == len(group.index) - 1:
-                count_data_points = row - trip_start_index - 1
-                # Neue Fahrt erkannt
-                if count_data_points > min_data_points:
-                    # Fahrt aus mehr als min_data_points
-                    # Damit handelt es sich um eine Fahrt die gespeichert werden muss.
-                    trip_end_index = trip_start_index + count_data_points - 1
-                    trip_data_index_start = len(trip_data_frame)
-                    trip_data_index_end = trip_end_index + count_data_points
-                    trip_data_frame = trip_data_frame._append(group.loc[trip_start_index:trip_end_index],
-                                                              ignore_index=True)
-                    trip_data_frame.loc[trip_data_index_start:trip_data_index_end, 'Fahrtnummer'] = fahrt_id
-                    fahrt_id += 1
-                trip_start_index = row
-            last_time_stamp = group['timestamp'][row]
-        processed_cars += 1
-        print(f"Processed {processed_cars} / {count_cars} Cars.")
-    trip_data_frame.sort_values(['Fahrtnummer', 'timestamp']).to_csv(path_or_buf=f"{BASE_OUTPUT_FOLDER}/single2_data.csv", index=False)
+    with run_report("seperate_singles_2") as report:
+        # Set input file location
+        with report.stage("download"):
+            input_files = DataDownloader().filenames
+        input_file = input_files[0]
+
+        input_file_path: str = str(os.path.join(BASE_INPUT_FOLDER, input_file))
+        output_file_path: str = f"{BASE_OUTPUT_FOLDER}/single2_data.csv"
+        store_path: str = get_store_path(output_file_path)
+
+        time_threshold = seperate_singles_config_store["time_threshold"]
+        min_data_points = seperate_singles_config_store["min_data_points"]
+        # Duplikate, GPS-Sprünge und Standpunkte werden vor der Segmentierung entfernt
+        cleaning = load_cleaning_rules()
+
+        if seperate_singles_config_store.get("incremental", False):
+            # Nur die seit dem letzten Lauf angehängten Daten werden verarbeitet, neue Fahrten werden angehängt
+            input_file_paths = [str(os.path.join(BASE_INPUT_FOLDER, file)) for file in input_files]
+            with report.stage("segment") as record:
+                trip_count = segment_incremental(input_file_paths, output_file_path, time_threshold,
+                                                 min_data_points, close_all=args.close_open_trips,
+                                                 store_path=store_path, cleaning=cleaning)
+                record.add(trip_count)
+            print(f"{trip_count} neue Fahrten")
+        elif seperate_singles_config_store.get("streaming", False):
+            # Blockweise Verarbeitung für Eingabedaten, die nicht in den Speicher passen
+            chunk_size = seperate_singles_config_store.get("chunk_size", 1000000)
+            shutil.rmtree(store_path, ignore_errors=True)
+            with report.stage("segment") as record:
+                record.add(segment_csv_streaming(input_file_path, output_file_path, time_threshold, min_data_points,
+                                                 chunk_size, trips_callback=lambda trips: write_trip_store(
+                                                     trips, store_path, append=True), cleaning=cleaning))
+        elif args.workers > 1:
+            with report.stage("segment") as record:
+                trip_data_frame: pd.DataFrame = segment_parallel(input_file_path, time_threshold, min_data_points,
+                                                                 args.workers, cleaning=cleaning)
+                record.add(len(trip_data_frame))
+            with report.stage("write", len(trip_data_frame)):
+                trip_data_frame.to_csv(path_or_buf=output_file_path, index=False)
+                write_trip_store(trip_data_frame, store_path)
+        else:
+            # Laden der CSV-Daten in einen DataFrame
+            with report.stage("load") as record:
+                data: pd.DataFrame = get_prepared_input_data(input_file_path)
+                record.add(len(data))
+            with report.stage("segment", len(data)):
+                trip_data_frame: pd.DataFrame = segment_trips(data, time_threshold, min_data_points,
+                                                              cleaning=cleaning)
+            with report.stage("write", len(trip_data_frame)):
+                trip_data_frame.to_csv(path_or_buf=output_file_path, index=False)
+                write_trip_store(trip_data_frame, store_path)
+        if cleaning is not None:
+            print(f"Entfernte Zeilen je Regel: {report.counters.get('cleaning', {})}")
+
+        # Eine Zeile mit Kennzahlen (Strecke, Dauer, Geschwindigkeit, ...) je Fahrt,
+        # im inkrementellen Modus werden nur die neuen Fahrten zusammengefasst und angehängt
+        if os.path.exists(store_path):
+            store = TripStore(store_path)
+            with report.stage("summarize") as record:
+                record.add(len(write_trip_summary(store, output_file_path, load_region(),
+                                                  append=seperate_singles_config_store.get("incremental", False))))
     print("finished")
@@ -1,3 +1,4 @@
+import atexit
 import yaml
 from typing import Any, Dict, Optional, Union
 import logging
@@ -6,17 +7,35 @@ import logging
 class ConfigStore:
     """
     A class to manage configuration data loaded from and saved to a YAML file.
+    The file is read lazily on first access. Values set on auto extending stores are kept
+    in memory and written back by flush(), which runs automatically at interpreter exit.
+    Defaults passed to get() are never written.
     """
 
-    def __init__(self, file_path: str, auto_extend=False):
+    def __init__(self, file_path: Optional[str], auto_extend=False, config_data: Optional[Dict[str, Any]] = None):
         """
         Initializes the ConfigStore with the file path of the YAML configuration file.
+        No file access happens until the configuration is used for the first time.
 
-        :param file_path: The path to the YAML configuration file.
+        :param file_path: The path to the YAML configuration file, or None for a purely in-memory store.
+        :param auto_extend: If True, values set through set_config_value or update are saved.
+        :param config_data: Optional configuration data to use instead of reading the file.
         """
         self.file_path = file_path
-        self.config_data: Dict[str, Any] = self.load_config()
         self.auto_extend = auto_extend
+        self._config_data: Optional[Dict[str, Any]] = config_data
+        self._dirty = False
+
+    @property
+    def config_data(self) -> Dict[str, Any]:
+        """
+        The configuration data, loaded from the YAML file on first access.
+
+        :return: A dictionary containing the configuration data.
+        """
+        if self._config_data is None:
+            self._config_data = self.load_config() if self.file_path is not None else {}
+        return self._config_data
 
     def load_config(self) -> Dict[str, Any]:
         """
@@ -27,7 +46,7 @@ class ConfigStore:
         with open(self.file_path, 'r') as file:
             try:
                 config_data = yaml.safe_load(file)
-                return config_data
+                return config_data or {}
             except yaml.YAMLError as exc:
                 logging.error(f"Error in opening configuration file at {self.file_path}: {exc}")
                 return {}
@@ -42,11 +61,6 @@ class ConfigStore:
         """
         rvalue = self.config_data.get(key, None)
         if rvalue is None:
-            default_value = self.config_data.get("default", None)
-            if default_value is not None:
-                self.config_data[key] = default
-            if self.auto_extend:
-                self.save_to_file()
             return default
         return rvalue
 
@@ -57,6 +71,7 @@ class ConfigStore:
         :param data: A dictionary containing the data to update.
         """
         self.config_data.update(data)
+        self._dirty = self._dirty or self.auto_extend
 
     def set_config_value(self, key: str, data: Any) -> None:
         """
@@ -66,6 +81,7 @@ class ConfigStore:
         :param data: The new configuration value.
         """
         self.config_data[key] = data
+        self._dirty = self._dirty or self.auto_extend
 
     def __getitem__(self, item: str) -> Any:
         """
@@ -91,6 +107,14 @@ class ConfigStore:
         """
         with open(self.file_path, 'w') as file:
             yaml.dump(self.config_data, file)
+        self._dirty = False
+
+    def flush(self) -> None:
+        """
+        Saves pending changes back to the YAML file, if there are any.
+        """
+        if self._dirty and self.file_path is not None:
+            self.save_to_file()
 
 
 class ConfigStoreManager:
@@ -119,6 +143,7 @@ class ConfigStoreManager:
         """
         Creates a new ConfigStore instance and adds it to the manager.
         If a ConfigStore of same name exists, it is returned.
+        The configuration file is not read until the store is used.
 
         :param configstore_name: The name of the new ConfigStore instance.
         :param filepath: The path to the YAML configuration file.
@@ -160,6 +185,30 @@ class ConfigStoreManager:
         else:
             logging.error(f"Error: ConfigStoreManager only accepts ConfigStore instances, not {type(value)}")
 
+    @staticmethod
+    def inject(configstore_name: str, config_data: Dict[str, Any]) -> ConfigStore:
+        """
+        Registers an in-memory ConfigStore under the given name, replacing any existing one.
+        Useful for tests and tools that should not read or write configuration files.
+
+        :param configstore_name: The name of the ConfigStore instance.
+        :param config_data: The configuration data of the store.
+        :return: The injected ConfigStore instance.
+        """
+        instance = ConfigStore(file_path=None, config_data=config_data)
+        ConfigStoreManager._instances[configstore_name] = instance
+        if configstore_name == ConfigStoreManager.MAIN_CONFIG_NAME:
+            ConfigStoreManager.main_config = instance
+        return instance
+
+    @staticmethod
+    def flush_all() -> None:
+        """
+        Saves pending changes of all managed ConfigStore instances.
+        """
+        for instance in ConfigStoreManager._instances.values():
+            instance.flush()
+
     @classmethod
     def keys(cls):
         """
@@ -175,3 +224,5 @@ if ConfigStoreManager.get_instance(ConfigStoreManager.MAIN_CONFIG_NAME) is None:
                            filepath="config/config.yaml")
     main_config: ConfigStore = ConfigStoreManager.get_instance(ConfigStoreManager.MAIN_CONFIG_NAME)
     ConfigStoreManager.main_config = main_config
+
+atexit.register(ConfigStoreManager.flush_all)
@@ -3,6 +3,9 @@ import shutil
 import subprocess
 import zipfile
 
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.setup import run_setup
+
 
 def create_temp_directory(directory_path):
     """
@@ -73,31 +76,27 @@ def main():
     Main function to execute the script.
     """
     os.chdir("../..")
+    run_setup()
 
+    source_path = "."
+    temp_path = 'temp'
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    BASE_OUTPUT_FOLDER = config_store["output_folder"]
 
+    # Initialize the base folder structur
+    create_temp_directory("temp")
 
+    # Define the list of files and folders to exclude
+    BLACKLIST = ['venv', 'data', BASE_OUTPUT_FOLDER, config_store["input_folder"], ".idea", temp_path]
+    generate_requirements_txt(".")
+    # Create temp directory and copy items
 
-if __name__ == '__main__':
-    main()
-
-import src.setup
-from src.ConfigManager.config_store import ConfigStoreManager
-
-source_path = "."
-temp_path = 'temp'
-config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
-BASE_OUTPUT_FOLDER = config_store["output_folder"]
-
-# Initialize the base folder structur
-create_temp_directory("temp")
+    copy_items(source_path, temp_path, BLACKLIST)
 
-# Define the list of files and folders to exclude
-BLACKLIST = ['venv', 'data', BASE_OUTPUT_FOLDER, config_store["input_folder"], ".idea", temp_path]
-generate_requirements_txt(".")
-# Create temp directory and copy items
+    # Creating and removing the ZIP file
+    create_zip_file(temp_path, f"{BASE_OUTPUT_FOLDER}/UC Data Explorer.zip")
+    shutil.rmtree("temp")
 
-copy_items(source_path, temp_path, BLACKLIST)
 
-# Creating and removing the ZIP file
-create_zip_file(temp_path, f"{BASE_OUTPUT_FOLDER}/UC Data Explorer.zip")
-shutil.rmtree("temp")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
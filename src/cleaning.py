@@ -0,0 +1,163 @@
+"""
+This module provides the cleaning of the raw position data before the trip segmentation.
+The rules run vectorized over data sorted by car id and timestamp and remove:
+    exact_duplicates: rows repeating id, timestamp, lat and lon of another row.
+    near_duplicates: rows within a few seconds and meters of the preceding row of the same car.
+    speed_outliers: single points (GPS jumps) whose implied speed to both neighbours exceeds the
+        maximum speed. Points at the start or end of a car are removed if they jump away from
+        an otherwise consistent track.
+    stationary: points inside a run of standing points (speed at most the stationary speed and
+        only jitter between them), only the first and last point of every run are kept.
+
+Every rule counts the rows it removed, the counts are recorded in the run report.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.coordtools import haversine
+
+RULES = ['exact_duplicates', 'near_duplicates', 'speed_outliers', 'stationary']
+# Speed outliers are searched again after removing some, a jump of several points needs several passes
+MAX_OUTLIER_PASSES = 5
+
+
+class CleaningRules:
+    """
+    A class holding the thresholds of the cleaning rules.
+
+    Attributes:
+        near_duplicate_seconds: Maximum time in seconds between near duplicates.
+        near_duplicate_meters: Maximum distance in meters between near duplicates.
+        max_speed_kmh: Maximum plausible speed between two points in km/h.
+        stationary_speed: Points with a speed up to this value count as standing.
+        stationary_meters: Maximum jitter in meters between two standing points of one run.
+    """
+
+    ATTRIBUTES = ['near_duplicate_seconds', 'near_duplicate_meters', 'max_speed_kmh', 'stationary_speed',
+                  'stationary_meters']
+
+    def __init__(self, near_duplicate_seconds: float = 1, near_duplicate_meters: float = 2,
+                 max_speed_kmh: float = 250, stationary_speed: float = 0, stationary_meters: float = 20):
+        self.near_duplicate_seconds = near_duplicate_seconds
+        self.near_duplicate_meters = near_duplicate_meters
+        self.max_speed_kmh = max_speed_kmh
+        self.stationary_speed = stationary_speed
+        self.stationary_meters = stationary_meters
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {attribute: getattr(self, attribute) for attribute in self.ATTRIBUTES}
+
+    @classmethod
+    def from_dict(cls, rules: Dict[str, Any]) -> 'CleaningRules':
+        """
+        Creates the rules from a dictionary, missing thresholds keep their default.
+
+        Parameters:
+            rules (Dict[str, Any]): Thresholds by attribute name.
+
+        Returns:
+            CleaningRules: The rules.
+        """
+        return cls(**{attribute: rules[attribute] for attribute in cls.ATTRIBUTES if rules.get(attribute) is not None})
+
+    def mask(self, car_ids: np.ndarray, seconds: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+             speed: np.ndarray) -> Tuple[np.ndarray, Dict[str, int]]:
+        """
+        Applies all rules to position data sorted by car id and timestamp.
+
+        Parameters:
+            car_ids (np.ndarray): Car id (or id code) of every data point.
+            seconds (np.ndarray): Timestamp of every data point in epoch seconds.
+            lat, lon (np.ndarray): Coordinates of every data point.
+            speed (np.ndarray): Recorded speed of every data point.
+
+        Returns:
+            Tuple[np.ndarray, Dict[str, int]]: Boolean array of the kept rows and the number of rows
+            removed by every rule.
+        """
+        car_ids, seconds = np.asarray(car_ids), np.asarray(seconds, dtype=np.int64)
+        lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        speed = np.asarray(speed, dtype=np.float64)
+        keep = ~pd.DataFrame({'id': car_ids, 'timestamp': seconds, 'lat': lat, 'lon': lon}).duplicated().to_numpy()
+        counts = {'exact_duplicates': int(len(keep) - keep.sum())}
+
+        # every following rule compares each kept row with the kept row before it
+        rows = np.flatnonzero(keep)
+        same_car, gaps, steps = _pairs(rows, car_ids, seconds, lat, lon)
+        near = same_car & (gaps <= self.near_duplicate_seconds) & (steps <= self.near_duplicate_meters)
+        keep[rows[1:][near]] = False
+        counts['near_duplicates'] = int(near.sum())
+
+        counts['speed_outliers'] = 0
+        for _ in range(MAX_OUTLIER_PASSES):
+            rows = np.flatnonzero(keep)
+            outliers = rows[self._speed_outliers(rows, car_ids, seconds, lat, lon)]
+            if len(outliers) == 0:
+                break
+            keep[outliers] = False
+            counts['speed_outliers'] += len(outliers)
+
+        rows = np.flatnonzero(keep)
+        same_car, _, steps = _pairs(rows, car_ids, seconds, lat, lon)
+        standing = speed[rows] <= self.stationary_speed
+        # a pair belongs to a run if both points stand and only jitter lies between them
+        run_pair = same_car & standing[:-1] & standing[1:] & (steps <= self.stationary_meters)
+        inside_run = np.zeros(len(rows), dtype=bool)
+        inside_run[1:-1] = run_pair[:-1] & run_pair[1:]
+        keep[rows[inside_run]] = False
+        counts['stationary'] = int(inside_run.sum())
+        return keep, counts
+
+    def _speed_outliers(self, rows: np.ndarray, car_ids: np.ndarray, seconds: np.ndarray, lat: np.ndarray,
+                        lon: np.ndarray) -> np.ndarray:
+        same_car, gaps, steps = _pairs(rows, car_ids, seconds, lat, lon)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            implied_speed = np.where(gaps > 0, steps / gaps * 3.6, np.where(steps > 0, np.inf, 0.0))
+        # fast[j]: the step from row j to row j + 1 is too fast, False at the end of a car
+        fast = np.append(same_car & (implied_speed > self.max_speed_kmh), False)
+        has_next = np.append(same_car, False)
+        has_prev = np.append(False, same_car)
+        fast_in = np.append(False, fast[:-1])
+        outliers = has_prev & has_next & fast_in & fast
+        # the first point of a car jumped if the track after the second point is consistent
+        next_consistent = np.append(has_next[1:] & ~fast[1:], False)
+        outliers |= ~has_prev & fast & next_consistent
+        previous_consistent = np.append(False, has_prev[:-1] & ~fast_in[:-1])
+        outliers |= ~has_next & fast_in & previous_consistent
+        # a correct point between two jumps looks like a jump itself, of consecutive candidates only
+        # every other one starting with the first is removed, the next pass checks the rest again
+        positions = np.arange(len(rows))
+        chain_starts = np.maximum.accumulate(np.where(outliers & ~np.append(False, outliers[:-1]), positions, 0))
+        return outliers & ((positions - chain_starts) % 2 == 0)
+
+
+def _pairs(rows: np.ndarray, car_ids: np.ndarray, seconds: np.ndarray, lat: np.ndarray,
+           lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compares every row with the row before it.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Whether both rows belong to the same car, the time gap
+        in seconds and the distance in meters, each with one entry less than rows.
+    """
+    same_car = car_ids[rows[1:]] == car_ids[rows[:-1]]
+    gaps = seconds[rows[1:]] - seconds[rows[:-1]]
+    steps = haversine(lat[rows[:-1]], lon[rows[:-1]], lat[rows[1:]], lon[rows[1:]])
+    return same_car, gaps, steps
+
+
+def load_cleaning_rules() -> Optional[CleaningRules]:
+    """
+    Loads the cleaning rules configured in config/cleaning.yaml.
+
+    Returns:
+        Optional[CleaningRules]: The rules, None if the cleaning is disabled.
+    """
+    cleaning_config_store = ConfigStoreManager.add("cleaning", "config/cleaning.yaml")
+    if not cleaning_config_store.get("enabled", False):
+        return None
+    return CleaningRules.from_dict(cleaning_config_store.config_data)
@@ -0,0 +1,177 @@
+"""
+This module provides the classification of trips by their start and end point.
+A trip starting or ending inside the center box of the covered area is classified as
+'innen' (inside only), 'raus' (outgoing), 'rein' (incoming) or 'durch' (through traffic).
+
+All methods accept scalars as well as NumPy arrays, so whole columns of start and end points
+are classified at once. The center box can be saved and loaded again to classify other files
+against the same box, or together with the signature of its source file to be rebuilt when that
+file changes.
+"""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Label of every trip type code. The code is 2 * (start in center) + (end in center).
+TYP_LABELS = np.array(['durch', 'rein', 'raus', 'innen'])
+TYP_CODES = {label: code for code, label in enumerate(TYP_LABELS)}
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine(lat0, lon0, lat1, lon1) -> np.ndarray:
+    """
+    Returns the great circle distance between two points in meters, element wise for arrays.
+    """
+    lat0, lon0, lat1, lon1 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat0, lon0, lat1, lon1))
+    a = np.sin((lat1 - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class CenterClassifier(ABC):
+    """
+    Base class of the trip classifiers. A subclass decides by in_center whether coordinates lie in
+    the center, the classification of trips by their start and end point is shared.
+    """
+
+    @abstractmethod
+    def in_center(self, lat, lon) -> np.ndarray:
+        """
+        Returns for every coordinate whether it lies in the center.
+        """
+
+    def at_border(self, lat, lon):
+        return np.logical_not(self.in_center(lat, lon))
+
+    def classify(self, start_lat, start_lon, end_lat, end_lon) -> np.ndarray:
+        """
+        Classifies trips by their start and end point.
+
+        Parameters:
+            start_lat, start_lon: Coordinates of the first point of every trip.
+            end_lat, end_lon: Coordinates of the last point of every trip.
+
+        Returns:
+            np.ndarray: The trip type code of every trip, see TYP_LABELS.
+        """
+        start = self.in_center(np.asarray(start_lat), np.asarray(start_lon))
+        end = self.in_center(np.asarray(end_lat), np.asarray(end_lon))
+        return (2 * start.astype(np.int8) + end.astype(np.int8)).astype(np.int8)
+
+    def classify_labels(self, start_lat, start_lon, end_lat, end_lon) -> np.ndarray:
+        """
+        Classifies trips by their start and end point and returns the type labels.
+
+        Parameters:
+            start_lat, start_lon, end_lat, end_lon: Same as for classify.
+
+        Returns:
+            np.ndarray: The label ('innen', 'raus', 'rein' or 'durch') of every trip.
+        """
+        return TYP_LABELS[self.classify(start_lat, start_lon, end_lat, end_lon)]
+
+    def to_typ(self, el_start, el_end):
+        return str(self.classify_labels(float(el_start['lat']), float(el_start['lon']),
+                                        float(el_end['lat']), float(el_end['lon'])))
+
+
+class CoordTools(CenterClassifier):
+    """
+    A class to classify coordinates into the center and the border area of the covered region.
+    The border is a fraction (quantile) of the lat/lon extent of the data on every side.
+
+    Attributes:
+        border_quantile: Fraction of the extent that belongs to the border area.
+        min_lat, min_lon, max_lat, max_lon: Extent of the data.
+        nthresh, ethresh, sthresh, wthresh: North, east, south and west bound of the center box.
+    """
+
+    BOX_ATTRIBUTES = ['border_quantile', 'min_lat', 'min_lon', 'max_lat', 'max_lon']
+
+    def __init__(self, data, quantile=0.01):
+        """
+        Computes the center box from the extent of the given data.
+
+        Parameters:
+            data: DataFrame or dictionary of arrays with the columns 'lat' and 'lon'.
+            quantile (float): Fraction of the extent that belongs to the border area.
+        """
+        self.border_quantile = quantile
+        self.min_lat = float(np.min(data['lat']))
+        self.min_lon = float(np.min(data['lon']))
+        self.max_lat = float(np.max(data['lat']))
+        self.max_lon = float(np.max(data['lon']))
+        self._compute_thresholds()
+
+    def _compute_thresholds(self) -> None:
+        self.splat = self.max_lat - self.min_lat
+        self.splon = self.max_lon - self.min_lon
+        self.qslat = self.border_quantile * self.splat
+        self.qslon = self.border_quantile * self.splon
+        self.nthresh = self.max_lat - self.qslat  # north threshold
+        self.ethresh = self.max_lon - self.qslon  # ...
+        self.sthresh = self.min_lat + self.qslat
+        self.wthresh = self.min_lon + self.qslon
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the parameters of the center box.
+
+        Returns:
+            Dict[str, Any]: Border quantile and data extent.
+        """
+        return {attribute: getattr(self, attribute) for attribute in self.BOX_ATTRIBUTES}
+
+    @classmethod
+    def from_dict(cls, box: Dict[str, Any]) -> 'CoordTools':
+        """
+        Creates a CoordTools instance from parameters returned by to_dict.
+
+        Parameters:
+            box (Dict[str, Any]): Border quantile and data extent.
+
+        Returns:
+            CoordTools: The restored instance.
+        """
+        instance = cls.__new__(cls)
+        for attribute in cls.BOX_ATTRIBUTES:
+            setattr(instance, attribute, box[attribute])
+        instance._compute_thresholds()
+        return instance
+
+    def save(self, file_path: str, source: Dict[str, int] = None) -> None:
+        """
+        Saves the center box as JSON file.
+
+        Parameters:
+            file_path (str): Path of the JSON file.
+            source (Dict[str, int]): Signature of the source file the box was computed from, see
+                dataloader.source_signature, None to save the box only.
+        """
+        with open(file_path, 'w') as file:
+            json.dump({**self.to_dict(), **(source or {})}, file)
+
+    @classmethod
+    def load(cls, file_path: str, source: Dict[str, int] = None) -> Optional['CoordTools']:
+        """
+        Loads a center box saved by save.
+
+        Parameters:
+            file_path (str): Path of the JSON file.
+            source (Dict[str, int]): Signature of the current source file, None to skip the check.
+
+        Returns:
+            Optional[CoordTools]: The restored instance, None if the box was computed from another
+            version of the source file.
+        """
+        with open(file_path, 'r') as file:
+            box = json.load(file)
+        if source is not None and any(box.get(key) != value for key, value in source.items()):
+            return None
+        return cls.from_dict(box)
+
+    def in_center(self, lat, lon):
+        # only expecting values according to min and max
+        return (self.sthresh <= lat) & (lat <= self.nthresh) & (self.wthresh <= lon) & (lon <= self.ethresh)
@@ -1,18 +1,35 @@
 """
 This module provides functionality for downloading data files from specified URLs.
 It uses a configuration store to manage settings related to downloading, including
-URLs and the input folder location. The module is designed to work with a 
+URLs and the input folder location. The module is designed to work with a
 ConfigStoreManager to retrieve configuration details.
+
+Downloads are streamed to disk in chunks, several URLs are fetched in parallel and
+interrupted transfers are resumed via HTTP Range requests. A file that already exists
+locally with matching size and ETag is not downloaded again unless 'force_download' is set.
+If the server can not be reached, a completely downloaded local file is used with a warning.
 """
 
+import json
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
 import requests
-import src.setup
+from src.instrumentation import Progress
+from src.setup import run_setup
 from src.ConfigManager.config_store import ConfigStoreManager
 
 # Initialize and add configuration for the downloader
 ConfigStoreManager.add(configstore_name="downloader", filepath="config/DataDownloader.yaml", auto_extend=True)
 
+CHUNK_SIZE = 1 << 20
+REQUEST_TIMEOUT = 30
+PART_SUFFIX = ".part"
+META_SUFFIX = ".download.json"
+
+
 class DataDownloader:
     """
     A class for downloading data files from URLs specified in a configuration file.
@@ -20,6 +37,7 @@ class DataDownloader:
     Attributes:
         config: Instance of the configuration store for the downloader.
         enabled: Boolean indicating if auto-download is enabled.
+        force_download: Boolean indicating if existing files are downloaded again.
         input_folder: Folder path where downloaded files are saved.
         filenames: List of filenames of successfully downloaded files.
     """
@@ -30,18 +48,86 @@ class DataDownloader:
         """
         self.config = ConfigStoreManager.get_instance(configstore_name="downloader")
         self.enabled = self.config.get("enable_auto_download", True)
+        self.force_download = self.config.get("force_download", False)
         url_list = self.config.get("data_url", None)
 
         if url_list is None and self.enabled:
             raise ValueError("No download URL was given. Configure 'data_url' in DataDownloader.yaml, or disable auto download.")
 
+        run_setup()
         config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
         self.input_folder = config_store["input_folder"]
-        self.filenames = [self.__download_file(url) for url in url_list] if url_list else []
+        if not url_list:
+            self.filenames = []
+        elif not self.enabled:
+            self.filenames = [self.__filename(url) for url in url_list]
+        else:
+            workers = min(self.config.get("download_workers", 4), len(url_list))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                self.filenames = list(executor.map(self.__download_file, url_list))
+
+    @staticmethod
+    def __filename(url: str) -> str:
+        return url.split("/")[-1]
+
+    @staticmethod
+    def __read_meta(save_path: str) -> Dict[str, Any]:
+        """
+        Reads the size and ETag recorded for a previously downloaded file.
+
+        Parameters:
+            save_path (str): Path of the downloaded file.
+
+        Returns:
+            Dict[str, Any]: The recorded metadata, empty if none was recorded.
+        """
+        meta_path = save_path + META_SUFFIX
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path, 'r') as file:
+            return json.load(file)
+
+    def __is_up_to_date(self, url: str, save_path: str) -> bool:
+        """
+        Checks whether a local copy of the file matches the file on the server.
+
+        Parameters:
+            url (str): URL of the file.
+            save_path (str): Path of the local copy.
+
+        Returns:
+            bool: True if the local copy can be used without downloading, which needs a matching
+            size or ETag reported by the server. Without a connection a local copy is used if it
+            was downloaded completely.
+        """
+        if self.force_download or not os.path.exists(save_path):
+            return False
+        meta = self.__read_meta(save_path)
+        try:
+            response = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            # the metadata is only moved next to the file once its download finished
+            if meta and meta.get("size", os.path.getsize(save_path)) == os.path.getsize(save_path):
+                logging.warning(f"Could not reach {url}, using the existing file {save_path} without checking it.")
+                return True
+            logging.warning(f"Could not reach {url} to check the existing file {save_path}.")
+            return False
+        if response.status_code != 200:
+            return False
+
+        size = response.headers.get("Content-Length")
+        etag = response.headers.get("ETag")
+        size_matches = size is not None and int(size) == os.path.getsize(save_path)
+        etag_matches = etag is not None and meta.get("etag") == etag
+        if (size is not None and not size_matches) or (etag is not None and meta.get("etag") not in (None, etag)):
+            return False
+        # Without a matching size or ETag nothing proves that the local copy is complete
+        return size_matches or etag_matches
 
     def __download_file(self, url: str) -> str:
         """
         Downloads a file from the specified URL and saves it to the input folder.
+        Partially downloaded files are resumed if the server supports Range requests.
 
         Parameters:
             url (str): URL from where the file should be downloaded.
@@ -52,13 +138,76 @@ class DataDownloader:
         Raises:
             ConnectionError: If the download fails due to network issues or incorrect URL.
         """
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise ConnectionError(f"Failed to download data from {url}. Check the network connection or URL.")
-
-        filename = url.split("/")[-1]
+        filename = self.__filename(url)
         save_path = os.path.join(self.input_folder, filename)
+        if self.__is_up_to_date(url, save_path):
+            return filename
+
+        part_path = save_path + PART_SUFFIX
+        meta = self.__read_meta(part_path)
+        headers = {}
+        if os.path.exists(part_path) and not self.force_download:
+            headers["Range"] = f"bytes={os.path.getsize(part_path)}-"
+            if meta.get("etag"):
+                headers["If-Range"] = meta["etag"]
 
-        with open(save_path, 'wb') as file:
-            file.write(response.content)
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                if response.status_code == 416 and headers:
+                    # The partial file is already complete if it has the size the server reports
+                    if self.__range_size(response) == os.path.getsize(part_path):
+                        self.__finish_download(part_path, save_path)
+                        return filename
+                    logging.warning(f"The partial file {part_path} does not match {url}, downloading it again.")
+                    for path in (part_path, part_path + META_SUFFIX):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    return self.__download_file(url)
+                if response.status_code not in (200, 206):
+                    raise ConnectionError(f"Failed to download data from {url}. Check the network connection or URL.")
+                etag = response.headers.get("ETag")
+                with open(part_path + META_SUFFIX, 'w') as file:
+                    json.dump({"url": url, "etag": etag}, file)
+                size = response.headers.get("Content-Length")
+                progress = Progress(f"{filename} (MiB)", None if size is None else int(size) >> 20)
+                with open(part_path, 'ab' if response.status_code == 206 else 'wb') as file:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        file.write(chunk)
+                        progress.update(len(chunk) / 2 ** 20)
+                progress.close()
+        except requests.RequestException as exc:
+            raise ConnectionError(f"Failed to download data from {url}. Check the network connection or URL.") from exc
+
+        self.__finish_download(part_path, save_path)
         return filename
+
+    @staticmethod
+    def __range_size(response: requests.Response) -> Optional[int]:
+        """
+        Reads the complete size of the file from the 'Content-Range: bytes */<size>' header of a 416 response.
+
+        Parameters:
+            response (requests.Response): The response to a Range request.
+
+        Returns:
+            Optional[int]: The size of the file on the server, None if the header is missing or unknown.
+        """
+        total = response.headers.get("Content-Range", "").rpartition("/")[2].strip()
+        return int(total) if total.isdigit() else None
+
+    def __finish_download(self, part_path: str, save_path: str) -> None:
+        """
+        Moves a completely downloaded partial file to the final location and records its size
+        and ETag next to it.
+
+        Parameters:
+            part_path (str): Path of the partial file.
+            save_path (str): Final path of the downloaded file.
+        """
+        meta = self.__read_meta(part_path)
+        os.replace(part_path, save_path)
+        meta["size"] = os.path.getsize(save_path)
+        with open(save_path + META_SUFFIX, 'w') as file:
+            json.dump(meta, file)
+        if os.path.exists(part_path + META_SUFFIX):
+            os.remove(part_path + META_SUFFIX)
@@ -0,0 +1,207 @@
+"""
+This module provides a cached, columnar loader for the raw position data CSV files.
+The CSV file is parsed only once and stored as typed NumPy column files in a cache folder
+next to the input file. The cache is rebuilt automatically as soon as size or modification
+time of the source file change.
+
+Cached columns:
+    id: int32 codes into the sorted car ids (stored separately as id_categories).
+    timestamp: int64 epoch seconds.
+    lat, lon, heading, speed: float32.
+
+The rows in the cache are sorted by car id and timestamp.
+"""
+
+import json
+import os
+import shutil
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import stage
+
+CACHE_SUFFIX = ".cache"
+CACHE_VERSION = 1
+META_FILENAME = "meta.json"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.000Z"
+FLOAT_COLUMNS = ['lat', 'lon', 'heading', 'speed']
+ID_CATEGORIES = "id_categories"
+
+
+def get_cache_path(csv_path: str) -> str:
+    """
+    Returns the cache folder belonging to a CSV file.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        str: Path of the cache folder.
+    """
+    return csv_path + CACHE_SUFFIX
+
+
+def parse_timestamps(timestamps: pd.Series) -> np.ndarray:
+    """
+    Parses the timestamp strings of the raw data into epoch seconds.
+
+    Parameters:
+        timestamps (pd.Series): Timestamp strings in the format of the raw data.
+
+    Returns:
+        np.ndarray: The timestamps as int64 epoch seconds.
+    """
+    parsed = pd.to_datetime(timestamps, format=TIMESTAMP_FORMAT)
+    return parsed.values.astype("datetime64[s]").astype(np.int64)
+
+
+def source_signature(csv_path: str) -> Dict[str, int]:
+    """
+    Returns size and modification time of a source file, files derived from it are outdated when they change.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        Dict[str, int]: The keys 'source_size' and 'source_mtime_ns'.
+    """
+    stat = os.stat(csv_path)
+    return {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def is_cache_valid(csv_path: str) -> bool:
+    """
+    Checks whether the cache of a CSV file exists and matches the current source file.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        bool: True if the cache can be used.
+    """
+    meta_path = os.path.join(get_cache_path(csv_path), META_FILENAME)
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path, 'r') as file:
+        meta = json.load(file)
+    return meta.get("version") == CACHE_VERSION and all(
+        meta.get(key) == value for key, value in source_signature(csv_path).items())
+
+
+def build_cache(csv_path: str) -> str:
+    """
+    Parses a raw CSV file and writes its columns into the cache folder.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        str: Path of the cache folder.
+    """
+    signature = source_signature(csv_path)
+    with stage("read_csv") as record:
+        data = pd.read_csv(csv_path, dtype={'id': 'category', **{column: 'float32' for column in FLOAT_COLUMNS}})
+        record.add(len(data))
+
+    with stage("parse_timestamps", len(data)):
+        columns: Dict[str, np.ndarray] = {
+            'id': data['id'].cat.codes.to_numpy().astype(np.int32),
+            'timestamp': parse_timestamps(data['timestamp']),
+        }
+    for column in data.columns:
+        if column not in columns:
+            columns[column] = data[column].to_numpy()
+    categories = data['id'].cat.categories.to_numpy()
+    if categories.dtype == object:
+        categories = categories.astype(str)
+    del data
+
+    cache_path = get_cache_path(csv_path)
+    temp_path = cache_path + ".tmp"
+    with stage("write_cache", len(columns['id'])):
+        order = np.lexsort((columns['timestamp'], columns['id']))
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        for column, values in columns.items():
+            np.save(os.path.join(temp_path, f"{column}.npy"), values[order])
+        np.save(os.path.join(temp_path, f"{ID_CATEGORIES}.npy"), categories)
+        with open(os.path.join(temp_path, META_FILENAME), 'w') as file:
+            json.dump({"version": CACHE_VERSION, "rows": len(order), "columns": list(columns), **signature}, file)
+
+    shutil.rmtree(cache_path, ignore_errors=True)
+    os.rename(temp_path, cache_path)
+    return cache_path
+
+
+def ensure_cache(csv_path: str) -> str:
+    """
+    Returns the cache folder of a CSV file and (re)builds it if necessary.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        str: Path of the cache folder.
+    """
+    if is_cache_valid(csv_path):
+        return get_cache_path(csv_path)
+    return build_cache(csv_path)
+
+
+def load_columns(csv_path: str, mmap: bool = True) -> Dict[str, np.ndarray]:
+    """
+    Loads the cached columns of a CSV file.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        mmap (bool): If True, the columns are memory mapped instead of read into memory.
+
+    Returns:
+        Dict[str, np.ndarray]: The cached columns including the id categories under 'id_categories'.
+    """
+    cache_path = ensure_cache(csv_path)
+    with open(os.path.join(cache_path, META_FILENAME), 'r') as file:
+        meta = json.load(file)
+    mmap_mode = 'r' if mmap else None
+    columns = {column: np.load(os.path.join(cache_path, f"{column}.npy"), mmap_mode=mmap_mode)
+               for column in meta["columns"]}
+    columns[ID_CATEGORIES] = np.load(os.path.join(cache_path, f"{ID_CATEGORIES}.npy"))
+    return columns
+
+
+def columns_to_frame(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """
+    Builds a DataFrame from cached columns, with a categorical 'id' and datetime 'timestamp'.
+
+    Parameters:
+        columns (Dict[str, np.ndarray]): Columns as returned by load_columns, possibly sliced.
+
+    Returns:
+        pd.DataFrame: The position data.
+    """
+    frame = {}
+    for column, values in columns.items():
+        if column == ID_CATEGORIES:
+            continue
+        if column == 'id':
+            frame[column] = pd.Categorical.from_codes(np.asarray(values), categories=columns[ID_CATEGORIES])
+        elif column == 'timestamp':
+            frame[column] = pd.to_datetime(np.asarray(values), unit='s')
+        else:
+            frame[column] = np.asarray(values)
+    return pd.DataFrame(frame)
+
+
+def load_data(csv_path: str) -> pd.DataFrame:
+    """
+    Loads the position data of a raw CSV file via its columnar cache.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+
+    Returns:
+        pd.DataFrame: The position data sorted by car id and timestamp.
+    """
+    return columns_to_frame(load_columns(csv_path, mmap=False))
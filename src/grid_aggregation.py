@@ -0,0 +1,110 @@
+"""
+This module aggregates GPS points into a regular lat/lon grid and renders the grid on a folium map.
+Instead of one marker per data point, the map shows one cell per occupied grid cell, so the size
+of the generated HTML is bounded by the number of cells and not by the number of data points.
+"""
+
+import branca.colormap
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import HeatMap
+
+
+def aggregate_grid(lat: np.ndarray, lon: np.ndarray, speed: np.ndarray, cell_size: float,
+                   max_cells: int = None) -> pd.DataFrame:
+    """
+    Bins GPS points into square grid cells and computes point count and average speed per cell.
+    If more than max_cells cells are occupied, the cell size is doubled until the limit holds.
+
+    Parameters:
+        lat (np.ndarray): Latitude of every point.
+        lon (np.ndarray): Longitude of every point.
+        speed (np.ndarray): Speed of every point.
+        cell_size (float): Edge length of a grid cell in degrees.
+        max_cells (int): Optional upper limit for the number of occupied cells.
+
+    Returns:
+        pd.DataFrame: One row per occupied cell with the columns 'lat_min', 'lon_min', 'lat_max',
+        'lon_max', 'point_count' and 'mean_speed'.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    if len(lat) == 0:
+        return pd.DataFrame(columns=['lat_min', 'lon_min', 'lat_max', 'lon_max', 'point_count', 'mean_speed'])
+    lat_origin, lon_origin = lat.min(), lon.min()
+
+    while True:
+        row = ((lat - lat_origin) // cell_size).astype(np.int64)
+        column = ((lon - lon_origin) // cell_size).astype(np.int64)
+        columns_count = column.max() + 1
+        cells, cell_index = np.unique(row * columns_count + column, return_inverse=True)
+        if max_cells is None or len(cells) <= max_cells:
+            break
+        cell_size *= 2
+
+    counts = np.bincount(cell_index)
+    speed_sums = np.bincount(cell_index, weights=speed)
+    lat_min = lat_origin + (cells // columns_count) * cell_size
+    lon_min = lon_origin + (cells % columns_count) * cell_size
+    return pd.DataFrame({
+        'lat_min': lat_min,
+        'lon_min': lon_min,
+        'lat_max': lat_min + cell_size,
+        'lon_max': lon_min + cell_size,
+        'point_count': counts,
+        'mean_speed': speed_sums / counts,
+    })
+
+
+def add_grid_layer(car_map: folium.Map, grid: pd.DataFrame, value: str = 'mean_speed',
+                   name: str = "Durchschnittsgeschwindigkeit") -> None:
+    """
+    Adds the grid cells as one colored GeoJSON layer to the map.
+
+    Parameters:
+        car_map (folium.Map): The map the layer is added to.
+        grid (pd.DataFrame): Grid cells as returned by aggregate_grid.
+        value (str): Grid column used to color the cells.
+        name (str): Name of the layer and caption of the color scale.
+    """
+    if grid.empty:
+        return
+    colormap = branca.colormap.linear.YlOrRd_09.scale(grid[value].min(), grid[value].max())
+    colormap.caption = name
+    features = [{
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Polygon',
+            'coordinates': [[[cell.lon_min, cell.lat_min], [cell.lon_max, cell.lat_min], [cell.lon_max, cell.lat_max],
+                             [cell.lon_min, cell.lat_max], [cell.lon_min, cell.lat_min]]],
+        },
+        'properties': {'point_count': int(cell.point_count), 'mean_speed': round(float(cell.mean_speed), 1),
+                       'color': colormap(getattr(cell, value))},
+    } for cell in grid.itertuples(index=False)]
+
+    folium.GeoJson(
+        {'type': 'FeatureCollection', 'features': features},
+        name=name,
+        style_function=lambda feature: {'fillColor': feature['properties']['color'], 'color': None,
+                                        'weight': 0, 'fillOpacity': 0.6},
+        tooltip=folium.GeoJsonTooltip(fields=['point_count', 'mean_speed'], aliases=['Punkte', 'Ø Geschwindigkeit']),
+    ).add_to(car_map)
+    colormap.add_to(car_map)
+
+
+def add_heatmap_layer(car_map: folium.Map, grid: pd.DataFrame, name: str = "Punktdichte") -> None:
+    """
+    Adds a heatmap of the point count per grid cell to the map.
+
+    Parameters:
+        car_map (folium.Map): The map the layer is added to.
+        grid (pd.DataFrame): Grid cells as returned by aggregate_grid.
+        name (str): Name of the layer.
+    """
+    if grid.empty:
+        return
+    centers = np.column_stack(((grid['lat_min'] + grid['lat_max']) / 2, (grid['lon_min'] + grid['lon_max']) / 2,
+                               grid['point_count'] / grid['point_count'].max()))
+    HeatMap(centers.tolist(), name=name).add_to(car_map)
@@ -0,0 +1,244 @@
+"""
+This module provides an incremental trip segmentation for data that arrives in daily dumps.
+Only rows that were appended to the input files since the last run are read. The last trip of
+every car stays open until a later data point of that car starts a new trip, or until the newest
+timestamp of all data (the watermark) is more than the time threshold after its last point.
+Closed trips are appended to the output file, the points of the open trips are kept in the state.
+
+The state folder next to the output file holds:
+    meta.json: next Fahrtnummer, watermark, processed bytes per input file and output file size.
+    cars.npz: last timestamp and open trip start (-1 if none) of every car.
+    open_points.npz: the data points of the open trips.
+
+Trips are numbered in the order they are closed, so the Fahrtnummer differ from a full run,
+but the trips themselves are the same. Data points that are not newer than the last point
+already processed for their car are dropped.
+"""
+
+import io
+import json
+import os
+import shutil
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.dataloader import FLOAT_COLUMNS, TIMESTAMP_FORMAT
+from src.cleaning import CleaningRules
+from src.segmentation import TRIP_COLUMN, clean_data, segment_trips, trip_boundaries
+from src.trip_store import truncate_trip_store, write_trip_store
+
+STATE_SUFFIX = ".state"
+META_FILENAME = "meta.json"
+CARS_FILENAME = "cars.npz"
+OPEN_POINTS_FILENAME = "open_points.npz"
+
+
+def get_state_path(output_path: str) -> str:
+    """
+    Returns the path of the state folder belonging to an output file.
+
+    Parameters:
+        output_path (str): Path of the trip CSV file.
+
+    Returns:
+        str: Path of the state folder.
+    """
+    return output_path + STATE_SUFFIX
+
+
+class SegmentationState:
+    """
+    A class holding the state of the incremental segmentation between runs.
+
+    Attributes:
+        next_trip_number: Fahrtnummer of the next closed trip.
+        watermark: Newest timestamp of all processed data in epoch seconds.
+        offsets: Number of bytes already processed of every input file.
+        output_size: Size of the output file after the last run.
+        cars: Per car id the 'last_seconds' and 'open_start' (epoch seconds, -1 without open trip).
+        open_points: The data points of the open trips, timestamps in epoch seconds.
+    """
+
+    def __init__(self, next_trip_number: int = 0, watermark: int = None, offsets: Dict[str, int] = None,
+                 output_size: int = 0, cars: pd.DataFrame = None, open_points: pd.DataFrame = None):
+        self.next_trip_number = next_trip_number
+        self.watermark = watermark
+        self.offsets = {} if offsets is None else offsets
+        self.output_size = output_size
+        self.cars = pd.DataFrame({'last_seconds': np.zeros(0, dtype=np.int64),
+                                  'open_start': np.zeros(0, dtype=np.int64)},
+                                 index=pd.Index([], dtype=object, name='id')) if cars is None else cars
+        self.open_points = pd.DataFrame() if open_points is None else open_points
+
+    def save(self, state_path: str) -> None:
+        """
+        Writes the state folder. The folder is replaced as a whole, so an interrupted run
+        leaves the previous state intact.
+
+        Parameters:
+            state_path (str): Path of the state folder.
+        """
+        temp_path = state_path + ".tmp"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        os.makedirs(temp_path)
+        np.savez(os.path.join(temp_path, CARS_FILENAME), id=self.cars.index.to_numpy().astype(str),
+                 last_seconds=self.cars['last_seconds'].to_numpy(), open_start=self.cars['open_start'].to_numpy())
+        np.savez(os.path.join(temp_path, OPEN_POINTS_FILENAME),
+                 **{column: values.to_numpy().astype(str) if column == 'id' else values.to_numpy()
+                    for column, values in self.open_points.items()})
+        with open(os.path.join(temp_path, META_FILENAME), 'w') as file:
+            json.dump({'next_trip_number': self.next_trip_number, 'watermark': self.watermark,
+                       'offsets': self.offsets, 'output_size': self.output_size}, file)
+
+        old_path = state_path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(state_path):
+            os.rename(state_path, old_path)
+        os.rename(temp_path, state_path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, state_path: str) -> 'SegmentationState':
+        """
+        Loads a state folder written by save. Without a state folder an empty state is returned.
+
+        Parameters:
+            state_path (str): Path of the state folder.
+
+        Returns:
+            SegmentationState: The restored state.
+        """
+        if not os.path.exists(state_path) and os.path.exists(state_path + ".old"):
+            state_path = state_path + ".old"
+        if not os.path.exists(state_path):
+            return cls()
+        with open(os.path.join(state_path, META_FILENAME), 'r') as file:
+            meta = json.load(file)
+        with np.load(os.path.join(state_path, CARS_FILENAME)) as cars:
+            cars = pd.DataFrame({'last_seconds': cars['last_seconds'], 'open_start': cars['open_start']},
+                                index=pd.Index(cars['id'].astype(object), name='id'))
+        with np.load(os.path.join(state_path, OPEN_POINTS_FILENAME)) as points:
+            open_points = pd.DataFrame({column: points[column] for column in points.files})
+        if 'id' in open_points:
+            open_points['id'] = open_points['id'].astype(object)
+        return cls(meta['next_trip_number'], meta['watermark'], meta['offsets'], meta['output_size'], cars,
+                   open_points)
+
+
+def _read_new_rows(csv_path: str, offset: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Reads the complete lines appended to a CSV file after offset.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        offset (int): Number of bytes already processed, 0 for a new file.
+
+    Returns:
+        Tuple[pd.DataFrame, int]: The new rows with epoch second timestamps and the new offset.
+    """
+    size = os.path.getsize(csv_path)
+    if size < offset:
+        raise ValueError(f"{csv_path} is smaller than the processed part. Delete the state folder to start over.")
+    with open(csv_path, 'rb') as file:
+        header = file.readline()
+        file.seek(max(offset, file.tell()))
+        start = file.tell()
+        content = file.read(size - start)
+    content = content[:content.rfind(b"\n") + 1]
+    names = header.decode().strip().split(",")
+    rows = pd.read_csv(io.BytesIO(content), header=None, names=names,
+                       dtype={column: 'float32' for column in FLOAT_COLUMNS}) if content else \
+        pd.DataFrame({name: [] for name in names})
+    rows['id'] = rows['id'].astype(object)
+    rows['timestamp'] = pd.to_datetime(rows['timestamp'], format=TIMESTAMP_FORMAT) \
+        .values.astype("datetime64[s]").astype(np.int64)
+    return rows, start + len(content)
+
+
+def segment_incremental(csv_paths: Sequence[str], output_path: str, time_threshold: float, min_data_points: int,
+                        coord_tools=None, close_all: bool = False, store_path: str = None,
+                        cleaning: CleaningRules = None) -> int:
+    """
+    Segments the rows appended to the input files since the last run and appends the closed trips.
+
+    The watermark only works if the dumps arrive in time order: a trip is closed when the
+    newest data point of all cars is more than time_threshold after the last point of the trip.
+
+    Parameters:
+        csv_paths (Sequence[str]): Paths of the raw CSV files, new files are read completely.
+        output_path (str): Path of the trip CSV file the closed trips are appended to.
+        time_threshold (float): Maximum gap in seconds between two points of the same trip.
+        min_data_points (int): Trips with this many data points or fewer are dropped.
+        coord_tools: Optional CoordTools instance used to classify each trip into 'Typ'.
+        close_all (bool): If True, all open trips are closed, e.g. at the end of the data.
+        store_path (str): Optional trip store the closed trips are appended to as well.
+        cleaning (CleaningRules): Optional rules applied to the open and new points before the segmentation.
+
+    Returns:
+        int: The number of trips appended to the output file.
+    """
+    state_path = get_state_path(output_path)
+    state = SegmentationState.load(state_path)
+    if os.path.exists(output_path) and os.path.getsize(output_path) > state.output_size:
+        # trips appended by an interrupted run or an output file without state, start over from the state
+        with open(output_path, 'r+b') as file:
+            file.truncate(state.output_size)
+    if store_path is not None and os.path.exists(store_path):
+        if state.output_size == 0:
+            shutil.rmtree(store_path)
+        else:
+            truncate_trip_store(store_path, state.next_trip_number)
+
+    new_rows: List[pd.DataFrame] = []
+    for csv_path in csv_paths:
+        rows, state.offsets[csv_path] = _read_new_rows(csv_path, state.offsets.get(csv_path, 0))
+        new_rows.append(rows)
+    rows = pd.concat(new_rows, ignore_index=True) if new_rows else pd.DataFrame()
+
+    if len(rows):
+        last_seconds = state.cars['last_seconds'].reindex(rows['id']).to_numpy()
+        rows = rows.loc[~(rows['timestamp'].to_numpy() <= last_seconds)]
+    parts = [part for part in (state.open_points, rows) if len(part)]
+    data = pd.concat(parts, ignore_index=True) if len(parts) > 1 else (parts[0] if parts else rows)
+    if len(data) == 0:
+        state.save(state_path)
+        return 0
+    if len(rows):
+        newest = int(rows['timestamp'].max())
+        state.watermark = newest if state.watermark is None else max(state.watermark, newest)
+
+    data = data.sort_values(by=['id', 'timestamp'], kind='stable', ignore_index=True)
+    if cleaning is not None:
+        data = clean_data(data, cleaning)
+    car_codes = pd.factorize(data['id'])[0]
+    seconds = data['timestamp'].to_numpy()
+    trip_index = np.cumsum(trip_boundaries(car_codes, seconds, time_threshold)) - 1
+    car_last_rows = np.append(np.flatnonzero(np.diff(car_codes)), len(data) - 1)
+    open_trips = trip_index[car_last_rows]
+    if close_all:
+        open_trips = open_trips[:0]
+    else:
+        open_trips = open_trips[state.watermark - seconds[car_last_rows] <= time_threshold]
+    is_open = np.isin(trip_index, open_trips)
+
+    closed = data.loc[~is_open].copy()
+    closed['timestamp'] = pd.to_datetime(closed['timestamp'], unit='s')
+    trips = segment_trips(closed, time_threshold, min_data_points, coord_tools, state.next_trip_number)
+    trips.to_csv(output_path, mode='a', header=state.output_size == 0, index=False)
+    if store_path is not None:
+        write_trip_store(trips, store_path, append=True)
+    trip_count = trips[TRIP_COLUMN].nunique()
+
+    open_points = data.loc[is_open].reset_index(drop=True)
+    cars = pd.DataFrame({'last_seconds': seconds[car_last_rows], 'open_start': np.int64(-1)},
+                        index=pd.Index(data['id'].to_numpy()[car_last_rows], name='id'))
+    open_starts = open_points.groupby('id', sort=False)['timestamp'].min()
+    cars.loc[open_starts.index, 'open_start'] = open_starts.to_numpy()
+    state.cars = pd.concat([state.cars.loc[~state.cars.index.isin(cars.index)], cars])
+    state.open_points = open_points
+    state.next_trip_number += trip_count
+    state.output_size = os.path.getsize(output_path)
+    state.save(state_path)
+    return trip_count
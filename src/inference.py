@@ -0,0 +1,198 @@
+"""
+This module provides batched trip classification for the inference service.
+Single trips are collected by a MicroBatcher until either the maximum batch size is reached or
+the oldest trip has waited for the maximum latency. All windows of a batch are then classified
+with one model call and the window predictions are averaged per trip.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import CoordTools
+from src.resampling import Resampling
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN
+from src.windowing import FEATURE_COLUMNS, sliding_windows, trip_features, window_inputs
+
+THROUGH_TRAFFIC_THRESHOLD = 0.5
+LATENCY_HISTORY = 100000
+
+
+def trips_to_frame(trips: Sequence[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Converts trips of the service interface into one DataFrame of trip points.
+
+    Every trip is a dictionary with a 'points' list. A point is either a dictionary with the keys
+    'lat', 'lon', 'heading' and 'speed' (optionally 'timestamp' in epoch seconds) or a list with
+    these values in that order. Resampling by time needs the timestamps of all points of all trips
+    of a batch, otherwise the classification of the batch raises a ValueError (the MicroBatcher then
+    classifies the trips of the batch one by one, so only the trips without timestamps fail).
+
+    Parameters:
+        trips (Sequence[Dict[str, Any]]): The trips to convert.
+
+    Returns:
+        pd.DataFrame: The points of all trips, numbered by their position in trips.
+    """
+    frames = []
+    for number, trip in enumerate(trips):
+        points = trip['points']
+        if points and isinstance(points[0], dict):
+            # points without timestamp keep a missing value, so partial timestamps are detected later
+            has_timestamp = any('timestamp' in point for point in points)
+            frame = pd.DataFrame(points, columns=FEATURE_COLUMNS + (['timestamp'] if has_timestamp else []))
+        else:
+            frame = pd.DataFrame(np.asarray(points, dtype=np.float64).reshape((-1, len(FEATURE_COLUMNS))),
+                                 columns=FEATURE_COLUMNS)
+        frame[TRIP_COLUMN] = number
+        frames.append(frame)
+    trip_points = pd.concat(frames, ignore_index=True)
+    trip_points[TYPE_COLUMN] = None
+    return trip_points
+
+
+class TripClassifier:
+    """
+    A class to classify whole trips with a window based model.
+
+    Attributes:
+        predict: Function mapping a float32 array of windows to one probability per window.
+        coord_tools: Instance whose extent was used to normalize lat and lon during training.
+        window: Number of points per window.
+        stride: Distance between the starts of two consecutive windows of a trip.
+        resampling: Resampling used during training, None if the trips were not resampled.
+    """
+
+    def __init__(self, predict: Callable[[np.ndarray], np.ndarray], coord_tools: CoordTools, window: int,
+                 stride: int = 1, resampling: Resampling = None):
+        self.predict = predict
+        self.coord_tools = coord_tools
+        self.window = window
+        self.stride = stride
+        self.resampling = resampling
+
+    def classify(self, trips: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Classifies trips with a single model call.
+
+        The model inputs are the point features only, the through traffic flag is what it predicts.
+
+        Parameters:
+            trips (Sequence[Dict[str, Any]]): Trips as described in trips_to_frame.
+
+        Returns:
+            List[Dict[str, Any]]: For every trip its 'id', the averaged 'probability' of through
+            traffic, the decision 'through_traffic' and the number of 'windows' used.
+        """
+        trip_points = trips_to_frame(trips)
+        features, trip_starts = trip_features(trip_points, self.coord_tools, self.resampling)
+        windows, starts = sliding_windows(features, trip_starts, self.window, self.stride)
+        # trips without points have no entry in trip_starts, map back to the position in trips
+        trip_numbers = pd.factorize(trip_points[TRIP_COLUMN])[1].to_numpy()
+        trip_of_window = trip_numbers[np.searchsorted(trip_starts, starts, side='right') - 1]
+
+        window_counts = np.bincount(trip_of_window, minlength=len(trips))
+        probability_sums = np.zeros(len(trips))
+        if len(starts):
+            probabilities = np.asarray(self.predict(window_inputs(windows, starts))).reshape(-1)
+            probability_sums = np.bincount(trip_of_window, weights=probabilities, minlength=len(trips))
+
+        results = []
+        for trip, count, probability_sum in zip(trips, window_counts, probability_sums):
+            probability = probability_sum / count if count else None
+            results.append({
+                'id': trip.get('id'),
+                'probability': None if probability is None else round(float(probability), 6),
+                'through_traffic': None if probability is None else bool(probability >= THROUGH_TRAFFIC_THRESHOLD),
+                'windows': int(count),
+            })
+        return results
+
+
+class MicroBatcher:
+    """
+    A class to collect single classification requests into batches.
+
+    Attributes:
+        classify: Function classifying a list of trips, e.g. TripClassifier.classify.
+        max_batch_size: Maximum number of trips per batch.
+        max_latency: Maximum time in seconds the first trip of a batch waits for more trips.
+        latencies: Time in seconds from submit to result of the most recent trips.
+    """
+
+    def __init__(self, classify: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]], max_batch_size: int,
+                 max_latency: float):
+        self.classify = classify
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.latencies = deque(maxlen=LATENCY_HISTORY)
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, trip: Dict[str, Any]) -> Future:
+        """
+        Queues a trip for classification.
+
+        Parameters:
+            trip (Dict[str, Any]): The trip as described in trips_to_frame.
+
+        Returns:
+            Future: Resolves to the classification result of the trip.
+        """
+        future = Future()
+        self._queue.put((time.perf_counter(), trip, future))
+        return future
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = batch[0][0] + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _classify_single(self, trip: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        try:
+            return self.classify([trip])[0], None
+        except Exception as exc:
+            return None, exc
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            trips = [trip for _, trip, _ in batch]
+            try:
+                outcomes = [(result, None) for result in self.classify(trips)]
+            except Exception as exc:
+                # a bad trip must not fail the other trips of the batch, only its own future
+                outcomes = [(None, exc)] if len(trips) == 1 else [self._classify_single(trip) for trip in trips]
+            finished = time.perf_counter()
+            for (submitted, _, future), (result, exc) in zip(batch, outcomes):
+                if exc is not None:
+                    future.set_exception(exc)
+                    continue
+                self.latencies.append(finished - submitted)
+                future.set_result(result)
+
+    def latency_report(self) -> Dict[str, float]:
+        """
+        Summarizes the latencies of the most recent trips.
+
+        Returns:
+            Dict[str, float]: Number of trips and p50/p99 latency in milliseconds.
+        """
+        latencies = np.array(self.latencies) * 1000
+        if len(latencies) == 0:
+            return {'count': 0, 'p50_ms': None, 'p99_ms': None}
+        return {'count': len(latencies), 'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99_ms': round(float(np.percentile(latencies, 99)), 3)}
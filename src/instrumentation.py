@@ -0,0 +1,314 @@
+"""
+This module provides the instrumentation of the pipeline scripts.
+A RunReport records wall time, item count and items per second of every stage of a run, together
+with the peak memory (RSS) of the process up to the end of the stage, and writes them as JSON
+report into the output folder. Library functions mark
+their stages with the module level stage function, which records into the active report and
+costs nothing if no report is active. Counters (e.g. the rows removed per cleaning rule) are
+summed into the active report the same way. Progress of long loops is printed at most once per
+progress interval. Optionally the whole run is profiled with cProfile or pyinstrument.
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.ConfigManager.config_store import ConfigStoreManager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+REPORT_FOLDER = "reports"
+PROFILE_TOP_FUNCTIONS = 25
+PROFILERS = [None, "cprofile", "pyinstrument"]
+
+# The report of the running script, set while a RunReport is entered.
+_active_report: Optional['RunReport'] = None
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """
+    Returns the peak resident memory of the process so far. The peak is not reset between stages,
+    a stage only shows its own peak if it needs more memory than all stages before.
+
+    Returns:
+        Optional[float]: The peak RSS in MiB, None where it can not be determined.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+class StageRecord:
+    """
+    A class collecting the item count of a running stage.
+
+    Attributes:
+        name: Name of the stage, nested stages are joined with '/'.
+        items: Number of processed items (rows, trips, cells, ...), None if not counted.
+    """
+
+    def __init__(self, name: str, items: Optional[int] = None):
+        self.name = name
+        self.items = items
+
+    def add(self, items: int) -> None:
+        self.items = (self.items or 0) + int(items)
+
+
+class Progress:
+    """
+    A class printing the progress of a loop at most once per interval. The updates may come from
+    several threads.
+
+    Attributes:
+        label: Text printed in front of the progress.
+        total: Expected number of items, None if unknown.
+        interval: Minimum time in seconds between two printed lines.
+        count: Number of items processed so far.
+    """
+
+    def __init__(self, label: str, total: Optional[int] = None, interval: Optional[float] = None):
+        self.label = label
+        self.total = total
+        self.interval = interval if interval is not None else \
+            (_active_report.progress_interval if _active_report is not None else 1.0)
+        self.count = 0
+        self.started = time.perf_counter()
+        self.printed = self.started
+        self._lock = threading.Lock()
+
+    def update(self, items: int = 1) -> None:
+        with self._lock:
+            self.count += items
+            now = time.perf_counter()
+            if now - self.printed >= self.interval:
+                self.printed = now
+                self._print(now)
+
+    def close(self) -> None:
+        with self._lock:
+            self._print(time.perf_counter())
+
+    def _print(self, now: float) -> None:
+        total = "" if self.total is None else f" / {self.total}"
+        rate = self.count / max(now - self.started, 1e-9)
+        print(f"{self.label}: {self.count:.0f}{total} ({rate:.0f}/s)", flush=True)
+
+
+class RunReport:
+    """
+    A class recording the stages of one run of a pipeline script.
+
+    Use it as context manager around the script. On exit the report is written to
+    <output_folder>/reports/<name>_<start time>.json, together with the profile if enabled.
+
+    Attributes:
+        name: Name of the run, usually the script name.
+        output_folder: Folder the reports folder is created in.
+        profiler: None, 'cprofile' or 'pyinstrument'.
+        progress_interval: Minimum time in seconds between two progress lines.
+        stages: The recorded stages in the order they finished.
+        counters: Named groups of counts, summed over all calls of count.
+    """
+
+    def __init__(self, name: str, output_folder: str, profiler: Optional[str] = None,
+                 progress_interval: float = 1.0):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler}, use one of {PROFILERS}.")
+        self.name = name
+        self.output_folder = output_folder
+        self.profiler = profiler
+        self.progress_interval = progress_interval
+        self.stages: List[Dict[str, Any]] = []
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._stage_names: List[str] = []
+        self._profile = None
+        self._started_at = None
+        self._started = None
+
+    def __enter__(self) -> 'RunReport':
+        global _active_report
+        _active_report = self
+        self._started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._start_profiler()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        global _active_report
+        profile = self._stop_profiler()
+        _active_report = None
+        self.save(profile, error=None if exc_type is None else repr(exc_value))
+
+    @contextmanager
+    def stage(self, name: str, items: Optional[int] = None) -> Iterator[StageRecord]:
+        """
+        Records a stage. The item count can be given upfront or added to the yielded record.
+
+        Parameters:
+            name (str): Name of the stage.
+            items (int): Number of processed items, if known upfront.
+
+        Returns:
+            Iterator[StageRecord]: The record of the running stage.
+        """
+        self._stage_names.append(name)
+        record = StageRecord("/".join(self._stage_names), items)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield record
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self._stage_names.pop()
+            self.stages.append({
+                'stage': record.name,
+                'seconds': round(seconds, 4),
+                'items': record.items,
+                'items_per_second': None if record.items is None else round(record.items / max(seconds, 1e-9), 1),
+                'process_peak_rss_mb': process_peak_rss_mb(),
+                'status': status,
+            })
+
+    def count(self, name: str, values: Dict[str, int]) -> None:
+        """
+        Adds counts to a named group of counters.
+
+        Parameters:
+            name (str): Name of the counter group.
+            values (Dict[str, int]): The counts to add by counter name.
+        """
+        group = self.counters.setdefault(name, {})
+        for key, value in values.items():
+            group[key] = group.get(key, 0) + int(value)
+
+    def _start_profiler(self) -> None:
+        if self.profiler == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument is not installed, the run is not profiled.", file=sys.stderr)
+                return
+            self._profile = Profiler()
+            self._profile.start()
+
+    def _stop_profiler(self) -> Optional[Dict[str, Any]]:
+        if self._profile is None:
+            return None
+        os.makedirs(self.report_folder, exist_ok=True)
+        if self.profiler == "cprofile":
+            self._profile.disable()
+            path = f"{self.report_path[:-len('.json')]}.prof"
+            self._profile.dump_stats(path)
+            summary = io.StringIO()
+            pstats.Stats(self._profile, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            return {'profiler': self.profiler, 'path': path, 'top': summary.getvalue().splitlines()}
+        self._profile.stop()
+        path = f"{self.report_path[:-len('.json')]}.html"
+        with open(path, 'w') as file:
+            file.write(self._profile.output_html())
+        return {'profiler': self.profiler, 'path': path}
+
+    @property
+    def report_folder(self) -> str:
+        return os.path.join(self.output_folder, REPORT_FOLDER)
+
+    @property
+    def report_path(self) -> str:
+        return os.path.join(self.report_folder, f"{self.name}_{self._started_at:%Y%m%d_%H%M%S}.json")
+
+    def save(self, profile: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> str:
+        """
+        Writes the JSON run report.
+
+        Parameters:
+            profile (Dict[str, Any]): Path and summary of the profile, if the run was profiled.
+            error (str): The exception that ended the run, if any.
+
+        Returns:
+            str: Path of the report file.
+        """
+        os.makedirs(self.report_folder, exist_ok=True)
+        report = {
+            'name': self.name,
+            'started': self._started_at.isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self._started, 4),
+            'process_peak_rss_mb': process_peak_rss_mb(),
+            'error': error,
+            'argv': sys.argv,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'stages': self.stages,
+            'counters': self.counters,
+            'profile': profile,
+        }
+        with open(self.report_path, 'w') as file:
+            json.dump(report, file, indent=2)
+        return self.report_path
+
+
+@contextmanager
+def stage(name: str, items: Optional[int] = None) -> Iterator[StageRecord]:
+    """
+    Records a stage into the active run report. Without an active report nothing is recorded.
+
+    Parameters:
+        name (str): Name of the stage.
+        items (int): Number of processed items, if known upfront.
+
+    Returns:
+        Iterator[StageRecord]: The record of the running stage.
+    """
+    if _active_report is None:
+        yield StageRecord(name, items)
+        return
+    with _active_report.stage(name, items) as record:
+        yield record
+
+
+def count(name: str, values: Dict[str, int]) -> None:
+    """
+    Adds counts to a counter group of the active run report. Without an active report nothing is recorded.
+
+    Parameters:
+        name (str): Name of the counter group.
+        values (Dict[str, int]): The counts to add by counter name.
+    """
+    if _active_report is not None:
+        _active_report.count(name, values)
+
+
+def run_report(name: str) -> RunReport:
+    """
+    Creates the run report of a pipeline script from config/instrumentation.yaml.
+
+    Parameters:
+        name (str): Name of the run, usually the script name.
+
+    Returns:
+        RunReport: The report, to be entered as context manager around the script.
+    """
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    instrumentation_config_store = ConfigStoreManager.add("instrumentation", "config/instrumentation.yaml")
+    return RunReport(name, config_store["output_folder"], instrumentation_config_store.get("profiler", None),
+                     instrumentation_config_store.get("progress_interval", 1.0))
@@ -0,0 +1,90 @@
+"""
+This module exports a trained Sequential model into formats that do not need full TensorFlow.
+The raw weight arrays are read by the NumPy predictor, the TFLite files (float16 and int8
+quantized) can be run with the TFLite interpreter.
+"""
+
+import os
+from typing import Dict, Iterable
+
+import numpy as np
+import tensorflow as tf
+
+from src.numpy_predictor import TFLITE_FILES, WEIGHTS_FILE, NumpyPredictor
+
+
+def to_numpy_predictor(model: tf.keras.Model) -> NumpyPredictor:
+    """
+    Extracts the weights of a Sequential model of Flatten and Dense layers.
+
+    Parameters:
+        model (tf.keras.Model): The trained model.
+
+    Returns:
+        NumpyPredictor: A predictor with the same weights and activations.
+    """
+    kernels, biases, activations = [], [], []
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.Flatten):
+            continue
+        if not isinstance(layer, tf.keras.layers.Dense):
+            raise ValueError(f"Layer {layer.name} of type {type(layer).__name__} can not be exported.")
+        kernel, bias = layer.get_weights()
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(tf.keras.activations.serialize(layer.activation))
+    return NumpyPredictor(kernels, biases, activations)
+
+
+def to_tflite(model: tf.keras.Model, quantization: str, representative_windows: np.ndarray = None) -> bytes:
+    """
+    Converts a model to TFLite with post-training quantization.
+
+    Parameters:
+        model (tf.keras.Model): The trained model.
+        quantization (str): 'float16' or 'int8'.
+        representative_windows (np.ndarray): Sample inputs to calibrate the int8 ranges.
+
+    Returns:
+        bytes: The TFLite flatbuffer.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if representative_windows is None or len(representative_windows) == 0:
+            raise ValueError("int8 quantization needs representative windows.")
+        converter.representative_dataset = lambda: ([window[np.newaxis].astype(np.float32)]
+                                                    for window in representative_windows)
+    else:
+        raise ValueError(f"Unknown quantization: {quantization}")
+    return converter.convert()
+
+
+def export_model(model: tf.keras.Model, output_folder: str, representative_windows: np.ndarray = None,
+                 quantizations: Iterable[str] = ('float16', 'int8')) -> Dict[str, str]:
+    """
+    Writes the weight arrays and the quantized TFLite models of a trained model.
+    The int8 model is skipped with a message if there are no representative windows.
+
+    Parameters:
+        model (tf.keras.Model): The trained, built model.
+        output_folder (str): Folder to write the files into.
+        representative_windows (np.ndarray): Sample inputs to calibrate the int8 ranges.
+        quantizations (Iterable[str]): The TFLite variants to write.
+
+    Returns:
+        Dict[str, str]: Path of every written file by format ('numpy', 'float16', 'int8').
+    """
+    paths = {'numpy': os.path.join(output_folder, WEIGHTS_FILE)}
+    to_numpy_predictor(model).save(paths['numpy'])
+    for quantization in quantizations:
+        if quantization == 'int8' and (representative_windows is None or len(representative_windows) == 0):
+            # the converter can not calibrate the value ranges without sample inputs
+            print("Skipped the int8 model, there are no representative windows.")
+            continue
+        paths[quantization] = os.path.join(output_folder, TFLITE_FILES[quantization])
+        with open(paths[quantization], 'wb') as file:
+            file.write(to_tflite(model, quantization, representative_windows))
+    return paths
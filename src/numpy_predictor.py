@@ -0,0 +1,103 @@
+"""
+This module provides a forward pass of the trained dense network in pure NumPy.
+Classification workers load the weight arrays written by src.model_export and predict
+without importing TensorFlow, which keeps their start time and memory footprint small.
+"""
+
+from typing import Dict, List
+
+import numpy as np
+
+# File names of the exported model, kept here so workers find them without importing TensorFlow
+WEIGHTS_FILE = "model_weights.npz"
+TFLITE_FILES = {'float16': "model_float16.tflite", 'int8': "model_int8.tflite"}
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0, out=x),
+    'sigmoid': lambda x: np.reciprocal(1 + np.exp(-x, out=x), out=x),
+}
+
+
+class NumpyPredictor:
+    """
+    A class reproducing the outputs of a Sequential model of Flatten and Dense layers.
+
+    Attributes:
+        kernels: Weight matrix of every Dense layer.
+        biases: Bias vector of every Dense layer.
+        activations: Name of the activation of every Dense layer, see ACTIVATIONS.
+    """
+
+    def __init__(self, kernels: List[np.ndarray], biases: List[np.ndarray], activations: List[str]):
+        unknown = set(activations) - set(ACTIVATIONS)
+        if unknown:
+            raise ValueError(f"Unsupported activations: {sorted(unknown)}")
+        self.kernels = [np.ascontiguousarray(kernel, dtype=np.float32) for kernel in kernels]
+        self.biases = [np.asarray(bias, dtype=np.float32) for bias in biases]
+        self.activations = list(activations)
+
+    def predict(self, windows: np.ndarray) -> np.ndarray:
+        """
+        Predicts the output of the model for a batch of windows.
+
+        Parameters:
+            windows (np.ndarray): Model inputs, the first axis is the batch axis.
+
+        Returns:
+            np.ndarray: float32 array of shape (batch, outputs).
+        """
+        values = np.asarray(windows, dtype=np.float32).reshape((len(windows), -1))
+        if values.shape[1] != self.input_size:
+            raise ValueError(f"The model expects {self.input_size} input values per window, got {values.shape[1]}.")
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            values = values @ kernel
+            values += bias
+            values = ACTIVATIONS[activation](values)
+        return values
+
+    @property
+    def input_size(self) -> int:
+        return self.kernels[0].shape[0]
+
+    def __call__(self, windows: np.ndarray) -> np.ndarray:
+        return self.predict(windows)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the parameters in the layout of the weight file.
+
+        Returns:
+            Dict[str, np.ndarray]: kernel_<i> and bias_<i> of every layer and the activations.
+        """
+        arrays = {'activations': np.array(self.activations)}
+        for layer, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f"kernel_{layer}"] = kernel
+            arrays[f"bias_{layer}"] = bias
+        return arrays
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the weights as NumPy archive.
+
+        Parameters:
+            file_path (str): Path of the weight file.
+        """
+        np.savez(file_path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, file_path: str) -> 'NumpyPredictor':
+        """
+        Loads a weight file saved by save.
+
+        Parameters:
+            file_path (str): Path of the weight file.
+
+        Returns:
+            NumpyPredictor: The restored predictor.
+        """
+        with np.load(file_path) as weights:
+            activations = [str(activation) for activation in weights['activations']]
+            kernels = [weights[f"kernel_{layer}"] for layer in range(len(activations))]
+            biases = [weights[f"bias_{layer}"] for layer in range(len(activations))]
+        return cls(kernels, biases, activations)
@@ -0,0 +1,263 @@
+"""
+This module computes origin-destination (OD) matrices of the extracted trips: how many trips lead
+from which zone to which zone, per hour of day (local hour of the trip start). Zones are either the cells
+of a regular lat/lon grid or the polygons of a GeoJSON FeatureCollection (one zone per feature).
+
+All trips are handled in one vectorized pass: the start and end points of all trips are mapped to
+zones at once and every (hour, origin, destination) combination is encoded as one integer key that
+is counted with np.bincount. Only combinations with trips are kept, so the result is a sparse
+matrix in coordinate form (one row per hour, origin and destination) and stays small even for
+thousands of zones.
+"""
+
+import json
+from typing import Any, Dict, Tuple
+
+import folium
+import numpy as np
+import pandas as pd
+
+from src.regions import DEFAULT_GRID_SIZE, PolygonRegion
+
+HOURS = 24
+NO_ZONE = -1
+# The raw timestamps are UTC, the hour of day is counted in the local time of the data
+DEFAULT_TIMEZONE = 'Europe/Berlin'
+# Up to this number of (hour, origin, destination) keys the counts are computed with one np.bincount,
+# above the keys are counted with np.unique, which only needs memory for the trips
+MAX_DENSE_KEYS = 1 << 24
+MATRIX_COLUMNS = ['hour', 'origin', 'destination', 'trips']
+ZONE_COLUMNS = ['zone', 'name', 'lat', 'lon']
+FLOW_COLOR = 'purple'
+
+
+class GridZones:
+    """
+    A class mapping coordinates to the cells of a regular lat/lon grid.
+    Only cells containing a start or end point become zones.
+
+    Attributes:
+        cell_size: Edge length of a grid cell in degrees.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("The cell size has to be positive.")
+        self.cell_size = cell_size
+
+    def assign(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Maps coordinates to zones.
+
+        Parameters:
+            lat, lon (np.ndarray): Coordinates of the points.
+
+        Returns:
+            Tuple[np.ndarray, pd.DataFrame]: The zone of every point and the zones with their
+            'zone' number, 'name' and center 'lat' and 'lon'.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if len(lat) == 0:
+            return np.zeros(0, dtype=np.int64), pd.DataFrame(columns=ZONE_COLUMNS)
+        rows = np.floor(lat / self.cell_size).astype(np.int64)
+        cols = np.floor(lon / self.cell_size).astype(np.int64)
+        col_span = cols.max() - cols.min() + 1
+        cells, zones = np.unique((rows - rows.min()) * col_span + (cols - cols.min()), return_inverse=True)
+        center_lat = (cells // col_span + rows.min() + 0.5) * self.cell_size
+        center_lon = (cells % col_span + cols.min() + 0.5) * self.cell_size
+        return zones.astype(np.int64), pd.DataFrame({
+            'zone': np.arange(len(cells)),
+            'name': [f"{zone_lat:.4f}, {zone_lon:.4f}" for zone_lat, zone_lon in zip(center_lat, center_lon)],
+            'lat': center_lat,
+            'lon': center_lon,
+        })
+
+
+class PolygonZones:
+    """
+    A class mapping coordinates to the zones of a GeoJSON FeatureCollection, one zone per feature.
+    The name of a zone is the property 'name' of its feature. Points in several zones belong to
+    the first one, points outside of all zones to none.
+
+    Attributes:
+        names: The name of every zone.
+        regions: The PolygonRegion of every zone.
+    """
+
+    def __init__(self, geojson: Dict[str, Any], grid_size: int = DEFAULT_GRID_SIZE):
+        features = geojson['features'] if geojson['type'] == 'FeatureCollection' else [geojson]
+        if not features:
+            raise ValueError("The GeoJSON object contains no zone.")
+        self.names = [str((feature.get('properties') or {}).get('name', index))
+                      for index, feature in enumerate(features)]
+        self.regions = [PolygonRegion(feature, grid_size) for feature in features]
+
+    @classmethod
+    def load(cls, file_path: str, grid_size: int = DEFAULT_GRID_SIZE) -> 'PolygonZones':
+        """
+        Loads the zones from a GeoJSON file.
+
+        Parameters:
+            file_path (str): Path of the GeoJSON file.
+            grid_size (int): Number of grid rows and columns of the point-in-polygon test per zone.
+
+        Returns:
+            PolygonZones: The zones.
+        """
+        with open(file_path, 'r') as file:
+            return cls(json.load(file), grid_size)
+
+    def assign(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Maps coordinates to zones, see GridZones.assign. Points outside of all zones get NO_ZONE.
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        zones = np.full(len(lat), NO_ZONE, dtype=np.int64)
+        for zone, region in enumerate(self.regions):
+            open_points = np.flatnonzero(zones == NO_ZONE)
+            zones[open_points[region.in_center(lat[open_points], lon[open_points])]] = zone
+        return zones, pd.DataFrame({
+            'zone': np.arange(len(self.regions)),
+            'name': self.names,
+            'lat': [(region.min_lat + region.max_lat) / 2 for region in self.regions],
+            'lon': [(region.min_lon + region.max_lon) / 2 for region in self.regions],
+        })
+
+
+def od_counts(hours: np.ndarray, origins: np.ndarray, destinations: np.ndarray, zone_count: int) -> pd.DataFrame:
+    """
+    Counts the trips per hour, origin and destination.
+
+    Parameters:
+        hours (np.ndarray): Hour of day (0 to 23) of every trip.
+        origins, destinations (np.ndarray): Zone of the start and end point of every trip.
+        zone_count (int): Number of zones.
+
+    Returns:
+        pd.DataFrame: One row per combination with trips, see MATRIX_COLUMNS, ordered by hour,
+        origin and destination.
+    """
+    if zone_count == 0:
+        return pd.DataFrame(columns=MATRIX_COLUMNS)
+    keys = (np.asarray(hours, dtype=np.int64) * zone_count + origins) * zone_count + destinations
+    if HOURS * zone_count * zone_count <= MAX_DENSE_KEYS:
+        counts = np.bincount(keys, minlength=HOURS * zone_count * zone_count)
+        keys = np.flatnonzero(counts)
+        counts = counts[keys]
+    else:
+        keys, counts = np.unique(keys, return_counts=True)
+    return pd.DataFrame({
+        'hour': keys // (zone_count * zone_count),
+        'origin': keys // zone_count % zone_count,
+        'destination': keys % zone_count,
+        'trips': counts,
+    })
+
+
+def compute_od_matrix(collection, zoning, timezone: str = DEFAULT_TIMEZONE) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Computes the OD matrix per hour of day of all trips of a collection.
+    Trips starting or ending outside of all zones are not counted.
+
+    Parameters:
+        collection (TripCollection): The trips, with timestamps.
+        zoning (GridZones | PolygonZones): The zones the start and end points are mapped to.
+        timezone (str): Time zone the hour of day is taken in, the timestamps are UTC epoch seconds.
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: The sparse matrix (see od_counts) and the zones.
+    """
+    points = collection.points
+    if 'timestamp' not in points:
+        raise ValueError("The OD matrix per hour needs the timestamps of the trips.")
+    first_points = collection.starts
+    last_points = collection.ends - 1
+    lat = np.concatenate((np.asarray(points['lat'][first_points]), np.asarray(points['lat'][last_points])))
+    lon = np.concatenate((np.asarray(points['lon'][first_points]), np.asarray(points['lon'][last_points])))
+    zones, zone_table = zoning.assign(lat, lon)
+    origins, destinations = zones[:len(first_points)], zones[len(first_points):]
+    start_times = pd.to_datetime(np.asarray(points['timestamp'][first_points], dtype=np.int64), unit='s', utc=True)
+    hours = start_times.tz_convert(timezone).hour.to_numpy(dtype=np.int64)
+    in_zones = (origins != NO_ZONE) & (destinations != NO_ZONE)
+    return od_counts(hours[in_zones], origins[in_zones], destinations[in_zones], len(zone_table)), zone_table
+
+
+def hourly_matrix(matrix: pd.DataFrame, zone_count: int, hour: int = None) -> np.ndarray:
+    """
+    Returns the OD matrix of one hour, or of the whole day, as dense array.
+
+    Parameters:
+        matrix (pd.DataFrame): The sparse matrix as returned by od_counts.
+        zone_count (int): Number of zones.
+        hour (int): Hour of day, None for the sum over all hours.
+
+    Returns:
+        np.ndarray: Trips from origin (row) to destination (column), shape (zone_count, zone_count).
+    """
+    if hour is not None:
+        matrix = matrix[matrix['hour'] == hour]
+    keys = matrix['origin'].to_numpy(dtype=np.int64) * zone_count + matrix['destination'].to_numpy(dtype=np.int64)
+    counts = np.bincount(keys, weights=matrix['trips'].to_numpy(), minlength=zone_count * zone_count)
+    return counts.astype(np.int64).reshape(zone_count, zone_count)
+
+
+def top_flows(matrix: pd.DataFrame, zones: pd.DataFrame, count: int) -> pd.DataFrame:
+    """
+    Returns the origin-destination pairs with the most trips over the whole day.
+
+    Parameters:
+        matrix (pd.DataFrame): The sparse matrix as returned by od_counts.
+        zones (pd.DataFrame): The zones as returned by the zoning.
+        count (int): Maximum number of flows.
+
+    Returns:
+        pd.DataFrame: 'origin', 'destination', 'trips' and the names and centers of both zones,
+        ordered by decreasing trips.
+    """
+    zone_count = len(zones)
+    pairs, pair_index = np.unique(matrix['origin'].to_numpy(dtype=np.int64) * zone_count
+                                  + matrix['destination'].to_numpy(dtype=np.int64), return_inverse=True)
+    trips = np.bincount(pair_index, weights=matrix['trips'].to_numpy(), minlength=len(pairs)).astype(np.int64)
+    top = np.argsort(-trips, kind='stable')[:count]
+    origins, destinations = pairs[top] // zone_count, pairs[top] % zone_count
+    names, center_lat, center_lon = (zones[column].to_numpy() for column in ['name', 'lat', 'lon'])
+    return pd.DataFrame({
+        'origin': origins,
+        'destination': destinations,
+        'trips': trips[top],
+        'origin_name': names[origins],
+        'destination_name': names[destinations],
+        'origin_lat': center_lat[origins],
+        'origin_lon': center_lon[origins],
+        'destination_lat': center_lat[destinations],
+        'destination_lon': center_lon[destinations],
+    })
+
+
+def add_flow_layer(car_map: folium.Map, flows: pd.DataFrame, name: str = "Verkehrsströme",
+                   max_weight: float = 10.0) -> None:
+    """
+    Adds the flows as one layer of lines between the zone centers to the map, the line width grows
+    with the number of trips. Trips within one zone are drawn as circle.
+
+    Parameters:
+        car_map (folium.Map): The map the layer is added to.
+        flows (pd.DataFrame): Flows as returned by top_flows.
+        name (str): Name of the layer.
+        max_weight (float): Line width in pixels of the flow with the most trips.
+    """
+    if flows.empty:
+        return
+    layer = folium.FeatureGroup(name=f"{name} ({len(flows)})")
+    weights = 1 + (max_weight - 1) * flows['trips'].to_numpy() / flows['trips'].max()
+    for flow, weight in zip(flows.itertuples(index=False), weights):
+        tooltip = f"{flow.origin_name} → {flow.destination_name}: {flow.trips} Fahrten"
+        if flow.origin == flow.destination:
+            folium.CircleMarker(location=[flow.origin_lat, flow.origin_lon], radius=float(weight), color=FLOW_COLOR,
+                                fill=False, weight=2, tooltip=tooltip).add_to(layer)
+        else:
+            folium.PolyLine([[flow.origin_lat, flow.origin_lon], [flow.destination_lat, flow.destination_lon]],
+                            color=FLOW_COLOR, weight=float(weight), opacity=0.7, tooltip=tooltip).add_to(layer)
+    layer.add_to(car_map)
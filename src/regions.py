@@ -0,0 +1,196 @@
+"""
+This module provides the classification of trips by a fixed region polygon, e.g. a city boundary.
+Unlike the center box of CoordTools, the region does not depend on the extent of the data, so the
+trip types stay the same for every data file. The polygon is read from a GeoJSON file
+(Polygon, MultiPolygon, Feature or FeatureCollection, holes are supported).
+
+The point-in-polygon test is vectorized. A grid over the bounding box of the polygon is computed
+once: cells no polygon edge passes through are completely inside or outside, so most points are
+classified by a single lookup. Only points in cells on the boundary are tested exactly by counting
+the crossings of a ray with the polygon edges, and only against the edges of their grid row.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.coordtools import CenterClassifier
+
+DEFAULT_GRID_SIZE = 128
+# Maximum number of point/edge pairs tested at once by the exact test
+PAIRS_PER_BLOCK = 2 ** 22
+
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+
+def _rings_of(geojson: Dict[str, Any]) -> List[np.ndarray]:
+    """
+    Returns all rings of the polygons in a GeoJSON object as (lon, lat) arrays.
+    """
+    kind = geojson['type']
+    if kind == 'FeatureCollection':
+        return [ring for feature in geojson['features'] for ring in _rings_of(feature)]
+    if kind == 'Feature':
+        return _rings_of(geojson['geometry'])
+    if kind == 'Polygon':
+        return [np.asarray(ring, dtype=np.float64)[:, :2] for ring in geojson['coordinates']]
+    if kind == 'MultiPolygon':
+        return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in geojson['coordinates'] for ring in polygon]
+    raise ValueError(f"GeoJSON type {kind} is not a polygon.")
+
+
+class PolygonRegion(CenterClassifier):
+    """
+    A class to classify coordinates into inside and outside of a region polygon.
+    It shares the classification of CoordTools (CenterClassifier) and can be used in its place.
+
+    Attributes:
+        geojson: The GeoJSON object of the region.
+        grid_size: Number of grid rows and columns over the bounding box of the polygon.
+        min_lat, min_lon, max_lat, max_lon: Bounding box of the polygon.
+        cells: State (OUTSIDE, INSIDE or BOUNDARY) of every grid cell, shape (grid_size, grid_size).
+        edges: Start and end point of every polygon edge as (lon0, lat0, lon1, lat1) rows.
+        row_edges, row_offsets: The edges overlapping grid row r are row_edges[row_offsets[r]:row_offsets[r + 1]].
+    """
+
+    def __init__(self, geojson: Dict[str, Any], grid_size: int = DEFAULT_GRID_SIZE):
+        """
+        Prepares the grid of the region polygon.
+
+        Parameters:
+            geojson (Dict[str, Any]): GeoJSON object containing the polygon(s) of the region.
+            grid_size (int): Number of grid rows and columns, more cells mean fewer exact tests.
+        """
+        self.geojson = geojson
+        self.grid_size = grid_size
+        rings = _rings_of(geojson)
+        if not rings:
+            raise ValueError("The GeoJSON object contains no polygon.")
+        self.edges = np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings])
+        points = np.concatenate(rings)
+        self.min_lon, self.min_lat = (float(value) for value in points.min(axis=0))
+        self.max_lon, self.max_lat = (float(value) for value in points.max(axis=0))
+        self.cell_lat = max(self.max_lat - self.min_lat, 1e-12) / grid_size
+        self.cell_lon = max(self.max_lon - self.min_lon, 1e-12) / grid_size
+        self._index_row_edges()
+        self._compute_cells()
+
+    @classmethod
+    def load(cls, file_path: str, grid_size: int = DEFAULT_GRID_SIZE) -> 'PolygonRegion':
+        """
+        Loads a region from a GeoJSON file.
+
+        Parameters:
+            file_path (str): Path of the GeoJSON file.
+            grid_size (int): Number of grid rows and columns.
+
+        Returns:
+            PolygonRegion: The region.
+        """
+        with open(file_path, 'r') as file:
+            return cls(json.load(file), grid_size)
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the region polygon as GeoJSON file.
+
+        Parameters:
+            file_path (str): Path of the GeoJSON file.
+        """
+        with open(file_path, 'w') as file:
+            json.dump(self.geojson, file)
+
+    def _rows_of(self, lat: np.ndarray) -> np.ndarray:
+        return np.clip(((lat - self.min_lat) // self.cell_lat).astype(np.int64), 0, self.grid_size - 1)
+
+    def _cols_of(self, lon: np.ndarray) -> np.ndarray:
+        return np.clip(((lon - self.min_lon) // self.cell_lon).astype(np.int64), 0, self.grid_size - 1)
+
+    def _index_row_edges(self) -> None:
+        lat0, lat1 = self.edges[:, 1], self.edges[:, 3]
+        first_rows = self._rows_of(np.minimum(lat0, lat1))
+        last_rows = self._rows_of(np.maximum(lat0, lat1))
+        counts = last_rows - first_rows + 1
+        edge_ids = np.repeat(np.arange(len(self.edges)), counts)
+        rows = np.repeat(first_rows, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.argsort(rows, kind='stable')
+        self.row_edges = edge_ids[order]
+        self.row_offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=self.grid_size))])
+        self._pair_rows, self._pair_edges = rows, edge_ids
+
+    def _compute_cells(self) -> None:
+        # the part of every edge inside a grid row covers the columns between its clipped end points
+        lon0, lat0, lon1, lat1 = (self.edges[self._pair_edges, column] for column in range(4))
+        bottom = self.min_lat + self._pair_rows * self.cell_lat
+        low = np.clip(np.minimum(lat0, lat1), bottom, bottom + self.cell_lat)
+        high = np.clip(np.maximum(lat0, lat1), bottom, bottom + self.cell_lat)
+        flat = lat0 == lat1
+        slope = np.where(flat, 0.0, (lon1 - lon0) / np.where(flat, 1.0, lat1 - lat0))
+        lon_low = np.where(flat, lon0, lon0 + (low - lat0) * slope)
+        lon_high = np.where(flat, lon1, lon0 + (high - lat0) * slope)
+        first_cols = self._cols_of(np.minimum(lon_low, lon_high))
+        counts = self._cols_of(np.maximum(lon_low, lon_high)) - first_cols + 1
+        cols = np.repeat(first_cols, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        self.cells = np.full((self.grid_size, self.grid_size), OUTSIDE, dtype=np.int8)
+        self.cells[np.repeat(self._pair_rows, counts), cols] = BOUNDARY
+        # cells without edges are completely inside or outside, like their center
+        rows, cols = np.nonzero(self.cells != BOUNDARY)
+        centers_lat = self.min_lat + (rows + 0.5) * self.cell_lat
+        centers_lon = self.min_lon + (cols + 0.5) * self.cell_lon
+        self.cells[rows, cols] = np.where(self._exact_contains(centers_lat, centers_lon, rows), INSIDE, OUTSIDE)
+        del self._pair_rows, self._pair_edges
+
+    def _exact_contains(self, lat: np.ndarray, lon: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Even-odd test of points against the edges of their grid row.
+        A ray from every point to the east crosses the boundary an odd number of times if the point is inside.
+        """
+        inside = np.zeros(len(lat), dtype=bool)
+        order = np.argsort(rows, kind='stable')
+        bounds = np.searchsorted(rows[order], np.arange(self.grid_size + 1))
+        for row in np.flatnonzero(np.diff(bounds)):
+            edges = self.edges[self.row_edges[self.row_offsets[row]:self.row_offsets[row + 1]]]
+            if len(edges) == 0:
+                continue
+            lon0, lat0, lon1, lat1 = (edges[:, column] for column in range(4))
+            block = max(PAIRS_PER_BLOCK // len(edges), 1)
+            for start in range(bounds[row], bounds[row + 1], block):
+                points = order[start:min(start + block, bounds[row + 1])]
+                point_lat, point_lon = lat[points, None], lon[points, None]
+                crosses = (lat0 > point_lat) != (lat1 > point_lat)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    crossing_lon = lon0 + (point_lat - lat0) * (lon1 - lon0) / (lat1 - lat0)
+                inside[points] = np.count_nonzero(crosses & (point_lon < crossing_lon), axis=1) % 2 == 1
+        return inside
+
+    def in_center(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        flat_lat, flat_lon = lat.ravel(), lon.ravel()
+        inside = np.zeros(len(flat_lat), dtype=bool)
+        candidates = np.flatnonzero((self.min_lat <= flat_lat) & (flat_lat <= self.max_lat)
+                                    & (self.min_lon <= flat_lon) & (flat_lon <= self.max_lon))
+        rows = self._rows_of(flat_lat[candidates])
+        states = self.cells[rows, self._cols_of(flat_lon[candidates])]
+        inside[candidates[states == INSIDE]] = True
+        boundary = states == BOUNDARY
+        points = candidates[boundary]
+        inside[points] = self._exact_contains(flat_lat[points], flat_lon[points], rows[boundary])
+        return inside.reshape(lat.shape)
+
+
+def load_region() -> Optional[PolygonRegion]:
+    """
+    Loads the region configured in config/regions.yaml.
+
+    Returns:
+        Optional[PolygonRegion]: The region, None if no polygon is configured.
+    """
+    regions_config_store = ConfigStoreManager.add("regions", "config/regions.yaml")
+    polygon_path = regions_config_store.get("polygon", None)
+    if not polygon_path:
+        return None
+    return PolygonRegion.load(polygon_path, regions_config_store.get("grid_size", DEFAULT_GRID_SIZE))
@@ -0,0 +1,107 @@
+"""
+This module resamples trips to fixed time or distance steps, so that every model window covers
+the same time span or driven distance regardless of how densely a trip was recorded.
+
+All trips are interpolated with one np.interp call per column: the trips are laid out one after
+another on a single increasing axis (time or driven distance since the trip start, plus an offset
+per trip that keeps the trips apart), so no Python loop runs per trip. The heading is interpolated
+as unit vector to handle the wrap around at 360 degrees. The number of points per trip can be
+capped, longer trips keep their first points.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.coordtools import haversine
+
+MODES = ['time', 'distance']
+INTERPOLATED_COLUMNS = ['lat', 'lon', 'speed']
+
+
+class Resampling:
+    """
+    A class to resample trips to a fixed step.
+
+    Attributes:
+        mode: 'time' for a step in seconds or 'distance' for a step in meters.
+        step: The step between two resampled points.
+        max_points: Maximum number of points per trip, None for no limit.
+    """
+
+    def __init__(self, mode: str, step: float, max_points: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown resampling mode {mode}, use one of {MODES}.")
+        if step <= 0:
+            raise ValueError("The resampling step has to be positive.")
+        self.mode = mode
+        self.step = float(step)
+        self.max_points = max_points
+
+    @classmethod
+    def from_config(cls, config_store) -> Optional['Resampling']:
+        """
+        Creates the resampling from the keys 'resample', 'resample_step' and 'max_points_per_trip'.
+
+        Parameters:
+            config_store (ConfigStore): The machine learning configuration.
+
+        Returns:
+            Optional[Resampling]: The resampling, None if 'resample' is not set.
+        """
+        mode = config_store.get("resample", None)
+        if not mode:
+            return None
+        return cls(mode, config_store.get("resample_step", 100), config_store.get("max_points_per_trip", None))
+
+    def apply(self, points: Dict[str, np.ndarray], trip_starts: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Resamples trips stored as consecutive runs of points.
+
+        Parameters:
+            points (Dict[str, np.ndarray]): The columns 'lat', 'lon', 'heading' and 'speed', for the time
+                mode also 'timestamp' (epoch seconds), ordered by trip and timestamp.
+            trip_starts (np.ndarray): Index of the first point of every trip, ascending.
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], np.ndarray]: The resampled columns and the index of the first
+            resampled point of every trip. Every trip keeps at least its first point.
+        """
+        trip_starts = np.asarray(trip_starts, dtype=np.int64)
+        point_count = len(points['lat'])
+        if len(trip_starts) == 0:
+            return {column: np.zeros(0) for column in points}, trip_starts
+        if self.mode == 'time' and 'timestamp' not in points:
+            raise ValueError("Resampling by time needs the timestamps of all points.")
+        trip_ends = np.append(trip_starts[1:], point_count) - 1
+        trip_of_point = np.repeat(np.arange(len(trip_starts)), trip_ends - trip_starts + 1)
+
+        if self.mode == 'time':
+            position = np.asarray(points['timestamp'], dtype=np.float64)
+        else:
+            lat, lon = np.asarray(points['lat']), np.asarray(points['lon'])
+            steps = np.zeros(point_count)
+            steps[1:] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+            position = np.cumsum(steps)
+        # time or distance since the start of the trip, the trips are placed apart on one axis
+        position = position - position[trip_starts][trip_of_point]
+        spans = position[trip_ends]
+        trip_offsets = np.cumsum(spans + self.step) - (spans + self.step)
+        axis = position + trip_offsets[trip_of_point]
+
+        counts = np.floor(spans / self.step).astype(np.int64) + 1
+        if self.max_points is not None:
+            counts = np.minimum(counts, self.max_points)
+        new_starts = np.cumsum(counts) - counts
+        new_trip = np.repeat(np.arange(len(trip_starts)), counts)
+        targets = trip_offsets[new_trip] + (np.arange(counts.sum()) - new_starts[new_trip]) * self.step
+
+        resampled = {column: np.interp(targets, axis, np.asarray(points[column], dtype=np.float64))
+                     for column in INTERPOLATED_COLUMNS}
+        heading = np.radians(np.asarray(points['heading'], dtype=np.float64))
+        resampled['heading'] = np.degrees(np.arctan2(np.interp(targets, axis, np.sin(heading)),
+                                                     np.interp(targets, axis, np.cos(heading)))) % 360
+        if 'timestamp' in points:
+            seconds = np.interp(targets, axis, np.asarray(points['timestamp'], dtype=np.float64))
+            resampled['timestamp'] = np.round(seconds).astype(np.int64)
+        return resampled, new_starts
@@ -0,0 +1,326 @@
+"""
+This module provides the vectorized trip segmentation used by the trip extraction scripts.
+The position data of every car is split into single trips wherever two consecutive data
+points are further apart than a configurable time threshold. Trips with too few data points
+are dropped and the remaining trips are numbered and classified by their start and end point.
+"""
+
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import CleaningRules
+from src.dataloader import FLOAT_COLUMNS, ID_CATEGORIES, TIMESTAMP_FORMAT, columns_to_frame, load_columns
+from src.instrumentation import Progress, count, stage
+
+TRIP_COLUMN = "Fahrtnummer"
+TYPE_COLUMN = "Typ"
+ROW_ESTIMATE_SAMPLE_BYTES = 1 << 16
+
+# Set once per worker process by _init_worker, holds the arguments shared by all shards.
+_worker_context: dict = {}
+
+
+def to_epoch_seconds(timestamps: pd.Series) -> np.ndarray:
+    """
+    Converts a timestamp column of any of the trip file formats into epoch seconds.
+
+    Parameters:
+        timestamps (pd.Series): Datetime values, integer epoch seconds or timestamp strings.
+
+    Returns:
+        np.ndarray: The timestamps as int64 epoch seconds.
+
+    Raises:
+        ValueError: If a timestamp is missing.
+    """
+    # missing values would become arbitrary integers, e.g. when only some trips of a batch have timestamps
+    if timestamps.isna().any():
+        raise ValueError(f"{int(timestamps.isna().sum())} points have no timestamp.")
+    if pd.api.types.is_numeric_dtype(timestamps):
+        return timestamps.to_numpy(dtype=np.int64)
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps)
+    return timestamps.values.astype("datetime64[s]").astype(np.int64)
+
+
+def _car_keys(car_ids: pd.Series) -> np.ndarray:
+    """
+    Returns an array that compares equal exactly where the car ids are equal.
+
+    Parameters:
+        car_ids (pd.Series): The car id column, either categorical or plain values.
+
+    Returns:
+        np.ndarray: The category codes for categorical ids, otherwise the plain values.
+    """
+    if isinstance(car_ids.dtype, pd.CategoricalDtype):
+        return car_ids.cat.codes.to_numpy()
+    return car_ids.to_numpy()
+
+
+def trip_boundaries(car_ids: np.ndarray, seconds: np.ndarray, time_threshold: float) -> np.ndarray:
+    """
+    Marks every data point that starts a new trip.
+    The input has to be sorted by car id and timestamp.
+
+    Parameters:
+        car_ids (np.ndarray): Car id of every data point.
+        seconds (np.ndarray): Timestamp of every data point in epoch seconds.
+        time_threshold (float): Maximum gap in seconds between two points of the same trip.
+
+    Returns:
+        np.ndarray: Boolean array, True for the first data point of each trip.
+    """
+    starts = np.ones(len(car_ids), dtype=bool)
+    if len(car_ids) > 1:
+        starts[1:] = (car_ids[1:] != car_ids[:-1]) | (np.diff(seconds) > time_threshold)
+    return starts
+
+
+def clean_data(data: pd.DataFrame, cleaning: CleaningRules) -> pd.DataFrame:
+    """
+    Applies the cleaning rules to position data and records the removed rows per rule.
+
+    Parameters:
+        data (pd.DataFrame): Position data sorted by car id and timestamp, with the columns 'id',
+            'timestamp', 'lat', 'lon' and 'speed'.
+        cleaning (CleaningRules): The cleaning rules.
+
+    Returns:
+        pd.DataFrame: The kept rows.
+    """
+    with stage("clean", len(data)):
+        keep, counts = cleaning.mask(_car_keys(data['id']), to_epoch_seconds(data['timestamp']),
+                                     data['lat'].to_numpy(), data['lon'].to_numpy(), data['speed'].to_numpy())
+        count("cleaning", counts)
+    return data.loc[keep].reset_index(drop=True)
+
+
+def segment_trips(data: pd.DataFrame, time_threshold: float, min_data_points: int,
+                  coord_tools=None, first_trip_number: int = 0, cleaning: CleaningRules = None) -> pd.DataFrame:
+    """
+    Splits the position data of all cars into single trips.
+
+    A trip ends as soon as the next data point of the same car is more than time_threshold
+    seconds away. Only trips with more than min_data_points data points are kept.
+
+    Parameters:
+        data (pd.DataFrame): Position data with at least the columns 'id', 'timestamp', 'lat' and 'lon'.
+        time_threshold (float): Maximum gap in seconds between two points of the same trip.
+        min_data_points (int): Trips with this many data points or fewer are dropped.
+        coord_tools: Optional CoordTools instance used to classify each trip into 'Typ'.
+        first_trip_number (int): Number assigned to the first trip found.
+        cleaning (CleaningRules): Optional rules removing duplicates, GPS jumps and standing points first.
+
+    Returns:
+        pd.DataFrame: The kept data points sorted by trip and timestamp, extended by the
+        columns 'Fahrtnummer' and 'Typ'.
+    """
+    data = data.sort_values(by=['id', 'timestamp'], kind='stable', ignore_index=True)
+    seconds = to_epoch_seconds(data['timestamp'])
+    if cleaning is not None:
+        data = clean_data(data, cleaning)
+        seconds = to_epoch_seconds(data['timestamp'])
+
+    trip_index = np.cumsum(trip_boundaries(_car_keys(data['id']), seconds, time_threshold)) - 1
+    trip_sizes = np.bincount(trip_index) if len(trip_index) else np.zeros(0, dtype=np.int64)
+    keep = trip_sizes[trip_index] > min_data_points
+
+    trips = data.loc[keep].reset_index(drop=True)
+    kept_index = trip_index[keep]
+    starts = np.ones(len(kept_index), dtype=bool)
+    starts[1:] = kept_index[1:] != kept_index[:-1]
+    trips[TRIP_COLUMN] = np.cumsum(starts) - 1 + first_trip_number
+    trips[TYPE_COLUMN] = None
+
+    if coord_tools is not None and len(trips):
+        with stage("classify") as record:
+            lat, lon = trips['lat'].to_numpy(), trips['lon'].to_numpy()
+            ends = np.append(starts[1:], True)
+            types = coord_tools.classify_labels(lat[starts], lon[starts], lat[ends], lon[ends])
+            trips[TYPE_COLUMN] = np.repeat(types, np.diff(np.append(np.flatnonzero(starts), len(trips))))
+            record.add(len(types))
+    return trips
+
+
+def _estimate_row_count(csv_path: str) -> int:
+    """
+    Estimates the number of rows of a CSV file from the line length at its beginning.
+
+    Parameters:
+        csv_path (str): Path of the CSV file.
+
+    Returns:
+        int: The estimated number of data rows.
+    """
+    with open(csv_path, 'rb') as file:
+        sample = file.read(ROW_ESTIMATE_SAMPLE_BYTES)
+    lines = max(sample.count(b"\n"), 1)
+    return math.ceil(os.path.getsize(csv_path) / (len(sample) / lines))
+
+
+def _spill_partitions(csv_path: str, temp_folder: str, chunk_size: int) -> list:
+    """
+    Reads a CSV file in chunks and distributes its rows into partition files by the hash of the car id.
+    All data points of one car end up in the same partition.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        temp_folder (str): Folder the partition files are written to.
+        chunk_size (int): Number of rows read at once.
+
+    Returns:
+        list: Paths of the written partition files in partition order.
+    """
+    partition_count = max(1, math.ceil(_estimate_row_count(csv_path) / chunk_size))
+    paths = [os.path.join(temp_folder, f"partition_{number}.csv") for number in range(partition_count)]
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        partitions = pd.util.hash_pandas_object(chunk['id'], index=False).to_numpy() % partition_count
+        for number, partition in chunk.groupby(partitions):
+            path = paths[number]
+            partition.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+    return [path for path in paths if os.path.exists(path)]
+
+
+def segment_csv_streaming(csv_path: str, output_path: str, time_threshold: float, min_data_points: int,
+                          chunk_size: int, coord_tools=None,
+                          trips_callback: Callable[[pd.DataFrame], None] = None,
+                          cleaning: CleaningRules = None) -> int:
+    """
+    Splits the position data of a CSV file into single trips without loading the whole file.
+
+    The file is read in chunks of chunk_size rows and spilled into temporary partition files
+    by car id, sized so that each partition holds about chunk_size rows. Every partition is
+    segmented on its own and its trips are appended to the output file right away. Trips are
+    numbered consecutively in partition order.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        output_path (str): Path of the CSV file the trips are written to.
+        time_threshold (float): Maximum gap in seconds between two points of the same trip.
+        min_data_points (int): Trips with this many data points or fewer are dropped.
+        chunk_size (int): Number of rows held in memory at once.
+        coord_tools: Optional CoordTools instance used to classify each trip into 'Typ'.
+        trips_callback: Optional function called with the trips of every partition, e.g. to
+            append them to a trip store.
+        cleaning (CleaningRules): Optional rules applied to every partition before the segmentation.
+
+    Returns:
+        int: The number of trips written.
+    """
+    trip_count = 0
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    with tempfile.TemporaryDirectory() as temp_folder:
+        with stage("spill_partitions"):
+            paths = _spill_partitions(csv_path, temp_folder, chunk_size)
+        progress = Progress("Partitionen", len(paths))
+        for path in paths:
+            data = pd.read_csv(path, dtype={column: 'float32' for column in FLOAT_COLUMNS})
+            data['timestamp'] = pd.to_datetime(data['timestamp'], format=TIMESTAMP_FORMAT)
+            trips = segment_trips(data, time_threshold, min_data_points, coord_tools, trip_count, cleaning)
+            trips.to_csv(output_path, mode='a', header=not os.path.exists(output_path), index=False)
+            if trips_callback is not None:
+                trips_callback(trips)
+            trip_count += trips[TRIP_COLUMN].nunique()
+            progress.update()
+        progress.close()
+    return trip_count
+
+
+def _shard_bounds(car_ids: np.ndarray, shard_count: int) -> List[Tuple[int, int]]:
+    """
+    Splits rows sorted by car id into contiguous shards of similar size without splitting a car.
+
+    Parameters:
+        car_ids (np.ndarray): Sorted car id codes of all rows.
+        shard_count (int): Requested number of shards.
+
+    Returns:
+        List[Tuple[int, int]]: Start and end row of every non-empty shard.
+    """
+    car_starts = np.append(np.flatnonzero(np.diff(car_ids)) + 1, len(car_ids))
+    targets = np.linspace(0, len(car_ids), shard_count + 1)[1:-1]
+    cuts = np.unique(np.concatenate(([0], car_starts[np.searchsorted(car_starts, targets)], [len(car_ids)])))
+    return list(zip(cuts[:-1].tolist(), cuts[1:].tolist()))
+
+
+def _init_worker(csv_path: str, time_threshold: float, min_data_points: int, coord_tools,
+                 cleaning: CleaningRules) -> None:
+    _worker_context.update(csv_path=csv_path, time_threshold=time_threshold,
+                           min_data_points=min_data_points, coord_tools=coord_tools, cleaning=cleaning)
+
+
+def _segment_shard(bounds: Tuple[int, int]) -> Tuple[pd.DataFrame, int, Dict[str, int]]:
+    """
+    Segments one shard of the memory mapped cache inside a worker process.
+    The trips of the shard are numbered from 0, segment_parallel shifts them afterwards.
+
+    Parameters:
+        bounds (Tuple[int, int]): Start and end row of the shard.
+
+    Returns:
+        Tuple[pd.DataFrame, int, Dict[str, int]]: The trips of the shard, their number and the rows
+        removed per cleaning rule (the run report only exists in the parent process).
+    """
+    start, end = bounds
+    columns = load_columns(_worker_context["csv_path"], mmap=True)
+    shard = {column: values if column == ID_CATEGORIES else values[start:end]
+             for column, values in columns.items()}
+    data = columns_to_frame(shard)
+    removed = {}
+    cleaning = _worker_context["cleaning"]
+    if cleaning is not None:
+        # the cache is sorted by car id and timestamp, like the data segment_trips cleans
+        keep, removed = cleaning.mask(shard['id'], shard['timestamp'], shard['lat'], shard['lon'], shard['speed'])
+        data = data.loc[keep].reset_index(drop=True)
+    trips = segment_trips(data, _worker_context["time_threshold"], _worker_context["min_data_points"],
+                          _worker_context["coord_tools"])
+    trip_count = int(trips[TRIP_COLUMN].iloc[-1]) + 1 if len(trips) else 0
+    return trips, trip_count, removed
+
+
+def segment_parallel(csv_path: str, time_threshold: float, min_data_points: int, workers: int,
+                     coord_tools=None, cleaning: CleaningRules = None) -> pd.DataFrame:
+    """
+    Splits the position data of a CSV file into single trips using several processes.
+
+    The car ids are sharded into contiguous row ranges of the columnar cache. Workers memory map
+    the cache themselves, so only row ranges are sent to them. Every worker numbers its trips
+    from 0 and returns their count, the Fahrtnummer are then shifted by the prefix sums of the
+    counts, so the result is identical to segment_trips on the whole data.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        time_threshold (float): Maximum gap in seconds between two points of the same trip.
+        min_data_points (int): Trips with this many data points or fewer are dropped.
+        workers (int): Number of worker processes.
+        coord_tools: Optional CoordTools instance used to classify each trip into 'Typ'.
+        cleaning (CleaningRules): Optional rules removing duplicates, GPS jumps and standing points first.
+            The workers clean their shards, the removed rows are recorded here.
+
+    Returns:
+        pd.DataFrame: The trips, sorted by trip and timestamp.
+    """
+    columns = load_columns(csv_path, mmap=True)
+    bounds = _shard_bounds(np.asarray(columns['id']), workers)
+    if not bounds:
+        return segment_trips(columns_to_frame(columns), time_threshold, min_data_points, coord_tools,
+                             cleaning=cleaning)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(csv_path, time_threshold, min_data_points, coord_tools, cleaning)) as executor:
+        results = list(executor.map(_segment_shard, bounds))
+
+    trip_counts = np.array([trip_count for _, trip_count, _ in results])
+    offsets = np.cumsum(trip_counts) - trip_counts
+    for (trips, _, removed), offset in zip(results, offsets):
+        trips[TRIP_COLUMN] += offset
+        if cleaning is not None:
+            count("cleaning", removed)
+    return pd.concat([trips for trips, _, _ in results], ignore_index=True)
@@ -2,15 +2,17 @@ import os
 
 from src.ConfigManager.config_store import ConfigStoreManager
 
-config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
-BASE_INPUT_FOLDER = config_store["input_folder"]
-BASE_OUTPUT_FOLDER = config_store["output_folder"]
 
-setup_already_ran = config_store.get("setup_ran", False)
+def run_setup() -> None:
+    """
+    Creates the configured input and output folders if they do not exist yet.
+    """
+    config_store = ConfigStoreManager()[ConfigStoreManager.MAIN_CONFIG_NAME]
+    if config_store.get("setup_ran", False):
+        return
 
-if not setup_already_ran:
-    for folder in [BASE_INPUT_FOLDER, BASE_OUTPUT_FOLDER]:
+    for folder in [config_store["input_folder"], config_store["output_folder"]]:
         if not os.path.exists(folder):
             os.makedirs(folder)
 
-config_store.set_config_value("setup_ran", True)
\ No newline at end of file
+    config_store.set_config_value("setup_ran", True)
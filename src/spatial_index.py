@@ -0,0 +1,235 @@
+"""
+This module provides a spatio-temporal index over the cached position data.
+The points are assigned to the cells of a regular lat/lon grid and sorted by cell and timestamp.
+Cell and timestamp are combined into one sorted int64 key, so the points of any cell inside a
+time window are one contiguous range that is found by binary search. A bounding box and time
+window query only touches the cells overlapping the box instead of scanning all rows.
+
+The index is saved in the cache folder of the CSV file and is rebuilt together with the cache.
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from src.dataloader import ID_CATEGORIES, ensure_cache, load_columns
+
+INDEX_PREFIX = "spatial_index"
+TIME_BITS = 32
+DEFAULT_CELL_SIZE = 0.01
+
+TimeValue = Union[int, str, pd.Timestamp, None]
+
+
+def _to_seconds(value: TimeValue) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).value // 10 ** 9)
+
+
+class SpatioTemporalIndex:
+    """
+    A class answering bounding box and time window queries over the cached position data.
+
+    Attributes:
+        cell_size: Edge length of the grid cells in degrees.
+        min_lat, min_lon: South west corner of the grid.
+        rows, cols: Number of grid rows (lat) and columns (lon).
+        min_time: Earliest timestamp in epoch seconds, the time part of the keys is relative to it.
+        keys: Sorted key (cell << TIME_BITS | time offset) of every point.
+        order: Cache row of every point in key order.
+    """
+
+    def __init__(self, cell_size: float, min_lat: float, min_lon: float, rows: int, cols: int, min_time: int,
+                 keys: np.ndarray, order: np.ndarray):
+        self.cell_size = cell_size
+        self.min_lat = min_lat
+        self.min_lon = min_lon
+        self.rows = rows
+        self.cols = cols
+        self.min_time = min_time
+        self.keys = keys
+        self.order = order
+
+    @classmethod
+    def build(cls, columns: Dict[str, np.ndarray], cell_size: float = DEFAULT_CELL_SIZE) -> 'SpatioTemporalIndex':
+        """
+        Builds the index over cached columns.
+
+        Parameters:
+            columns (Dict[str, np.ndarray]): Columns as returned by load_columns.
+            cell_size (float): Edge length of the grid cells in degrees.
+
+        Returns:
+            SpatioTemporalIndex: The index.
+        """
+        lat = np.asarray(columns['lat'], dtype=np.float64)
+        lon = np.asarray(columns['lon'], dtype=np.float64)
+        seconds = np.asarray(columns['timestamp'])
+        if len(lat) == 0:
+            return cls(cell_size, 0.0, 0.0, 1, 1, 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        min_lat, min_lon, min_time = float(lat.min()), float(lon.min()), int(seconds.min())
+        if int(seconds.max()) - min_time >= 1 << TIME_BITS:
+            raise ValueError("The time span of the data is too large for the index.")
+        rows = int((lat.max() - min_lat) // cell_size) + 1
+        cols = int((lon.max() - min_lon) // cell_size) + 1
+        cells = ((lat - min_lat) // cell_size).astype(np.int64) * cols + ((lon - min_lon) // cell_size).astype(np.int64)
+        keys = (cells << TIME_BITS) | (seconds - min_time)
+        order = np.argsort(keys, kind='stable')
+        return cls(cell_size, min_lat, min_lon, rows, cols, min_time, keys[order], order)
+
+    def save(self, folder: str) -> None:
+        """
+        Saves the index into a folder, usually the cache folder.
+
+        Parameters:
+            folder (str): Target folder.
+        """
+        prefix = os.path.join(folder, f"{INDEX_PREFIX}_{self.cell_size}")
+        np.save(prefix + "_keys.npy", self.keys)
+        np.save(prefix + "_order.npy", self.order)
+        with open(prefix + ".json", 'w') as file:
+            json.dump({'cell_size': self.cell_size, 'min_lat': self.min_lat, 'min_lon': self.min_lon,
+                       'rows': self.rows, 'cols': self.cols, 'min_time': self.min_time}, file)
+
+    @classmethod
+    def load(cls, folder: str, cell_size: float, mmap: bool = True) -> Optional['SpatioTemporalIndex']:
+        """
+        Loads an index saved by save.
+
+        Parameters:
+            folder (str): Folder of the index.
+            cell_size (float): Cell size of the index.
+            mmap (bool): If True, the arrays are memory mapped.
+
+        Returns:
+            Optional[SpatioTemporalIndex]: The index, None if no index with this cell size was saved.
+        """
+        prefix = os.path.join(folder, f"{INDEX_PREFIX}_{cell_size}")
+        if not os.path.exists(prefix + ".json"):
+            return None
+        with open(prefix + ".json", 'r') as file:
+            meta = json.load(file)
+        mmap_mode = 'r' if mmap else None
+        return cls(keys=np.load(prefix + "_keys.npy", mmap_mode=mmap_mode),
+                   order=np.load(prefix + "_order.npy", mmap_mode=mmap_mode), **meta)
+
+    @classmethod
+    def load_or_build(cls, csv_path: str, cell_size: float = DEFAULT_CELL_SIZE) -> 'SpatioTemporalIndex':
+        """
+        Loads the index of a CSV file from its cache folder, or builds and saves it.
+
+        Parameters:
+            csv_path (str): Path of the raw CSV file.
+            cell_size (float): Edge length of the grid cells in degrees.
+
+        Returns:
+            SpatioTemporalIndex: The index.
+        """
+        cache_path = ensure_cache(csv_path)
+        index = cls.load(cache_path, cell_size)
+        if index is None:
+            index = cls.build(load_columns(csv_path), cell_size)
+            index.save(cache_path)
+        return index
+
+    def query(self, lat_min: float = -90, lat_max: float = 90, lon_min: float = -180, lon_max: float = 180,
+              start: TimeValue = None, end: TimeValue = None, columns: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """
+        Finds all points inside a bounding box and time window (both inclusive).
+
+        Only points of cells on the border of the box are compared with the box, this needs the
+        lat and lon columns. Without them the result contains all points of the overlapping cells.
+
+        Parameters:
+            lat_min, lat_max, lon_min, lon_max (float): The bounding box.
+            start, end: The time window as epoch seconds, timestamp or date string, None for open.
+            columns (Dict[str, np.ndarray]): The cached columns, used for the exact box test.
+
+        Returns:
+            np.ndarray: The cache rows of the points, in ascending order.
+        """
+        first_row = max(int((lat_min - self.min_lat) // self.cell_size), 0)
+        last_row = min(int((lat_max - self.min_lat) // self.cell_size), self.rows - 1)
+        first_col = max(int((lon_min - self.min_lon) // self.cell_size), 0)
+        last_col = min(int((lon_max - self.min_lon) // self.cell_size), self.cols - 1)
+        if len(self.keys) == 0 or first_row > last_row or first_col > last_col:
+            return np.zeros(0, dtype=np.int64)
+
+        grid_rows, grid_cols = np.meshgrid(np.arange(first_row, last_row + 1), np.arange(first_col, last_col + 1),
+                                           indexing='ij')
+        cells = (grid_rows * self.cols + grid_cols).ravel()
+        start_offset = 0 if start is None else min(max(_to_seconds(start) - self.min_time, 0), (1 << TIME_BITS) - 1)
+        end_offset = (1 << TIME_BITS) - 1 if end is None else _to_seconds(end) - self.min_time
+        if end_offset < start_offset:
+            return np.zeros(0, dtype=np.int64)
+        end_offset = min(end_offset, (1 << TIME_BITS) - 1)
+        lows = np.searchsorted(self.keys, (cells << TIME_BITS) | start_offset, side='left')
+        highs = np.searchsorted(self.keys, (cells << TIME_BITS) | end_offset, side='right')
+
+        # concatenated ranges without a Python loop over the cells
+        lengths = highs - lows
+        positions = np.repeat(lows - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        rows = np.asarray(self.order[positions])
+        if columns is not None and len(rows):
+            lat = np.asarray(columns['lat'])[rows]
+            lon = np.asarray(columns['lon'])[rows]
+            rows = rows[(lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)]
+        return np.sort(rows)
+
+
+def select_rows(columns: Dict[str, np.ndarray], rows: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Selects rows of cached columns, e.g. the result of a query.
+
+    Parameters:
+        columns (Dict[str, np.ndarray]): Columns as returned by load_columns.
+        rows (np.ndarray): The rows to select.
+
+    Returns:
+        Dict[str, np.ndarray]: The selected columns, usable with columns_to_frame.
+    """
+    return {column: values if column == ID_CATEGORIES else np.asarray(values[rows])
+            for column, values in columns.items()}
+
+
+def query_columns(csv_path: str, bbox: Sequence[float] = None, start: TimeValue = None, end: TimeValue = None,
+                  cell_size: float = DEFAULT_CELL_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Loads the cached columns of a CSV file, restricted to a bounding box and time window.
+    Without bounding box and time window all columns are returned without building the index.
+
+    Parameters:
+        csv_path (str): Path of the raw CSV file.
+        bbox (Sequence[float]): lat_min, lat_max, lon_min, lon_max, or None for no restriction.
+        start, end: The time window as epoch seconds, timestamp or date string, None for open.
+        cell_size (float): Edge length of the grid cells in degrees.
+
+    Returns:
+        Dict[str, np.ndarray]: The matching rows of the cached columns.
+    """
+    columns = load_columns(csv_path)
+    if bbox is None and start is None and end is None:
+        return columns
+    index = SpatioTemporalIndex.load_or_build(csv_path, cell_size)
+    rows = index.query(*(bbox if bbox is not None else ()), start=start, end=end, columns=columns)
+    return select_rows(columns, rows)
+
+
+def add_query_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Adds the bounding box and time window options of query_columns to a script.
+
+    Parameters:
+        parser (argparse.ArgumentParser): The argument parser of the script.
+    """
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("LAT_MIN", "LAT_MAX", "LON_MIN", "LON_MAX"),
+                        help="Nur Punkte innerhalb dieses Bereichs verwenden")
+    parser.add_argument("--start", help="Nur Punkte ab diesem Zeitpunkt verwenden, z.B. 2018-12-30T08:00")
+    parser.add_argument("--end", help="Nur Punkte bis zu diesem Zeitpunkt verwenden")
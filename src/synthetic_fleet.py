@@ -0,0 +1,122 @@
+"""
+This module generates synthetic GPS fleet data with the schema of the Darmstadt position file
+(id, timestamp, lat, lon, heading, speed). It is used to benchmark the pipeline without downloading
+the real data.
+
+Every car drives a random walk through a box around Darmstadt. The time between two points of a
+car is mostly a regular sampling gap, but a share of the gaps lies close to the time threshold of
+the trip segmentation and another share is long enough to start a new trip, so the segmentation
+has to handle realistic boundary cases.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Extent of the generated positions, roughly the area covered by the Darmstadt data
+DEFAULT_BOUNDS = {'min_lat': 49.80, 'max_lat': 49.95, 'min_lon': 8.55, 'max_lon': 8.75}
+DEFAULT_START = "2018-12-29T00:00:00"
+METERS_PER_DEGREE = 111320.0
+CARS_PER_BLOCK = 10000
+
+
+def _per_car_cumsum(values: np.ndarray, car_starts: np.ndarray, point_counts: np.ndarray) -> np.ndarray:
+    """
+    Computes the cumulative sum of values that restarts at the first point of every car.
+    """
+    total = np.cumsum(values)
+    offsets = np.repeat(total[car_starts] - values[car_starts], point_counts)
+    return total - offsets
+
+
+def generate_fleet(car_count: int, points_per_car: int, time_threshold: float = 300, seed: int = 0,
+                   near_threshold_share: float = 0.05, trip_break_share: float = 0.03,
+                   start: str = DEFAULT_START, bounds: dict = None, first_car: int = 0) -> pd.DataFrame:
+    """
+    Generates the positions of a fleet of cars.
+
+    Parameters:
+        car_count (int): Number of cars.
+        points_per_car (int): Mean number of points per car, the actual number is Poisson distributed.
+        time_threshold (float): Time threshold of the segmentation in seconds.
+        seed (int): Seed of the random generator.
+        near_threshold_share (float): Share of the gaps between 0.8 and 1.2 times the time threshold.
+        trip_break_share (float): Share of the gaps between 2 and 20 times the time threshold.
+        start (str): Earliest start time of a car.
+        bounds (dict): Extent of the positions, see DEFAULT_BOUNDS.
+        first_car (int): Number of the first car, used to generate a fleet in blocks.
+
+    Returns:
+        pd.DataFrame: One row per position, ordered by timestamp.
+    """
+    bounds = DEFAULT_BOUNDS if bounds is None else bounds
+    rng = np.random.default_rng([seed, first_car])
+    point_counts = np.maximum(rng.poisson(points_per_car, car_count), 1)
+    car_starts = np.cumsum(point_counts) - point_counts
+    car_of_point = np.repeat(np.arange(car_count), point_counts)
+    point_count = int(point_counts.sum())
+
+    # regular sampling gaps, gaps close to the threshold and gaps that end a trip
+    gap_kind = rng.choice(3, size=point_count,
+                          p=[1 - near_threshold_share - trip_break_share, near_threshold_share, trip_break_share])
+    gaps = rng.uniform(5, 60, point_count)
+    gaps[gap_kind == 1] = rng.uniform(0.8, 1.2, np.count_nonzero(gap_kind == 1)) * time_threshold
+    gaps[gap_kind == 2] = rng.uniform(2, 20, np.count_nonzero(gap_kind == 2)) * time_threshold
+    gaps[car_starts] = rng.uniform(0, 24 * 3600, car_count)
+    seconds = np.round(_per_car_cumsum(gaps, car_starts, point_counts)).astype(np.int64)
+
+    # random walk, the heading changes slowly and the distance depends on speed and gap
+    heading = (rng.uniform(0, 360, car_count)[car_of_point]
+               + _per_car_cumsum(rng.normal(0, 20, point_count), car_starts, point_counts)) % 360
+    speed = np.clip(rng.normal(35, 15, point_count), 0, 130)
+    distance = speed / 3.6 * np.minimum(gaps, 60)
+    distance[car_starts] = 0
+    mean_lat = (bounds['min_lat'] + bounds['max_lat']) / 2
+    radians = np.deg2rad(heading)
+    lat = rng.uniform(bounds['min_lat'], bounds['max_lat'], car_count)[car_of_point] \
+        + _per_car_cumsum(distance * np.cos(radians) / METERS_PER_DEGREE, car_starts, point_counts)
+    lon = rng.uniform(bounds['min_lon'], bounds['max_lon'], car_count)[car_of_point] \
+        + _per_car_cumsum(distance * np.sin(radians) / (METERS_PER_DEGREE * np.cos(np.deg2rad(mean_lat))),
+                          car_starts, point_counts)
+
+    car_ids = np.char.add("car", np.char.zfill(np.arange(first_car, first_car + car_count).astype(str), 7))
+    timestamps = np.datetime64(start, 's') + seconds
+    fleet = pd.DataFrame({
+        'id': car_ids[car_of_point],
+        'timestamp': np.char.add(np.datetime_as_string(timestamps, unit='s'), ".000Z"),
+        'lat': np.round(np.clip(lat, bounds['min_lat'], bounds['max_lat']), 6),
+        'lon': np.round(np.clip(lon, bounds['min_lon'], bounds['max_lon']), 6),
+        'heading': np.round(heading).astype(np.int64),
+        'speed': np.round(speed, 1),
+    })
+    return fleet.iloc[np.argsort(seconds, kind='stable')].reset_index(drop=True)
+
+
+def write_fleet_csv(csv_path: str, car_count: int, points_per_car: int, time_threshold: float = 300,
+                    seed: int = 0, **kwargs) -> int:
+    """
+    Generates a fleet in blocks of cars and writes it to a CSV file.
+    Rows are ordered by timestamp within every block of CARS_PER_BLOCK cars.
+
+    Parameters:
+        csv_path (str): Path of the CSV file.
+        car_count (int): Number of cars.
+        points_per_car (int): Mean number of points per car.
+        time_threshold (float): Time threshold of the segmentation in seconds.
+        seed (int): Seed of the random generator.
+        **kwargs: Further arguments of generate_fleet.
+
+    Returns:
+        int: The number of written rows.
+    """
+    folder = os.path.dirname(csv_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    row_count = 0
+    for first_car in range(0, car_count, CARS_PER_BLOCK):
+        fleet = generate_fleet(min(CARS_PER_BLOCK, car_count - first_car), points_per_car, time_threshold, seed,
+                               first_car=first_car, **kwargs)
+        fleet.to_csv(csv_path, mode='w' if first_car == 0 else 'a', header=first_car == 0, index=False)
+        row_count += len(fleet)
+    return row_count
@@ -0,0 +1,144 @@
+"""
+This module provides a streaming tf.data input pipeline for training on the extracted trips.
+The segmented trip file is read in chunks of complete trips, the sliding windows are built per
+chunk and only a bounded shuffle buffer of windows is held in memory. Trips are assigned to the
+train, test and validation split as a whole by a TripSplit, so windows of one trip never end
+up in two splits.
+"""
+
+from typing import Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+from src.coordtools import CoordTools
+from src.resampling import Resampling
+from src.segmentation import TRIP_COLUMN
+from src.trip_split import TripSplit
+from src.windowing import FEATURE_COLUMNS, sliding_windows, trip_features, window_inputs, window_targets
+
+
+def iter_trip_chunks(csv_path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Reads a trip file in chunks that only contain complete trips.
+    The file has to be ordered by Fahrtnummer, as written by the segmentation.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+        chunk_size (int): Number of rows read at once.
+
+    Returns:
+        Iterator[pd.DataFrame]: The chunks of complete trips.
+    """
+    carry = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        last_trip = chunk[TRIP_COLUMN].iloc[-1]
+        is_last_trip = (chunk[TRIP_COLUMN] == last_trip).to_numpy()
+        carry = chunk.loc[is_last_trip]
+        if not is_last_trip.all():
+            yield chunk.loc[~is_last_trip]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def trip_numbers_of(csv_path: str, chunk_size: int) -> np.ndarray:
+    """
+    Collects the Fahrtnummer of all trips of a trip file chunk by chunk.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+        chunk_size (int): Number of rows read at once.
+
+    Returns:
+        np.ndarray: The sorted, unique trip numbers.
+    """
+    return np.unique(np.concatenate([chunk[TRIP_COLUMN].unique() for chunk in
+                                     pd.read_csv(csv_path, usecols=[TRIP_COLUMN], chunksize=chunk_size)]))
+
+
+def data_extent(csv_path: str, chunk_size: int) -> CoordTools:
+    """
+    Computes the lat/lon extent of a trip file chunk by chunk.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+        chunk_size (int): Number of rows read at once.
+
+    Returns:
+        CoordTools: An instance covering the extent of all trip points.
+    """
+    bounds = [(chunk['lat'].min(), chunk['lat'].max(), chunk['lon'].min(), chunk['lon'].max())
+              for chunk in pd.read_csv(csv_path, usecols=['lat', 'lon'], chunksize=chunk_size)]
+    bounds = np.array(bounds)
+    return CoordTools.from_dict({'border_quantile': 0, 'min_lat': bounds[:, 0].min(), 'max_lat': bounds[:, 1].max(),
+                                 'min_lon': bounds[:, 2].min(), 'max_lon': bounds[:, 3].max()})
+
+
+def iter_window_batches(csv_path: str, split: str, trip_split: TripSplit, window: int, stride: int,
+                        coord_tools: CoordTools, chunk_size: int,
+                        resampling: Resampling = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Builds the windows of one split chunk by chunk.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+        split (str): One of 'train', 'test' or 'validate'.
+        trip_split (TripSplit): The split assignment of the trips.
+        window (int): Number of points per window.
+        stride (int): Distance between the starts of two consecutive windows of a trip.
+        coord_tools (CoordTools): Instance whose extent is used to normalize lat and lon.
+        chunk_size (int): Number of rows read at once.
+        resampling (Resampling): Optional resampling of the trips to a fixed time or distance step.
+
+    Returns:
+        Iterator[Tuple[np.ndarray, np.ndarray]]: Inputs and outputs of the windows of every chunk.
+    """
+    for chunk in iter_trip_chunks(csv_path, chunk_size):
+        features, trip_starts = trip_features(chunk, coord_tools, resampling)
+        windows, starts = sliding_windows(features, trip_starts, window, stride)
+        trip_numbers = pd.factorize(chunk[TRIP_COLUMN])[1].to_numpy()
+        trip_of_window = np.searchsorted(trip_starts, starts, side='right') - 1
+        starts = starts[trip_split.mask(trip_numbers[trip_of_window], split)]
+        if len(starts):
+            yield window_inputs(windows, starts), window_targets(features, starts)
+
+
+def make_dataset(csv_path: str, split: str, trip_split: TripSplit, window: int, stride: int,
+                 coord_tools: CoordTools, batch_size: int = 32, shuffle_buffer: int = 10000, chunk_size: int = 100000,
+                 cache_path: str = None, seed: int = None, resampling: Resampling = None) -> tf.data.Dataset:
+    """
+    Creates a streaming dataset of the windows of one split.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+        split (str): One of 'train', 'test' or 'validate'.
+        trip_split (TripSplit): The split assignment of the trips.
+        window (int): Number of points per window.
+        stride (int): Distance between the starts of two consecutive windows of a trip.
+        coord_tools (CoordTools): Instance whose extent is used to normalize lat and lon.
+        batch_size (int): Number of windows per batch.
+        shuffle_buffer (int): Number of windows held for shuffling, only used for the train split.
+        chunk_size (int): Number of trip file rows read at once.
+        cache_path (str): Optional file prefix to cache the windows on disk after the first epoch.
+        seed (int): Optional shuffle seed.
+        resampling (Resampling): Optional resampling of the trips to a fixed time or distance step.
+
+    Returns:
+        tf.data.Dataset: Batches of (inputs, outputs).
+    """
+    # the through traffic flag is only the target, the inputs hold the point features
+    feature_count = len(FEATURE_COLUMNS)
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter_window_batches(csv_path, split, trip_split, window, stride, coord_tools, chunk_size,
+                                    resampling),
+        output_signature=(tf.TensorSpec(shape=(None, window - 1, feature_count), dtype=tf.float32),
+                          tf.TensorSpec(shape=(None, 1), dtype=tf.float32)),
+    ).unbatch()
+    if cache_path is not None:
+        dataset = dataset.cache(f"{cache_path}_{split}")
+    if split == 'train':
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,149 @@
+"""
+This module draws extracted trips as simplified polylines on a folium map.
+The tracks are simplified with the Douglas-Peucker algorithm, processed for all trips at once:
+every iteration handles all open segments of all trips with NumPy instead of recursing per trip.
+The tolerance is derived from the map zoom level and raised until the total vertex count fits
+into a configurable budget.
+"""
+
+import math
+
+import folium
+import numpy as np
+import pandas as pd
+
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN
+
+TYPE_COLORS = {'innen': 'green', 'raus': 'orange', 'rein': 'blue', 'durch': 'red'}
+DEFAULT_COLOR = 'gray'
+EARTH_CIRCUMFERENCE_METERS = 40075016.686
+METERS_PER_DEGREE_LAT = 110540.0
+METERS_PER_DEGREE_LON = 111320.0
+TILE_SIZE = 256
+# Tolerance in meters the doubling starts from if the configured tolerance is 0
+MIN_BUDGET_TOLERANCE = 0.01
+# Doublings of the tolerance before the vertex budget is given up, 2 ** 40 * 1 cm exceed the earth
+MAX_TOLERANCE_DOUBLINGS = 40
+
+
+def meters_per_pixel(zoom_level: int, latitude: float) -> float:
+    """
+    Returns the ground resolution of a web mercator map.
+
+    Parameters:
+        zoom_level (int): The zoom level of the map.
+        latitude (float): The latitude the resolution is computed for.
+
+    Returns:
+        float: Meters covered by one pixel.
+    """
+    return EARTH_CIRCUMFERENCE_METERS * math.cos(math.radians(latitude)) / (TILE_SIZE * 2 ** zoom_level)
+
+
+def douglas_peucker(x: np.ndarray, y: np.ndarray, trip_starts: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Simplifies many polylines at once with the Douglas-Peucker algorithm.
+
+    Parameters:
+        x (np.ndarray): Planar x coordinate of every point, in the unit of the tolerance.
+        y (np.ndarray): Planar y coordinate of every point, in the unit of the tolerance.
+        trip_starts (np.ndarray): Index of the first point of every polyline, ascending.
+        tolerance (float): Maximum distance of a dropped point to the simplified line.
+
+    Returns:
+        np.ndarray: Boolean mask of the points that are kept.
+    """
+    keep = np.zeros(len(x), dtype=bool)
+    if len(x) == 0:
+        return keep
+    trip_ends = np.append(trip_starts[1:], len(x)) - 1
+    keep[trip_starts] = True
+    keep[trip_ends] = True
+
+    segment_starts, segment_ends = trip_starts, trip_ends
+    while True:
+        open_segments = segment_ends - segment_starts > 1
+        segment_starts, segment_ends = segment_starts[open_segments], segment_ends[open_segments]
+        if len(segment_starts) == 0:
+            return keep
+
+        # Index of every interior point and the segment it belongs to
+        interior_counts = segment_ends - segment_starts - 1
+        offsets = np.cumsum(interior_counts) - interior_counts
+        segment_of_point = np.repeat(np.arange(len(segment_starts)), interior_counts)
+        points = np.arange(interior_counts.sum()) - offsets[segment_of_point] + segment_starts[segment_of_point] + 1
+
+        start, end = segment_starts[segment_of_point], segment_ends[segment_of_point]
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length = np.hypot(dx, dy)
+        cross = np.abs(dx * (y[points] - y[start]) - dy * (x[points] - x[start]))
+        distance = np.where(length > 0, cross / np.where(length > 0, length, 1),
+                            np.hypot(x[points] - x[start], y[points] - y[start]))
+
+        max_distance = np.maximum.reduceat(distance, offsets)
+        is_max = distance == max_distance[segment_of_point]
+        first_max_segments, first_max = np.unique(segment_of_point[is_max], return_index=True)
+        farthest = points[is_max][first_max]
+
+        split = max_distance[first_max_segments] > tolerance
+        split_segments, split_points = first_max_segments[split], farthest[split]
+        keep[split_points] = True
+        segment_starts = np.concatenate((segment_starts[split_segments], split_points))
+        segment_ends = np.concatenate((split_points, segment_ends[split_segments]))
+
+
+def simplify_trips(trips: pd.DataFrame, tolerance: float, max_vertices: int = None) -> pd.DataFrame:
+    """
+    Simplifies the tracks of all trips. If max_vertices is given, the tolerance is doubled until
+    the total number of kept points fits into that budget or no further reduction is possible.
+    A tolerance of 0 only drops points on a straight line, the doubling then starts at
+    MIN_BUDGET_TOLERANCE.
+
+    Parameters:
+        trips (pd.DataFrame): Trip points with the columns 'lat', 'lon' and 'Fahrtnummer', sorted by trip.
+        tolerance (float): Simplification tolerance in meters, not negative.
+        max_vertices (int): Optional upper limit for the total number of points kept.
+
+    Returns:
+        pd.DataFrame: The kept trip points.
+    """
+    if tolerance < 0:
+        raise ValueError("The simplification tolerance must not be negative.")
+    lat = trips['lat'].to_numpy(dtype=np.float64)
+    lon = trips['lon'].to_numpy(dtype=np.float64)
+    if len(lat) == 0:
+        return trips
+    trip_numbers = trips[TRIP_COLUMN].to_numpy()
+    trip_starts = np.flatnonzero(np.append(True, trip_numbers[1:] != trip_numbers[:-1]))
+
+    x = lon * METERS_PER_DEGREE_LON * math.cos(math.radians(float(lat.mean())))
+    y = lat * METERS_PER_DEGREE_LAT
+    minimum_vertices = len(trip_starts) + np.count_nonzero(np.diff(np.append(trip_starts, len(lat))) > 1)
+    keep = douglas_peucker(x, y, trip_starts, tolerance)
+    doublings = 0
+    while max_vertices is not None and keep.sum() > max(max_vertices, minimum_vertices) \
+            and doublings < MAX_TOLERANCE_DOUBLINGS:
+        tolerance = max(tolerance, MIN_BUDGET_TOLERANCE / 2) * 2
+        keep = douglas_peucker(x, y, trip_starts, tolerance)
+        doublings += 1
+    return trips.loc[keep]
+
+
+def add_trip_layers(car_map: folium.Map, trips: pd.DataFrame, weight: float = 2.0) -> None:
+    """
+    Adds one polyline layer per trip type to the map, each containing all trips of that type.
+
+    Parameters:
+        car_map (folium.Map): The map the layers are added to.
+        trips (pd.DataFrame): Trip points with the columns 'lat', 'lon', 'Fahrtnummer' and 'Typ'.
+        weight (float): Line width in pixels.
+    """
+    types = trips[TYPE_COLUMN].fillna('unbekannt')
+    for typ, typ_trips in trips.groupby(types, sort=True):
+        coordinates = typ_trips[['lat', 'lon']].to_numpy(dtype=np.float64).round(6)
+        trip_numbers = typ_trips[TRIP_COLUMN].to_numpy()
+        split_at = np.flatnonzero(trip_numbers[1:] != trip_numbers[:-1]) + 1
+        lines = [line.tolist() for line in np.split(coordinates, split_at)]
+        layer = folium.FeatureGroup(name=f"{typ} ({len(lines)} Fahrten)")
+        folium.PolyLine(lines, color=TYPE_COLORS.get(typ, DEFAULT_COLOR), weight=weight, opacity=0.7).add_to(layer)
+        layer.add_to(car_map)
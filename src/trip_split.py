@@ -0,0 +1,167 @@
+"""
+This module assigns whole trips to the train, test and validation split.
+The split of a trip only depends on a seeded hash of its Fahrtnummer, so the assignment is
+reproducible without shuffling and windows of one trip never end up in two splits.
+The assignment is persisted as a compact index file and reused by later runs and evaluations.
+"""
+
+import os
+from typing import Sequence
+
+import numpy as np
+
+SPLITS = ['train', 'test', 'validate']
+DEFAULT_FRACTIONS = (0.6, 0.2, 0.2)
+
+
+def _hash_trip_numbers(trip_numbers: np.ndarray, seed: int) -> np.ndarray:
+    """
+    Maps trip numbers to uniformly distributed values in [0, 1) using the splitmix64 finalizer.
+
+    Parameters:
+        trip_numbers (np.ndarray): The Fahrtnummer of every trip.
+        seed (int): Seed of the hash.
+
+    Returns:
+        np.ndarray: One float64 value per trip.
+    """
+    with np.errstate(over='ignore'):
+        value = np.asarray(trip_numbers).astype(np.uint64) + np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+        value = (value ^ (value >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        value = (value ^ (value >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        value = value ^ (value >> np.uint64(31))
+    return (value >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+class TripSplit:
+    """
+    A class holding the split assignment of trips.
+
+    Attributes:
+        trip_numbers: Sorted Fahrtnummer of all assigned trips.
+        split_codes: Index into SPLITS for every trip.
+        seed: Seed of the hash used for new trips.
+        fractions: Share of the train, test and validation split.
+    """
+
+    def __init__(self, seed: int, fractions: Sequence[float] = DEFAULT_FRACTIONS,
+                 trip_numbers: np.ndarray = None, split_codes: np.ndarray = None):
+        self.seed = int(seed)
+        self.fractions = np.asarray(fractions, dtype=np.float64)
+        self.trip_numbers = np.zeros(0, dtype=np.int64) if trip_numbers is None else trip_numbers
+        self.split_codes = np.zeros(0, dtype=np.int8) if split_codes is None else split_codes
+
+    def assign(self, trip_numbers: np.ndarray) -> np.ndarray:
+        """
+        Computes the split of trips from the seeded hash, ignoring the stored assignment.
+
+        Parameters:
+            trip_numbers (np.ndarray): The Fahrtnummer of every trip.
+
+        Returns:
+            np.ndarray: Index into SPLITS for every trip.
+        """
+        bounds = np.cumsum(self.fractions / self.fractions.sum())[:-1]
+        return np.searchsorted(bounds, _hash_trip_numbers(trip_numbers, self.seed), side='right').astype(np.int8)
+
+    def extend(self, trip_numbers: np.ndarray) -> bool:
+        """
+        Adds the assignment of trips that are not part of the index yet.
+
+        Parameters:
+            trip_numbers (np.ndarray): The Fahrtnummer of every trip.
+
+        Returns:
+            bool: True if new trips were added.
+        """
+        new_trips = np.setdiff1d(np.asarray(trip_numbers, dtype=np.int64), self.trip_numbers)
+        if len(new_trips) == 0:
+            return False
+        trip_numbers = np.concatenate((self.trip_numbers, new_trips))
+        split_codes = np.concatenate((self.split_codes, self.assign(new_trips)))
+        order = np.argsort(trip_numbers, kind='stable')
+        self.trip_numbers, self.split_codes = trip_numbers[order], split_codes[order]
+        return True
+
+    def split_of(self, trip_numbers: np.ndarray) -> np.ndarray:
+        """
+        Looks up the split of trips. Trips missing in the index are assigned by the hash.
+
+        Parameters:
+            trip_numbers (np.ndarray): The Fahrtnummer of every trip.
+
+        Returns:
+            np.ndarray: Index into SPLITS for every trip.
+        """
+        trip_numbers = np.asarray(trip_numbers, dtype=np.int64)
+        position = np.minimum(np.searchsorted(self.trip_numbers, trip_numbers), max(len(self.trip_numbers) - 1, 0))
+        found = len(self.trip_numbers) > 0
+        known = self.trip_numbers[position] == trip_numbers if found else np.zeros(len(trip_numbers), dtype=bool)
+        codes = self.assign(trip_numbers)
+        if found:
+            codes[known] = self.split_codes[position[known]]
+        return codes
+
+    def mask(self, trip_numbers: np.ndarray, split: str) -> np.ndarray:
+        """
+        Checks which trips belong to a split.
+
+        Parameters:
+            trip_numbers (np.ndarray): The Fahrtnummer of every trip.
+            split (str): One of 'train', 'test' or 'validate'.
+
+        Returns:
+            np.ndarray: Boolean mask, True for the trips in the split.
+        """
+        return self.split_of(trip_numbers) == SPLITS.index(split)
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the split index as compressed NumPy archive.
+
+        Parameters:
+            file_path (str): Path of the index file.
+        """
+        np.savez_compressed(file_path, trip_numbers=self.trip_numbers, split_codes=self.split_codes,
+                            seed=self.seed, fractions=self.fractions)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'TripSplit':
+        """
+        Loads a split index saved by save.
+
+        Parameters:
+            file_path (str): Path of the index file.
+
+        Returns:
+            TripSplit: The restored split.
+        """
+        with np.load(file_path) as index:
+            return cls(int(index['seed']), index['fractions'], index['trip_numbers'], index['split_codes'])
+
+    @classmethod
+    def load_or_create(cls, file_path: str, trip_numbers: np.ndarray, seed: int,
+                       fractions: Sequence[float] = DEFAULT_FRACTIONS) -> 'TripSplit':
+        """
+        Loads the split index if it exists for the same seed and fractions, otherwise creates it.
+        New trips are added to the index and the index file is updated.
+
+        Parameters:
+            file_path (str): Path of the index file.
+            trip_numbers (np.ndarray): The Fahrtnummer of all trips that need a split.
+            seed (int): Seed of the hash.
+            fractions (Sequence[float]): Share of the train, test and validation split.
+
+        Returns:
+            TripSplit: The split assignment.
+        """
+        trip_split = None
+        if os.path.exists(file_path):
+            trip_split = cls.load(file_path)
+            if trip_split.seed != seed or not np.allclose(trip_split.fractions, fractions):
+                trip_split = None
+        if trip_split is None:
+            trip_split = cls(seed, fractions)
+        if trip_split.extend(trip_numbers) or not os.path.exists(file_path):
+            trip_split.save(file_path)
+        return trip_split
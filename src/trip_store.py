@@ -0,0 +1,295 @@
+"""
+This module provides a compact binary store for the extracted trips.
+The points of all trips are stored as flat, contiguous binary column files ordered by Fahrtnummer.
+An offsets array gives the first point of every trip, so the points of any trip are a
+zero-copy slice of the memory mapped columns. Trips can be appended, so streaming and
+incremental segmentation write the store chunk by chunk.
+
+Store folder (next to the trip CSV file):
+    meta.json: column dtypes, counts, first Fahrtnummer and the trips per Typ.
+    lat.bin, lon.bin, heading.bin, speed.bin: float32 per point.
+    timestamp.bin: int64 epoch seconds per point.
+    offsets.bin: int64 index of the first point of every trip, plus the total point count.
+    car.bin: int32 index into car_ids.json per trip.
+    typ.bin: int8 trip type code per trip (see TYP_LABELS, -1 if not classified).
+    start_time.bin, end_time.bin: int64 epoch seconds per trip.
+    type_order.bin: int64 trip indices ordered by Typ, the trips of one Typ are a slice.
+"""
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import TYP_CODES, TYP_LABELS
+from src.dataloader import FLOAT_COLUMNS
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN, to_epoch_seconds
+
+STORE_SUFFIX = ".trips"
+STORE_VERSION = 1
+META_FILENAME = "meta.json"
+CAR_IDS_FILENAME = "car_ids.json"
+POINT_COLUMNS = {**{column: 'float32' for column in FLOAT_COLUMNS}, 'timestamp': 'int64'}
+TRIP_COLUMNS = {'car': 'int32', 'typ': 'int8', 'start_time': 'int64', 'end_time': 'int64'}
+UNCLASSIFIED = -1
+
+
+def get_store_path(csv_path: str) -> str:
+    """
+    Returns the path of the trip store belonging to a trip CSV file.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+
+    Returns:
+        str: Path of the store folder.
+    """
+    return csv_path + STORE_SUFFIX
+
+
+def is_store_current(csv_path: str) -> bool:
+    """
+    Checks whether the trip store of a trip CSV file exists and was written after the CSV file.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+
+    Returns:
+        bool: True if the store can be used instead of the CSV file.
+    """
+    meta_path = os.path.join(get_store_path(csv_path), META_FILENAME)
+    return os.path.exists(meta_path) and os.path.exists(csv_path) \
+        and os.path.getmtime(meta_path) >= os.path.getmtime(csv_path)
+
+
+def _read_meta(store_path: str) -> dict:
+    with open(os.path.join(store_path, META_FILENAME), 'r') as file:
+        return json.load(file)
+
+
+def _write_json(path: str, content) -> None:
+    with open(path + ".tmp", 'w') as file:
+        json.dump(content, file)
+    os.replace(path + ".tmp", path)
+
+
+def _column_path(store_path: str, column: str) -> str:
+    return os.path.join(store_path, f"{column}.bin")
+
+
+def _append_column(store_path: str, column: str, values: np.ndarray) -> None:
+    with open(_column_path(store_path, column), 'ab') as file:
+        file.write(np.ascontiguousarray(values).tobytes())
+
+
+def write_trip_store(trips: pd.DataFrame, store_path: str, append: bool = False) -> None:
+    """
+    Writes trips as returned by segment_trips into the store.
+
+    Parameters:
+        trips (pd.DataFrame): Trip points with the columns 'id', 'timestamp', 'lat', 'lon', 'heading',
+            'speed', 'Fahrtnummer' and 'Typ', ordered by Fahrtnummer and timestamp.
+        store_path (str): Path of the store folder.
+        append (bool): If True, the trips are appended to an existing store. Their Fahrtnummer have
+            to continue the numbering of the store.
+    """
+    if not append or not os.path.exists(os.path.join(store_path, META_FILENAME)):
+        os.makedirs(store_path, exist_ok=True)
+        for column in [*POINT_COLUMNS, *TRIP_COLUMNS, 'type_order', 'offsets']:
+            open(_column_path(store_path, column), 'wb').close()
+        _append_column(store_path, 'offsets', np.zeros(1, dtype=np.int64))
+        meta = {'version': STORE_VERSION, 'trip_count': 0, 'point_count': 0, 'first_trip_number': None,
+                'point_columns': POINT_COLUMNS, 'trip_columns': TRIP_COLUMNS}
+        car_ids: List[str] = []
+    else:
+        meta = _read_meta(store_path)
+        with open(os.path.join(store_path, CAR_IDS_FILENAME), 'r') as file:
+            car_ids = json.load(file)
+    if len(trips) == 0:
+        _write_json(os.path.join(store_path, CAR_IDS_FILENAME), car_ids)
+        _write_json(os.path.join(store_path, META_FILENAME), _with_type_index(store_path, meta))
+        return
+
+    trip_numbers = trips[TRIP_COLUMN].to_numpy()
+    starts = np.flatnonzero(np.append(True, trip_numbers[1:] != trip_numbers[:-1]))
+    numbers = trip_numbers[starts]
+    expected_first = numbers[0] if meta['first_trip_number'] is None else meta['first_trip_number'] + meta['trip_count']
+    if not np.array_equal(numbers, np.arange(expected_first, expected_first + len(numbers))):
+        raise ValueError("The Fahrtnummer of the trips have to be consecutive and continue the store.")
+
+    seconds = to_epoch_seconds(trips['timestamp'])
+    ends = np.append(starts[1:], len(trips)) - 1
+    for column, dtype in POINT_COLUMNS.items():
+        values = seconds if column == 'timestamp' else trips[column].to_numpy()
+        _append_column(store_path, column, values.astype(dtype))
+    _append_column(store_path, 'offsets', (meta['point_count'] + np.append(starts[1:], len(trips))).astype(np.int64))
+
+    trip_car_ids = trips['id'].to_numpy()[starts].astype(str)
+    unknown = pd.Index(car_ids).get_indexer(trip_car_ids) < 0
+    car_ids.extend(pd.unique(trip_car_ids[unknown]).tolist())
+    types = trips[TYPE_COLUMN].to_numpy()[starts]
+    type_codes = np.full(len(types), UNCLASSIFIED, dtype=np.int8)
+    for label, code in TYP_CODES.items():
+        type_codes[types == label] = code
+    _append_column(store_path, 'car', pd.Index(car_ids).get_indexer(trip_car_ids).astype(np.int32))
+    _append_column(store_path, 'typ', type_codes)
+    _append_column(store_path, 'start_time', seconds[starts].astype(np.int64))
+    _append_column(store_path, 'end_time', seconds[ends].astype(np.int64))
+
+    if meta['first_trip_number'] is None:
+        meta['first_trip_number'] = int(numbers[0])
+    meta['trip_count'] += len(numbers)
+    meta['point_count'] += len(trips)
+    _write_json(os.path.join(store_path, CAR_IDS_FILENAME), car_ids)
+    _write_json(os.path.join(store_path, META_FILENAME), _with_type_index(store_path, meta))
+
+
+def _with_type_index(store_path: str, meta: dict) -> dict:
+    """
+    Rebuilds the trip indices ordered by Typ and records where every Typ starts.
+    Only the per trip type codes are read, so this is cheap compared to the points.
+    """
+    typ = np.fromfile(_column_path(store_path, 'typ'), dtype=np.int8)
+    order = np.argsort(typ, kind='stable').astype(np.int64)
+    order.tofile(_column_path(store_path, 'type_order'))
+    codes = np.arange(UNCLASSIFIED, len(TYP_LABELS))
+    bounds = np.searchsorted(typ[order], np.append(codes, len(TYP_LABELS)))
+    meta['type_offsets'] = {str(code): [int(bounds[index]), int(bounds[index + 1])]
+                            for index, code in enumerate(codes)}
+    return meta
+
+
+def truncate_trip_store(store_path: str, trip_count: int) -> None:
+    """
+    Removes all trips after the first trip_count trips, e.g. trips appended by an interrupted run.
+
+    Parameters:
+        store_path (str): Path of the store folder.
+        trip_count (int): Number of trips to keep.
+    """
+    trip_count = int(trip_count)
+    meta = _read_meta(store_path)
+    if meta['trip_count'] <= trip_count:
+        return
+    offsets = np.fromfile(_column_path(store_path, 'offsets'), dtype=np.int64)
+    point_count = int(offsets[trip_count])
+    for column, dtype in POINT_COLUMNS.items():
+        os.truncate(_column_path(store_path, column), point_count * np.dtype(dtype).itemsize)
+    for column, dtype in TRIP_COLUMNS.items():
+        os.truncate(_column_path(store_path, column), trip_count * np.dtype(dtype).itemsize)
+    os.truncate(_column_path(store_path, 'offsets'), (trip_count + 1) * np.dtype(np.int64).itemsize)
+    meta.update(trip_count=trip_count, point_count=point_count)
+    _write_json(os.path.join(store_path, META_FILENAME), _with_type_index(store_path, meta))
+
+
+class TripStore:
+    """
+    A class giving random access to the trips of a store folder.
+
+    All columns are numpy.memmap arrays, so opening the store reads nothing but the metadata
+    and every trip is a zero-copy slice.
+
+    Attributes:
+        first_trip_number: Fahrtnummer of the first trip.
+        offsets: Index of the first point of every trip, plus the total point count.
+        points: The point columns 'lat', 'lon', 'heading', 'speed' and 'timestamp'.
+        trips: The per trip columns 'car', 'typ', 'start_time' and 'end_time'.
+        car_ids: The car id of every car index.
+    """
+
+    def __init__(self, store_path: str):
+        meta = _read_meta(store_path)
+        self.first_trip_number = meta['first_trip_number'] or 0
+        self.trip_count = meta['trip_count']
+        self.point_count = meta['point_count']
+        self._type_offsets = meta['type_offsets']
+        self.offsets = self._map(store_path, 'offsets', 'int64', self.trip_count + 1)
+        self.points = {column: self._map(store_path, column, dtype, self.point_count)
+                       for column, dtype in meta['point_columns'].items()}
+        self.trips = {column: self._map(store_path, column, dtype, self.trip_count)
+                      for column, dtype in meta['trip_columns'].items()}
+        self.type_order = self._map(store_path, 'type_order', 'int64', self.trip_count)
+        with open(os.path.join(store_path, CAR_IDS_FILENAME), 'r') as file:
+            self.car_ids = np.array(json.load(file), dtype=str)
+
+    @staticmethod
+    def _map(store_path: str, column: str, dtype: str, count: int) -> np.ndarray:
+        if count == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(_column_path(store_path, column), dtype=dtype, mode='r', shape=(count,))
+
+    def __len__(self) -> int:
+        return self.trip_count
+
+    @property
+    def trip_numbers(self) -> np.ndarray:
+        return np.arange(self.first_trip_number, self.first_trip_number + self.trip_count)
+
+    def trip(self, trip_number: int) -> Dict[str, np.ndarray]:
+        """
+        Returns the points of one trip as zero-copy views.
+
+        Parameters:
+            trip_number (int): The Fahrtnummer of the trip.
+
+        Returns:
+            Dict[str, np.ndarray]: The point columns of the trip.
+        """
+        index = trip_number - self.first_trip_number
+        if not 0 <= index < self.trip_count:
+            raise KeyError(f"Fahrtnummer {trip_number} is not in the store.")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return {column: values[start:end] for column, values in self.points.items()}
+
+    def trips_of_type(self, typ: Optional[str]) -> np.ndarray:
+        """
+        Returns the Fahrtnummer of all trips of one Typ.
+
+        Parameters:
+            typ (Optional[str]): 'innen', 'raus', 'rein', 'durch' or None for unclassified trips.
+
+        Returns:
+            np.ndarray: The trip numbers, ordered by Fahrtnummer.
+        """
+        start, end = self._type_offsets[str(UNCLASSIFIED if typ is None else TYP_CODES[typ])]
+        return self.type_order[start:end] + self.first_trip_number
+
+    def metadata(self, first_trip: int = 0) -> pd.DataFrame:
+        """
+        Returns the per trip metadata.
+
+        Parameters:
+            first_trip (int): Index of the first trip, e.g. to only read the trips appended by a run.
+
+        Returns:
+            pd.DataFrame: 'Fahrtnummer', car 'id', 'Typ', 'start_time', 'end_time' and 'point_count'.
+        """
+        typ = np.asarray(self.trips['typ'][first_trip:])
+        cars = np.asarray(self.trips['car'][first_trip:])
+        return pd.DataFrame({
+            TRIP_COLUMN: self.trip_numbers[first_trip:],
+            'id': self.car_ids[cars] if len(cars) else np.zeros(0, dtype=str),
+            TYPE_COLUMN: np.where(typ == UNCLASSIFIED, None, TYP_LABELS[np.maximum(typ, 0)]),
+            'start_time': pd.to_datetime(np.asarray(self.trips['start_time'][first_trip:]), unit='s'),
+            'end_time': pd.to_datetime(np.asarray(self.trips['end_time'][first_trip:]), unit='s'),
+            'point_count': np.diff(self.offsets[first_trip:]),
+        })
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns all points in the layout of the trip CSV file.
+
+        Returns:
+            pd.DataFrame: One row per point, ordered by Fahrtnummer and timestamp.
+        """
+        counts = np.diff(self.offsets)
+        metadata = self.metadata()
+        frame = pd.DataFrame({'id': np.repeat(metadata['id'].to_numpy(), counts),
+                              'timestamp': pd.to_datetime(np.asarray(self.points['timestamp']), unit='s')})
+        for column in FLOAT_COLUMNS:
+            frame[column] = np.asarray(self.points[column])
+        frame[TRIP_COLUMN] = np.repeat(metadata[TRIP_COLUMN].to_numpy(), counts)
+        frame[TYPE_COLUMN] = np.repeat(metadata[TYPE_COLUMN].to_numpy(), counts)
+        return frame
@@ -0,0 +1,226 @@
+"""
+This module computes one row of statistics per trip: duration, haversine path length, mean and
+maximum speed, total heading change, straightness and the zone of the start and end point.
+All statistics of all trips are computed at once with segment reductions (np.add.reduceat and
+friends) over the flat point columns, so no Python loop runs per trip. The result is written as
+compact trip summary table next to the trip CSV file, analyses can use it without re-reading
+the points. When trips are appended to a trip store (incremental segmentation), only the new
+trips are summarized and appended to the table.
+"""
+
+import io
+import os
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import haversine
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN, to_epoch_seconds
+
+SUMMARY_SUFFIX = "_summary.csv"
+# Number of points a trip store is summarized in at once
+POINTS_PER_BLOCK = 1 << 22
+# Bytes read from the end of a summary file to find its last complete row
+SUMMARY_TAIL_BYTES = 1 << 16
+ZONE_LABELS = np.array(['aussen', 'innen'])
+STATISTIC_COLUMNS = ['start_time', 'end_time', 'duration_s', 'point_count', 'start_lat', 'start_lon', 'end_lat',
+                     'end_lon', 'distance_m', 'direct_distance_m', 'straightness', 'average_speed_kmh', 'mean_speed',
+                     'max_speed', 'heading_change', 'start_zone', 'end_zone']
+SUMMARY_COLUMNS = [TRIP_COLUMN, 'id', TYPE_COLUMN, *STATISTIC_COLUMNS]
+
+
+def get_summary_path(csv_path: str) -> str:
+    """
+    Returns the path of the trip summary table belonging to a trip CSV file.
+
+    Parameters:
+        csv_path (str): Path of the trip CSV file.
+
+    Returns:
+        str: Path of the summary CSV file.
+    """
+    return csv_path[:-len(".csv")] + SUMMARY_SUFFIX if csv_path.endswith(".csv") else csv_path + SUMMARY_SUFFIX
+
+
+def summarize_points(points: Dict[str, np.ndarray], trip_starts: np.ndarray, region=None) -> pd.DataFrame:
+    """
+    Computes the statistics of many trips stored as consecutive runs of points.
+
+    Parameters:
+        points (Dict[str, np.ndarray]): The columns 'lat', 'lon', 'heading', 'speed' and 'timestamp'
+            (epoch seconds), ordered by trip and timestamp.
+        trip_starts (np.ndarray): Index of the first point of every trip, ascending.
+        region: Optional CoordTools or PolygonRegion instance used for the start and end zone.
+
+    Returns:
+        pd.DataFrame: One row per trip with the start and end point and the statistics.
+    """
+    lat = np.asarray(points['lat'], dtype=np.float64)
+    lon = np.asarray(points['lon'], dtype=np.float64)
+    seconds = np.asarray(points['timestamp'], dtype=np.int64)
+    speed = np.asarray(points['speed'], dtype=np.float64)
+    heading = np.asarray(points['heading'], dtype=np.float64)
+    trip_starts = np.asarray(trip_starts, dtype=np.int64)
+    if len(trip_starts) == 0:
+        return pd.DataFrame(columns=STATISTIC_COLUMNS)
+    trip_ends = np.append(trip_starts[1:], len(lat)) - 1
+    point_counts = trip_ends - trip_starts + 1
+
+    # values between consecutive points, the pair leaving the last point of a trip is zeroed,
+    # so summing from the first point of a trip to the next start only covers its own pairs
+    steps = np.zeros(len(lat))
+    turns = np.zeros(len(lat))
+    steps[:-1] = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    turns[:-1] = np.abs((np.diff(heading) + 180) % 360 - 180)
+    steps[trip_ends] = 0
+    turns[trip_ends] = 0
+
+    distance = np.add.reduceat(steps, trip_starts)
+    duration = seconds[trip_ends] - seconds[trip_starts]
+    direct = haversine(lat[trip_starts], lon[trip_starts], lat[trip_ends], lon[trip_ends])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        average_speed = np.where(duration > 0, distance / duration * 3.6, np.nan)
+        straightness = np.where(distance > 0, direct / distance, np.nan)
+
+    summary = pd.DataFrame({
+        'start_time': pd.to_datetime(seconds[trip_starts], unit='s'),
+        'end_time': pd.to_datetime(seconds[trip_ends], unit='s'),
+        'duration_s': duration,
+        'point_count': point_counts,
+        'start_lat': lat[trip_starts],
+        'start_lon': lon[trip_starts],
+        'end_lat': lat[trip_ends],
+        'end_lon': lon[trip_ends],
+        'distance_m': distance,
+        'direct_distance_m': direct,
+        'straightness': straightness,
+        'average_speed_kmh': average_speed,
+        'mean_speed': np.add.reduceat(speed, trip_starts) / point_counts,
+        'max_speed': np.maximum.reduceat(speed, trip_starts),
+        'heading_change': np.add.reduceat(turns, trip_starts),
+        'start_zone': None,
+        'end_zone': None,
+    })
+    if region is not None:
+        summary['start_zone'] = ZONE_LABELS[region.in_center(lat[trip_starts], lon[trip_starts]).astype(np.int8)]
+        summary['end_zone'] = ZONE_LABELS[region.in_center(lat[trip_ends], lon[trip_ends]).astype(np.int8)]
+    return summary
+
+
+def summarize_trips(trips: pd.DataFrame, region=None) -> pd.DataFrame:
+    """
+    Computes the trip summary of trips as returned by segment_trips.
+
+    Parameters:
+        trips (pd.DataFrame): Trip points ordered by Fahrtnummer and timestamp.
+        region: Optional CoordTools or PolygonRegion instance used for the start and end zone.
+
+    Returns:
+        pd.DataFrame: One row per trip, see SUMMARY_COLUMNS.
+    """
+    trip_numbers = trips[TRIP_COLUMN].to_numpy()
+    trip_starts = np.flatnonzero(np.append(True, trip_numbers[1:] != trip_numbers[:-1])) if len(trips) \
+        else np.zeros(0, dtype=np.int64)
+    points = {column: trips[column].to_numpy() for column in ['lat', 'lon', 'heading', 'speed']}
+    points['timestamp'] = to_epoch_seconds(trips['timestamp'])
+    summary = summarize_points(points, trip_starts, region)
+    summary.insert(0, TYPE_COLUMN, trips[TYPE_COLUMN].to_numpy()[trip_starts])
+    summary.insert(0, 'id', trips['id'].to_numpy()[trip_starts])
+    summary.insert(0, TRIP_COLUMN, trip_numbers[trip_starts])
+    return summary
+
+
+def summarize_store(store, region=None, first_trip: int = 0) -> pd.DataFrame:
+    """
+    Computes the trip summary of a trip store. The memory mapped points are processed in blocks
+    of whole trips, so the store does not have to fit into memory.
+
+    Parameters:
+        store (TripStore): The opened trip store.
+        region: Optional CoordTools or PolygonRegion instance used for the start and end zone.
+        first_trip (int): Index of the first summarized trip, the trips before are skipped.
+
+    Returns:
+        pd.DataFrame: One row per trip from first_trip on, see SUMMARY_COLUMNS.
+    """
+    offsets = np.asarray(store.offsets)
+    blocks = []
+    first = first_trip
+    while first < len(store):
+        last = int(np.searchsorted(offsets, offsets[first] + POINTS_PER_BLOCK, side='right')) - 1
+        last = min(max(last, first + 1), len(store))
+        points = {column: values[offsets[first]:offsets[last]] for column, values in store.points.items()}
+        blocks.append(summarize_points(points, offsets[first:last] - offsets[first], region))
+        first = last
+    summary = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame(columns=STATISTIC_COLUMNS)
+    metadata = store.metadata(first_trip)
+    for column in [TYPE_COLUMN, 'id', TRIP_COLUMN]:
+        summary.insert(0, column, metadata[column].to_numpy())
+    return summary
+
+
+def summarized_trip_count(summary_path: str, store) -> Optional[int]:
+    """
+    Returns how many trips of a store an existing summary file covers. Only the end of the file
+    is read. A partially written last row (interrupted run) is cut off.
+
+    Parameters:
+        summary_path (str): Path of the summary CSV file.
+        store (TripStore): The opened trip store the summary belongs to.
+
+    Returns:
+        Optional[int]: The number of summarized trips, None if the summary has to be rebuilt because it
+        is missing or does not match the store, e.g. after the store was truncated or rebuilt.
+    """
+    if not os.path.exists(summary_path):
+        return None
+    with open(summary_path, 'r+b') as file:
+        header = file.readline()
+        if header.decode().rstrip("\r\n").split(",") != SUMMARY_COLUMNS:
+            return None
+        size = file.seek(0, os.SEEK_END)
+        tail_start = max(len(header), size - SUMMARY_TAIL_BYTES)
+        file.seek(tail_start)
+        tail = file.read()
+        end = tail.rfind(b"\n") + 1
+        file.truncate(tail_start + end)
+    rows = tail[:end].splitlines()
+    if tail_start > len(header):
+        # the first line of the tail may start in the middle of a row
+        rows = rows[1:]
+    if not rows:
+        return 0 if tail_start == len(header) else None
+    last = pd.read_csv(io.BytesIO(header + rows[-1]))
+    index = int(last[TRIP_COLUMN].iloc[0]) - store.first_trip_number
+    if not 0 <= index < len(store):
+        return None
+    # the last summarized trip has to be the same trip of the store, not one of a rebuilt store
+    if str(last['id'].iloc[0]) != str(store.car_ids[store.trips['car'][index]]) \
+            or int(last['point_count'].iloc[0]) != int(store.offsets[index + 1] - store.offsets[index]):
+        return None
+    return index + 1
+
+
+def write_trip_summary(store, csv_path: str, region=None, append: bool = False) -> pd.DataFrame:
+    """
+    Computes the trip summary of a trip store and writes it next to the trip CSV file.
+
+    Parameters:
+        store (TripStore): The opened trip store of the trip CSV file.
+        csv_path (str): Path of the trip CSV file.
+        region: Optional CoordTools or PolygonRegion instance used for the start and end zone.
+        append (bool): If True, only the trips missing in an existing summary are summarized and
+            appended. The summary is rebuilt if it does not match the store.
+
+    Returns:
+        pd.DataFrame: The written summary rows.
+    """
+    summary_path = get_summary_path(csv_path)
+    first_trip = (summarized_trip_count(summary_path, store) or 0) if append else 0
+    summary = summarize_store(store, region, first_trip)
+    if first_trip:
+        summary.to_csv(summary_path, mode='a', header=False, index=False)
+    else:
+        summary.to_csv(summary_path, index=False)
+    return summary
@@ -0,0 +1,251 @@
+"""
+This module provides an in-process representation of many trips without one object or DataFrame
+per trip. A TripCollection holds the points of all trips in shared contiguous NumPy columns and
+the start and end index of every trip, plus the per trip Typ code, car index and Fahrtnummer.
+A Trip is a small __slots__ object referring to one trip of a collection, its point columns are
+zero-copy slices of the shared columns. Selecting trips (e.g. by Typ) only selects the per trip
+arrays, the points stay shared.
+
+Memory per trip is about 30 bytes of index arrays, so millions of trips fit next to their points.
+Collections are created from a trip DataFrame (layout of the trip CSV file) or from a TripStore,
+where the columns stay memory mapped.
+"""
+
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import TYP_CODES, TYP_LABELS
+from src.dataloader import FLOAT_COLUMNS
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN, to_epoch_seconds
+from src.trip_store import POINT_COLUMNS, UNCLASSIFIED
+
+
+class Trip:
+    """
+    A lightweight view of one trip of a TripCollection.
+
+    Attributes:
+        collection: The collection the trip belongs to.
+        index: Position of the trip in the collection.
+    """
+
+    __slots__ = ('collection', 'index')
+
+    def __init__(self, collection: 'TripCollection', index: int):
+        self.collection = collection
+        self.index = index
+
+    def __len__(self) -> int:
+        return int(self.collection.ends[self.index] - self.collection.starts[self.index])
+
+    def __repr__(self) -> str:
+        return f"Trip(number={self.number}, car_id={self.car_id!r}, typ={self.typ!r}, points={len(self)})"
+
+    def column(self, column: str) -> np.ndarray:
+        """
+        Returns one point column of the trip as zero-copy view.
+
+        Parameters:
+            column (str): 'lat', 'lon', 'heading', 'speed' or 'timestamp'.
+
+        Returns:
+            np.ndarray: The values of the points of the trip.
+        """
+        return self.collection.points[column][self.collection.starts[self.index]:self.collection.ends[self.index]]
+
+    @property
+    def lat(self) -> np.ndarray:
+        return self.column('lat')
+
+    @property
+    def lon(self) -> np.ndarray:
+        return self.column('lon')
+
+    @property
+    def heading(self) -> np.ndarray:
+        return self.column('heading')
+
+    @property
+    def speed(self) -> np.ndarray:
+        return self.column('speed')
+
+    @property
+    def time(self) -> np.ndarray:
+        """
+        The timestamps of the points in epoch seconds.
+        """
+        return self.column('timestamp')
+
+    @property
+    def number(self) -> int:
+        return int(self.collection.numbers[self.index])
+
+    @property
+    def car_id(self) -> str:
+        return str(self.collection.car_ids[self.collection.cars[self.index]])
+
+    @property
+    def typ(self) -> Optional[str]:
+        code = int(self.collection.typ[self.index])
+        return None if code == UNCLASSIFIED else str(TYP_LABELS[code])
+
+    def points(self) -> Dict[str, np.ndarray]:
+        """
+        Returns all point columns of the trip as zero-copy views.
+
+        Returns:
+            Dict[str, np.ndarray]: The point columns of the trip.
+        """
+        return {column: self.column(column) for column in self.collection.points}
+
+
+class TripCollection:
+    """
+    A class holding many trips in shared point columns.
+
+    Attributes:
+        points: The point columns 'lat', 'lon', 'heading', 'speed' and (if known) 'timestamp'.
+        starts, ends: Index of the first point and behind the last point of every trip.
+        typ: Trip type code of every trip (see TYP_LABELS, -1 if not classified).
+        cars: Index into car_ids of every trip.
+        car_ids: The car id of every car index.
+        numbers: The Fahrtnummer of every trip.
+    """
+
+    __slots__ = ('points', 'starts', 'ends', 'typ', 'cars', 'car_ids', 'numbers')
+
+    def __init__(self, points: Dict[str, np.ndarray], starts: np.ndarray, ends: np.ndarray, typ: np.ndarray,
+                 cars: np.ndarray, car_ids: np.ndarray, numbers: np.ndarray):
+        self.points = points
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.typ = np.asarray(typ, dtype=np.int8)
+        self.cars = np.asarray(cars, dtype=np.int32)
+        self.car_ids = np.asarray(car_ids, dtype=str)
+        self.numbers = np.asarray(numbers)
+
+    @classmethod
+    def from_frame(cls, trips: pd.DataFrame) -> 'TripCollection':
+        """
+        Creates a collection from trip points in the layout of the trip CSV file.
+        Trips are kept in the order of their first appearance, the points of a trip in their order.
+
+        Parameters:
+            trips (pd.DataFrame): Trip points with the columns 'lat', 'lon', 'heading', 'speed' and
+                'Fahrtnummer', optionally 'id', 'Typ' and 'timestamp' (ignored if points lack a timestamp).
+
+        Returns:
+            TripCollection: The trips, the points are copied into contiguous float32 columns once.
+        """
+        trip_codes, numbers = pd.factorize(trips[TRIP_COLUMN])
+        order = np.argsort(trip_codes, kind='stable')
+        trip_codes = trip_codes[order]
+        starts = np.flatnonzero(np.append(True, trip_codes[1:] != trip_codes[:-1])) if len(trips) \
+            else np.zeros(0, dtype=np.int64)
+        ends = np.append(starts[1:], len(trips))
+
+        # same dtypes as the columns of a TripStore: float32 point values, int64 timestamps
+        points = {column: trips[column].to_numpy(dtype=POINT_COLUMNS[column])[order] for column in FLOAT_COLUMNS}
+        # timestamps are only kept if every point has one, a collection never holds partial times
+        if 'timestamp' in trips and trips['timestamp'].notna().all():
+            points['timestamp'] = to_epoch_seconds(trips['timestamp'])[order]
+        first_rows = order[starts]
+        typ = np.full(len(starts), UNCLASSIFIED, dtype=np.int8)
+        if TYPE_COLUMN in trips:
+            types = trips[TYPE_COLUMN].to_numpy()[first_rows]
+            for label, code in TYP_CODES.items():
+                typ[types == label] = code
+        car_values = trips['id'].to_numpy()[first_rows].astype(str) if 'id' in trips else np.full(len(starts), '')
+        cars, car_ids = pd.factorize(car_values)
+        return cls(points, starts, ends, typ, cars, np.asarray(car_ids), np.asarray(numbers))
+
+    @classmethod
+    def from_store(cls, store) -> 'TripCollection':
+        """
+        Creates a collection from a trip store without reading the points.
+
+        Parameters:
+            store (TripStore): The opened trip store.
+
+        Returns:
+            TripCollection: The trips, the point columns are the memory mapped columns of the store.
+        """
+        offsets = np.asarray(store.offsets)
+        return cls(store.points, offsets[:-1], offsets[1:], np.asarray(store.trips['typ']),
+                   np.asarray(store.trips['car']), store.car_ids, store.trip_numbers)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> Trip:
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Trip index {index} is out of range.")
+        return Trip(self, index % len(self))
+
+    def __iter__(self) -> Iterator[Trip]:
+        for index in range(len(self)):
+            yield Trip(self, index)
+
+    @property
+    def point_counts(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def select(self, indices: np.ndarray) -> 'TripCollection':
+        """
+        Returns a collection of some of the trips, sharing the point columns.
+
+        Parameters:
+            indices (np.ndarray): Positions or boolean mask of the selected trips.
+
+        Returns:
+            TripCollection: The selected trips.
+        """
+        return TripCollection(self.points, self.starts[indices], self.ends[indices], self.typ[indices],
+                              self.cars[indices], self.car_ids, self.numbers[indices])
+
+    def of_type(self, typ: Optional[str]) -> 'TripCollection':
+        """
+        Returns the trips of one Typ.
+
+        Parameters:
+            typ (Optional[str]): 'innen', 'raus', 'rein', 'durch' or None for unclassified trips.
+
+        Returns:
+            TripCollection: The trips of the Typ, sharing the point columns.
+        """
+        return self.select(self.typ == (UNCLASSIFIED if typ is None else TYP_CODES[typ]))
+
+    def flat(self) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+        """
+        Returns the points of all trips as consecutive runs, as used by the vectorized trip functions
+        (resampling, windowing, trip summary). The shared columns are returned without copy if the
+        trips cover them completely and in order, otherwise the points of the trips are gathered.
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], np.ndarray]: The point columns and the index of the first
+            point of every trip.
+        """
+        counts = self.point_counts
+        trip_starts = np.cumsum(counts) - counts
+        point_count = len(self.points['lat'])
+        if len(self) == 0 or (self.starts[0] == 0 and self.ends[-1] == point_count
+                              and np.array_equal(self.starts[1:], self.ends[:-1])):
+            return self.points, trip_starts
+        rows = np.arange(counts.sum()) + np.repeat(self.starts - trip_starts, counts)
+        return {column: np.asarray(values)[rows] for column, values in self.points.items()}, trip_starts
+
+    def metadata(self) -> pd.DataFrame:
+        """
+        Returns the per trip metadata.
+
+        Returns:
+            pd.DataFrame: 'Fahrtnummer', car 'id', 'Typ' and 'point_count'.
+        """
+        return pd.DataFrame({
+            TRIP_COLUMN: self.numbers,
+            'id': self.car_ids[self.cars] if len(self) else np.zeros(0, dtype=str),
+            TYPE_COLUMN: np.where(self.typ == UNCLASSIFIED, None, TYP_LABELS[np.maximum(self.typ, 0)]),
+            'point_count': self.point_counts,
+        })
@@ -0,0 +1,174 @@
+"""
+This module builds the model input windows from the extracted trips.
+All trips are stored in one contiguous float32 feature array. The sliding windows are
+zero-copy views into that array (numpy.lib.stride_tricks.sliding_window_view) and are
+only copied when a batch of windows is selected by its start indices.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.coordtools import TYP_CODES, CoordTools
+from src.resampling import Resampling
+from src.trips import TripCollection
+
+FEATURE_COLUMNS = ['lat', 'lon', 'heading', 'speed']
+# The column after the features holds the through traffic flag, it is the target and never a model input
+LABEL_COLUMN = len(FEATURE_COLUMNS)
+THROUGH_TRAFFIC_TYPE = 'durch'
+
+
+def _feature_array(points: Dict[str, np.ndarray], through_traffic: np.ndarray,
+                   coord_tools: Optional[CoordTools]) -> np.ndarray:
+    features = np.empty((len(points['lat']), LABEL_COLUMN + 1), dtype=np.float32)
+    if coord_tools is not None:
+        lat = np.asarray(points['lat'], dtype=np.float64)
+        lon = np.asarray(points['lon'], dtype=np.float64)
+        features[:, 0] = (lat - coord_tools.min_lat) / (coord_tools.max_lat - coord_tools.min_lat)
+        features[:, 1] = (lon - coord_tools.min_lon) / (coord_tools.max_lon - coord_tools.min_lon)
+    features[:, 2] = points['heading']
+    features[:, 3] = points['speed']
+    features[:, LABEL_COLUMN] = through_traffic
+    return features
+
+
+def collection_features(collection: TripCollection, coord_tools: CoordTools = None,
+                        resampling: Resampling = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the trips of a TripCollection into one contiguous feature array.
+
+    The features of every point are the normalized latitude and longitude, heading, speed and
+    the through traffic flag (1 for trips of type 'durch'). Trips are kept in the order of the collection.
+
+    Parameters:
+        collection (TripCollection): The trips, for resampling by time with timestamps.
+        coord_tools (CoordTools): Optional instance whose data extent is used for normalizing
+            lat and lon. By default the extent of the given trips is used.
+        resampling (Resampling): Optional resampling of the trips to a fixed time or distance step.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The float32 feature array of shape (points, 5) and the
+        index of the first point of every trip.
+    """
+    points, trip_starts = collection.flat()
+    if coord_tools is None and len(points['lat']):
+        coord_tools = CoordTools({'lat': np.asarray(points['lat']), 'lon': np.asarray(points['lon'])}, 0)
+    trip_is_through = collection.typ == TYP_CODES[THROUGH_TRAFFIC_TYPE]
+    if resampling is not None:
+        points, trip_starts = resampling.apply(points, trip_starts)
+    point_counts = np.diff(np.append(trip_starts, len(points['lat'])))
+    return _feature_array(points, np.repeat(trip_is_through, point_counts), coord_tools), trip_starts
+
+
+def trip_features(trips: pd.DataFrame, coord_tools: CoordTools = None,
+                  resampling: Resampling = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts trip points into one contiguous feature array, see collection_features.
+    Trips are kept in the order of their first appearance in the input.
+
+    Parameters:
+        trips (pd.DataFrame): Trip points with the columns 'lat', 'lon', 'heading', 'speed',
+            'Fahrtnummer' and 'Typ', for resampling by time also 'timestamp'.
+        coord_tools (CoordTools): Optional instance whose data extent is used for normalizing
+            lat and lon. By default the extent of the given trips is used.
+        resampling (Resampling): Optional resampling of the trips to a fixed time or distance step.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The float32 feature array of shape (points, 5) and the
+        index of the first point of every trip.
+    """
+    return collection_features(TripCollection.from_frame(trips), coord_tools, resampling)
+
+
+def store_features(store, coord_tools: CoordTools = None,
+                   resampling: Resampling = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the trips of a TripStore into one contiguous feature array, like trip_features.
+    The points of the store are already grouped by trip, so no sorting or grouping is needed.
+
+    Parameters:
+        store (TripStore): The opened trip store.
+        coord_tools (CoordTools): Optional instance whose data extent is used for normalizing
+            lat and lon. By default the extent of the stored trips is used.
+        resampling (Resampling): Optional resampling of the trips to a fixed time or distance step.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: The float32 feature array of shape (points, 5) and the
+        index of the first point of every trip.
+    """
+    return collection_features(TripCollection.from_store(store), coord_tools, resampling)
+
+
+def window_starts(trip_starts: np.ndarray, point_count: int, window: int, stride: int) -> np.ndarray:
+    """
+    Computes the start index of every window that lies completely inside one trip.
+
+    Parameters:
+        trip_starts (np.ndarray): Index of the first point of every trip.
+        point_count (int): Total number of points.
+        window (int): Number of points per window.
+        stride (int): Distance between the starts of two consecutive windows of a trip.
+
+    Returns:
+        np.ndarray: Start index of every window, ordered by trip and position.
+    """
+    trip_lengths = np.diff(np.append(trip_starts, point_count))
+    windows_per_trip = np.maximum(trip_lengths - window, -1) // stride + 1
+    offsets = np.cumsum(windows_per_trip) - windows_per_trip
+    trip_of_window = np.repeat(np.arange(len(trip_starts)), windows_per_trip)
+    position = (np.arange(windows_per_trip.sum()) - offsets[trip_of_window]) * stride
+    return trip_starts[trip_of_window] + position
+
+
+def sliding_windows(features: np.ndarray, trip_starts: np.ndarray, window: int,
+                    stride: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Creates the sliding windows over all trips without copying the feature array.
+
+    Parameters:
+        features (np.ndarray): Feature array of shape (points, features).
+        trip_starts (np.ndarray): Index of the first point of every trip.
+        window (int): Number of points per window.
+        stride (int): Distance between the starts of two consecutive windows of a trip.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: A read-only view of shape (positions, window, features)
+        with a window at every point, and the start indices of the windows inside a single trip.
+        Indexing the view with (a subset of) the start indices materializes these windows.
+    """
+    if len(features) < window:
+        return np.zeros((0, window, features.shape[1]), dtype=features.dtype), np.zeros(0, dtype=np.int64)
+    view = sliding_window_view(features, window, axis=0).transpose(0, 2, 1)
+    return view, window_starts(trip_starts, len(features), window, stride)
+
+
+def window_inputs(windows: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Selects the model inputs of windows: the features of all but the last point of every window,
+    without the through traffic flag, which is only known for training.
+
+    Parameters:
+        windows (np.ndarray): The window view as returned by sliding_windows.
+        starts (np.ndarray): Start indices of the selected windows.
+
+    Returns:
+        np.ndarray: The inputs of shape (windows, window - 1, features).
+    """
+    return windows[starts, :-1, :LABEL_COLUMN]
+
+
+def window_targets(features: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Selects the through traffic flag of windows, the target of the model.
+
+    Parameters:
+        features (np.ndarray): Feature array as returned by trip_features.
+        starts (np.ndarray): Start indices of the selected windows.
+
+    Returns:
+        np.ndarray: The targets of shape (windows, 1).
+    """
+    return features[starts, LABEL_COLUMN].reshape((-1, 1))
@@ -0,0 +1,70 @@
+"""
+Shared test data: small synthetic fleets in the layout the pipeline works on.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.dataloader import TIMESTAMP_FORMAT, parse_timestamps
+from src.synthetic_fleet import generate_fleet
+
+
+def fleet_frame(car_count: int = 20, points_per_car: int = 200, seed: int = 0, **kwargs) -> pd.DataFrame:
+    """
+    Generates a synthetic fleet with parsed timestamps, as returned by load_data.
+
+    Parameters:
+        car_count (int): Number of cars.
+        points_per_car (int): Mean number of points per car.
+        seed (int): Seed of the random generator.
+        **kwargs: Further arguments of generate_fleet.
+
+    Returns:
+        pd.DataFrame: One row per position.
+    """
+    fleet = generate_fleet(car_count, points_per_car, seed=seed, **kwargs)
+    fleet['timestamp'] = pd.to_datetime(parse_timestamps(fleet['timestamp']), unit='s')
+    return fleet
+
+
+def add_dirt(fleet: pd.DataFrame, share: float = 0.02, seed: int = 0) -> pd.DataFrame:
+    """
+    Adds the errors of the raw feed to a fleet: exact and near duplicates, GPS jumps and standing points.
+
+    Parameters:
+        fleet (pd.DataFrame): Fleet as returned by fleet_frame.
+        share (float): Share of the rows affected by every kind of error.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        pd.DataFrame: The fleet with the additional and changed rows, ordered by timestamp.
+    """
+    rng = np.random.default_rng(seed)
+    fleet = fleet.sort_values(['id', 'timestamp'], kind='stable', ignore_index=True)
+    count = int(len(fleet) * share)
+    jumps = rng.choice(len(fleet), count, replace=False)
+    fleet.loc[jumps, 'lat'] += 0.5
+    # runs of four standing points at the position of their first point, runs crossing cars are skipped
+    run_starts = rng.choice(len(fleet) - 4, count // 4, replace=False)
+    run_starts = run_starts[fleet['id'].to_numpy()[run_starts] == fleet['id'].to_numpy()[run_starts + 3]]
+    for offset in range(4):
+        fleet.loc[run_starts + offset, ['lat', 'lon']] = fleet.loc[run_starts, ['lat', 'lon']].to_numpy()
+        fleet.loc[run_starts + offset, 'speed'] = 0.0
+    duplicates = fleet.iloc[rng.choice(len(fleet), count, replace=False)]
+    near_duplicates = fleet.iloc[rng.choice(len(fleet), count, replace=False)].copy()
+    near_duplicates['timestamp'] += pd.Timedelta(seconds=1)
+    fleet = pd.concat([fleet, duplicates, near_duplicates], ignore_index=True)
+    return fleet.sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def write_fleet(fleet: pd.DataFrame, csv_path: str, append: bool = False) -> None:
+    """
+    Writes a fleet in the format of the raw CSV file.
+
+    Parameters:
+        fleet (pd.DataFrame): Fleet as returned by fleet_frame.
+        csv_path (str): Path of the CSV file.
+        append (bool): If True, the rows are appended to an existing file without header.
+    """
+    fleet.assign(timestamp=fleet['timestamp'].dt.strftime(TIMESTAMP_FORMAT)).to_csv(
+        csv_path, mode='a' if append else 'w', header=not append, index=False)
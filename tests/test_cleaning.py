@@ -0,0 +1,98 @@
+"""
+Tests of the single cleaning rules on small hand made tracks.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.cleaning import RULES, CleaningRules, load_cleaning_rules
+from src.ConfigManager.config_store import ConfigStoreManager
+
+# about 111 meters per step, one step every 10 seconds is 40 km/h
+LAT_STEP = 0.001
+
+
+def track(*cars):
+    """
+    Builds the input of CleaningRules.mask from (car id, seconds, lat, speed) rows per car.
+    """
+    rows = [row for car in cars for row in car]
+    car_ids = np.array([row[0] for row in rows])
+    seconds = np.array([row[1] for row in rows])
+    lat = np.array([row[2] for row in rows])
+    speed = np.array([row[3] for row in rows], dtype=np.float64)
+    return car_ids, seconds, lat, np.full(len(rows), 8.65), speed
+
+
+def driving(car_id, count, start=0):
+    return [(car_id, start + 10 * number, 49.87 + LAT_STEP * number, 40.0) for number in range(count)]
+
+
+class CleaningRulesTest(unittest.TestCase):
+
+    def assert_cleaned(self, data, removed_rows, **expected_counts):
+        keep, counts = CleaningRules().mask(*data)
+        expected_keep = np.ones(len(keep), dtype=bool)
+        expected_keep[removed_rows] = False
+        np.testing.assert_array_equal(keep, expected_keep)
+        self.assertEqual(counts, {rule: expected_counts.get(rule, 0) for rule in RULES})
+
+    def test_clean_track_is_kept(self):
+        self.assert_cleaned(track(driving('a', 5), driving('b', 5)), [])
+
+    def test_exact_duplicates(self):
+        rows = driving('a', 4)
+        self.assert_cleaned(track(rows[:2] + [rows[1]] + rows[2:]), [2], exact_duplicates=1)
+        # the same point of another car is no duplicate
+        self.assert_cleaned(track(driving('a', 3), driving('b', 3)), [])
+
+    def test_near_duplicates(self):
+        rows = driving('a', 4)
+        near = ('a', rows[1][1] + 1, rows[1][2] + 0.00001, 40.0)
+        self.assert_cleaned(track(rows[:2] + [near] + rows[2:]), [2], near_duplicates=1)
+        # two seconds apart is no near duplicate
+        later = ('a', rows[1][1] + 2, rows[1][2] + 0.00001, 40.0)
+        self.assert_cleaned(track(rows[:2] + [later] + rows[2:]), [])
+
+    def test_speed_outliers(self):
+        rows = driving('a', 6)
+        rows[3] = ('a', rows[3][1], rows[3][2] + 0.5, 40.0)
+        self.assert_cleaned(track(rows), [3], speed_outliers=1)
+
+    def test_speed_outliers_at_start_and_end(self):
+        first = driving('a', 5)
+        first[0] = ('a', 0, first[0][2] - 0.5, 40.0)
+        last = driving('b', 5)
+        last[-1] = ('b', last[-1][1], last[-1][2] + 0.5, 40.0)
+        self.assert_cleaned(track(first, last), [0, 9], speed_outliers=2)
+
+    def test_stationary_run_keeps_first_and_last_point(self):
+        standing = [('a', 40 + 10 * number, 49.87 + LAT_STEP * 4 + 0.00001 * (number % 2), 0.0)
+                    for number in range(4)]
+        self.assert_cleaned(track(driving('a', 4) + standing + driving('a', 3, start=80)), [5, 6], stationary=2)
+        # the standing points of two cars form no run
+        self.assert_cleaned(track(standing[:2], [('b',) + row[1:] for row in standing[2:]]), [])
+
+
+class LoadCleaningRulesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.instances = dict(ConfigStoreManager._instances)
+
+    def tearDown(self):
+        ConfigStoreManager._instances.clear()
+        ConfigStoreManager._instances.update(self.instances)
+
+    def test_disabled_by_default(self):
+        ConfigStoreManager.inject("cleaning", {})
+        self.assertIsNone(load_cleaning_rules())
+
+    def test_missing_thresholds_keep_defaults(self):
+        ConfigStoreManager.inject("cleaning", {"enabled": True, "max_speed_kmh": 120, "stationary_meters": None})
+        rules = load_cleaning_rules()
+        self.assertEqual(rules.to_dict(), {**CleaningRules().to_dict(), "max_speed_kmh": 120})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""
+Tests of the ConfigStore write back.
+"""
+
+import os
+import tempfile
+import unittest
+
+import yaml
+
+from src.ConfigManager.config_store import ConfigStore
+
+
+class ConfigStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "config.yaml")
+        with open(self.path, 'w') as file:
+            yaml.dump({"data_url": ["https://example.org/data.csv"]}, file)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def read(self):
+        with open(self.path, 'r') as file:
+            return yaml.safe_load(file)
+
+    def test_defaults_are_not_written(self):
+        store = ConfigStore(self.path, auto_extend=True)
+        self.assertEqual(store.get("download_workers", 4), 4)
+        store.flush()
+        self.assertEqual(self.read(), {"data_url": ["https://example.org/data.csv"]})
+        self.assertIsNone(store.get("download_workers"))
+
+    def test_set_values_are_written_on_flush(self):
+        store = ConfigStore(self.path, auto_extend=True)
+        store["force_download"] = True
+        self.assertNotIn("force_download", self.read())
+        store.flush()
+        self.assertTrue(self.read()["force_download"])
+
+    def test_store_without_auto_extend_is_not_written(self):
+        store = ConfigStore(self.path)
+        store["force_download"] = True
+        store.flush()
+        self.assertNotIn("force_download", self.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
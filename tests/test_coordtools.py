@@ -0,0 +1,39 @@
+"""
+Tests of saving and loading the center box.
+"""
+
+import os
+import tempfile
+import unittest
+
+from src.coordtools import CoordTools
+from src.dataloader import source_signature
+from tests.helpers import fleet_frame, write_fleet
+
+
+class CenterBoxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.folder.name, "fleet.csv")
+        self.box_path = os.path.join(self.folder.name, "center_box.json")
+        self.fleet = fleet_frame(5, 50, seed=8)
+        write_fleet(self.fleet, self.csv_path)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_box_is_reused_until_the_source_changes(self):
+        coord_tools = CoordTools(self.fleet, 0.04)
+        coord_tools.save(self.box_path, source_signature(self.csv_path))
+        loaded = CoordTools.load(self.box_path, source_signature(self.csv_path))
+        self.assertEqual(loaded.to_dict(), coord_tools.to_dict())
+
+        write_fleet(self.fleet.head(10), self.csv_path, append=True)
+        self.assertIsNone(CoordTools.load(self.box_path, source_signature(self.csv_path)))
+        # without a signature the box is loaded regardless of its source
+        self.assertEqual(CoordTools.load(self.box_path).to_dict(), coord_tools.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
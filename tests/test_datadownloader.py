@@ -0,0 +1,232 @@
+"""
+Tests of the DataDownloader against a local HTTP server that supports HEAD, Range and If-Range requests.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.ConfigManager.config_store import ConfigStoreManager
+from src.datadownloader import DataDownloader, META_SUFFIX, PART_SUFFIX
+
+CONTENT = bytes(range(256)) * 64
+ETAG = '"v1"'
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """
+    Serves the files of the server, GET requests can be delayed to observe parallel downloads.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.server.record(self)
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        if self.server.send_headers:
+            self.send_header("Content-Length", str(len(content)))
+            self.send_header("ETag", ETAG)
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.record(self)
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            time.sleep(self.server.delay)
+            self._send_content()
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _send_content(self):
+        content = self.server.files.get(self.path)
+        if content is None:
+            self.send_error(404)
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header is not None and self.headers.get("If-Range") in (None, ETAG):
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(content)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+
+class FileServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the download server, recording the received requests.
+    """
+
+    def __init__(self, files):
+        super().__init__(("127.0.0.1", 0), FileHandler)
+        self.files = files
+        self.send_headers = True
+        self.delay = 0.0
+        self.requests = []
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def record(self, handler):
+        with self.lock:
+            self.requests.append((handler.command, handler.path, handler.headers.get("Range")))
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_port}{path}"
+
+
+class DataDownloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.server = FileServer({"/data.csv": CONTENT})
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.instances = dict(ConfigStoreManager._instances)
+        self.main_config = ConfigStoreManager.main_config
+        ConfigStoreManager.inject(ConfigStoreManager.MAIN_CONFIG_NAME, {
+            "input_folder": self.folder.name, "output_folder": self.folder.name, "setup_ran": True})
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        ConfigStoreManager._instances.clear()
+        ConfigStoreManager._instances.update(self.instances)
+        ConfigStoreManager.main_config = self.main_config
+        self.folder.cleanup()
+
+    def download(self, paths, **config):
+        ConfigStoreManager.inject("downloader", {"data_url": [self.server.url(path) for path in paths],
+                                                 "enable_auto_download": True, **config})
+        return DataDownloader().filenames
+
+    def path(self, filename):
+        return os.path.join(self.folder.name, filename)
+
+    def write(self, filename, content, etag=None, size=None):
+        with open(self.path(filename), 'wb') as file:
+            file.write(content)
+        if etag is not None:
+            meta = {"url": "", "etag": etag} if size is None else {"url": "", "etag": etag, "size": size}
+            with open(self.path(filename) + META_SUFFIX, 'w') as file:
+                json.dump(meta, file)
+
+    def read(self, filename):
+        with open(self.path(filename), 'rb') as file:
+            return file.read()
+
+    def methods(self):
+        return [method for method, _, _ in self.server.requests]
+
+    def test_download(self):
+        self.assertEqual(self.download(["/data.csv"]), ["data.csv"])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+        self.assertFalse(os.path.exists(self.path("data.csv" + PART_SUFFIX)))
+        with open(self.path("data.csv" + META_SUFFIX), 'r') as file:
+            self.assertEqual(json.load(file), {"url": self.server.url("/data.csv"), "etag": ETAG,
+                                               "size": len(CONTENT)})
+
+    def test_skip_up_to_date_file(self):
+        self.write("data.csv", CONTENT, ETAG)
+        self.download(["/data.csv"])
+        self.assertEqual(self.methods(), ["HEAD"])
+
+    def test_download_file_of_other_size(self):
+        self.write("data.csv", CONTENT[:100], ETAG)
+        self.download(["/data.csv"])
+        self.assertEqual(self.methods(), ["HEAD", "GET"])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_download_without_size_and_etag(self):
+        self.server.send_headers = False
+        self.write("data.csv", CONTENT[:100])
+        self.download(["/data.csv"])
+        self.assertEqual(self.methods(), ["HEAD", "GET"])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_force_download(self):
+        self.write("data.csv", CONTENT, ETAG)
+        self.download(["/data.csv"], force_download=True)
+        self.assertEqual(self.methods(), ["GET"])
+
+    def stop_server(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_unreachable_server_uses_downloaded_file(self):
+        self.write("data.csv", CONTENT, ETAG, len(CONTENT))
+        self.stop_server()
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(self.download(["/data.csv"]), ["data.csv"])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_unreachable_server_does_not_use_incomplete_file(self):
+        # the file has another size than recorded after its download
+        self.write("data.csv", CONTENT[:100], ETAG, len(CONTENT))
+        self.stop_server()
+        with self.assertRaises(ConnectionError):
+            self.download(["/data.csv"])
+
+    def test_unreachable_server_does_not_use_unrecorded_file(self):
+        self.write("data.csv", CONTENT)
+        self.stop_server()
+        with self.assertRaises(ConnectionError):
+            self.download(["/data.csv"])
+
+    def test_resume_partial_file(self):
+        self.write("data.csv" + PART_SUFFIX, CONTENT[:1000], ETAG)
+        self.download(["/data.csv"])
+        self.assertEqual(self.server.requests, [("GET", "/data.csv", "bytes=1000-")])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_restart_partial_file_of_other_version(self):
+        self.write("data.csv" + PART_SUFFIX, b"x" * 1000, '"v0"')
+        self.download(["/data.csv"])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_complete_partial_file(self):
+        self.write("data.csv" + PART_SUFFIX, CONTENT, ETAG)
+        self.download(["/data.csv"])
+        self.assertEqual(self.server.requests, [("GET", "/data.csv", f"bytes={len(CONTENT)}-")])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+        self.assertTrue(os.path.exists(self.path("data.csv" + META_SUFFIX)))
+
+    def test_restart_partial_file_larger_than_server_file(self):
+        self.write("data.csv" + PART_SUFFIX, CONTENT + b"x" * 100, ETAG)
+        self.download(["/data.csv"])
+        self.assertEqual(self.server.requests, [("GET", "/data.csv", f"bytes={len(CONTENT) + 100}-"),
+                                                ("GET", "/data.csv", None)])
+        self.assertEqual(self.read("data.csv"), CONTENT)
+
+    def test_parallel_downloads(self):
+        paths = [f"/data_{index}.csv" for index in range(4)]
+        self.server.files = {path: CONTENT[index:] for index, path in enumerate(paths)}
+        self.server.delay = 0.2
+        self.assertEqual(self.download(paths, download_workers=4), [path[1:] for path in paths])
+        self.assertGreater(self.server.max_active, 1)
+        for index, path in enumerate(paths):
+            self.assertEqual(self.read(path[1:]), CONTENT[index:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Tests of the incremental segmentation: several runs over a growing input file have to find the
+same trips as one run over the complete file.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import CoordTools
+from src.dataloader import load_data
+from src.incremental_segmentation import segment_incremental
+from src.segmentation import TRIP_COLUMN, segment_trips
+from src.trip_store import TripStore
+from tests.helpers import fleet_frame, write_fleet
+
+TIME_THRESHOLD = 300
+
+
+def trips_by_start(trips: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces the Fahrtnummer, which depend on the order the trips are closed in, by the start time
+    of every trip and orders the points by car and time.
+    """
+    trips = trips.assign(trip_start=trips.groupby(TRIP_COLUMN)['timestamp'].transform('min'))
+    return trips.drop(columns=TRIP_COLUMN).sort_values(['id', 'timestamp'], ignore_index=True)
+
+
+class IncrementalSegmentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.fleet = fleet_frame(20, 200, seed=5, near_threshold_share=0.2)
+        self.input_path = os.path.join(self.folder.name, "fleet.csv")
+        self.output_path = os.path.join(self.folder.name, "trips.csv")
+        self.store_path = os.path.join(self.folder.name, "trips.trips")
+        self.coord_tools = CoordTools(self.fleet, 0.04)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def full_run(self):
+        full_path = os.path.join(self.folder.name, "full.csv")
+        write_fleet(self.fleet, full_path)
+        trips = segment_trips(load_data(full_path), TIME_THRESHOLD, 1, self.coord_tools)
+        trips['id'] = trips['id'].astype(str)
+        return trips
+
+    def incremental_runs(self, parts):
+        # the daily dumps are appended to the input file, in time order
+        dumps = np.array_split(np.arange(len(self.fleet)), parts)
+        trip_count = 0
+        for number, rows in enumerate(dumps):
+            write_fleet(self.fleet.iloc[rows], self.input_path, append=number > 0)
+            trip_count += segment_incremental([self.input_path], self.output_path, TIME_THRESHOLD, 1,
+                                              self.coord_tools, close_all=number == parts - 1,
+                                              store_path=self.store_path)
+        trips = pd.read_csv(self.output_path, parse_dates=['timestamp'])
+        trips['id'] = trips['id'].astype(str)
+        self.assertEqual(trips[TRIP_COLUMN].nunique(), trip_count)
+        return trips
+
+    def assert_same_trips(self, trips, expected):
+        pd.testing.assert_frame_equal(trips_by_start(trips)[expected.columns.drop(TRIP_COLUMN)],
+                                      trips_by_start(expected)[expected.columns.drop(TRIP_COLUMN)],
+                                      check_dtype=False, check_exact=False, rtol=1e-6)
+
+    def test_matches_full_run(self):
+        expected = self.full_run()
+        self.assert_same_trips(self.incremental_runs(3), expected)
+
+    def test_store_matches_output_file(self):
+        trips = self.incremental_runs(3)
+        store = TripStore(self.store_path)
+        self.assertEqual(len(store), trips[TRIP_COLUMN].nunique())
+        np.testing.assert_array_equal(store.metadata()['point_count'],
+                                      trips.groupby(TRIP_COLUMN, sort=True).size().to_numpy())
+
+    def test_run_without_new_data(self):
+        write_fleet(self.fleet, self.input_path)
+        segment_incremental([self.input_path], self.output_path, TIME_THRESHOLD, 1, close_all=True)
+        size = os.path.getsize(self.output_path)
+        self.assertEqual(segment_incremental([self.input_path], self.output_path, TIME_THRESHOLD, 1), 0)
+        self.assertEqual(os.path.getsize(self.output_path), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
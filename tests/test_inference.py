@@ -0,0 +1,50 @@
+"""
+Tests of the batched trip classification of the inference service.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.coordtools import CoordTools
+from src.inference import MicroBatcher, TripClassifier
+from src.resampling import Resampling
+
+
+def make_trip(trip_id, point_count=12, timestamps=True):
+    points = [{'lat': 49.85 + 0.001 * index, 'lon': 8.6 + 0.001 * index, 'heading': 45.0, 'speed': 30.0}
+              for index in range(point_count)]
+    if timestamps:
+        for index, point in enumerate(points):
+            point['timestamp'] = 1546300800 + 10 * index
+    return {'id': trip_id, 'points': points}
+
+
+class MicroBatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        coord_tools = CoordTools({'lat': [49.8, 49.9], 'lon': [8.55, 8.7]}, 0.1)
+        self.classifier = TripClassifier(lambda windows: np.full(len(windows), 0.25), coord_tools, window=5,
+                                         resampling=Resampling('time', 10))
+
+    def classify_batch(self, trips):
+        # the long latency makes sure that all trips end up in one batch
+        batcher = MicroBatcher(self.classifier.classify, max_batch_size=len(trips), max_latency=5.0)
+        return [batcher.submit(trip) for trip in trips]
+
+    def test_batch_results(self):
+        futures = self.classify_batch([make_trip(index) for index in range(3)])
+        results = [future.result(timeout=10) for future in futures]
+        self.assertEqual([result['id'] for result in results], [0, 1, 2])
+        self.assertTrue(all(result['probability'] == 0.25 for result in results))
+
+    def test_bad_trip_only_fails_its_own_request(self):
+        futures = self.classify_batch([make_trip(0), make_trip(1, timestamps=False), make_trip(2)])
+        self.assertEqual(futures[0].result(timeout=10)['id'], 0)
+        self.assertEqual(futures[2].result(timeout=10)['id'], 2)
+        with self.assertRaises(ValueError):
+            futures[1].result(timeout=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
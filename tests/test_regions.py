@@ -0,0 +1,81 @@
+"""
+Tests of the grid accelerated point-in-polygon test of the region classification.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.coordtools import CoordTools
+from src.regions import PolygonRegion
+
+
+def star(center_lon, center_lat, outer, inner, spikes=7):
+    angles = np.linspace(0, 2 * np.pi, 2 * spikes, endpoint=False)
+    radii = np.where(np.arange(2 * spikes) % 2 == 0, outer, inner)
+    ring = np.column_stack((center_lon + radii * np.cos(angles), center_lat + radii * np.sin(angles)))
+    return np.vstack((ring, ring[:1])).tolist()
+
+
+# a concave polygon with a hole and a second, separate polygon
+REGION = {'type': 'MultiPolygon', 'coordinates': [
+    [star(8.65, 49.87, 0.08, 0.03), star(8.65, 49.87, 0.02, 0.01)],
+    [star(8.85, 49.95, 0.03, 0.015, spikes=5)],
+]}
+
+
+def exact_contains(geojson, lat, lon):
+    """
+    Even-odd test of every point against all edges of all rings, without any grid.
+    """
+    inside = np.zeros(len(lat), dtype=bool)
+    for polygon in geojson['coordinates']:
+        for ring in polygon:
+            ring = np.asarray(ring)
+            lon0, lat0 = ring[:-1, 0], ring[:-1, 1]
+            lon1, lat1 = ring[1:, 0], ring[1:, 1]
+            crosses = (lat0 > lat[:, None]) != (lat1 > lat[:, None])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                crossing_lon = lon0 + (lat[:, None] - lat0) * (lon1 - lon0) / (lat1 - lat0)
+            inside ^= np.count_nonzero(crosses & (lon[:, None] < crossing_lon), axis=1) % 2 == 1
+    return inside
+
+
+class PolygonRegionTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.lat = rng.uniform(49.75, 50.0, 20000)
+        self.lon = rng.uniform(8.5, 8.9, 20000)
+
+    def test_matches_exact_test(self):
+        expected = exact_contains(REGION, self.lat, self.lon)
+        self.assertTrue(0 < expected.sum() < len(expected))
+        for grid_size in (1, 8, 128):
+            with self.subTest(grid_size=grid_size):
+                np.testing.assert_array_equal(PolygonRegion(REGION, grid_size).in_center(self.lat, self.lon),
+                                              expected)
+
+    def test_keeps_the_shape_of_the_input(self):
+        region = PolygonRegion(REGION)
+        inside = region.in_center(self.lat.reshape(100, 200), self.lon.reshape(100, 200))
+        self.assertEqual(inside.shape, (100, 200))
+        # between the hole and the polygon, in the hole and between two spikes
+        self.assertTrue(region.in_center(49.87, 8.65 + 0.025))
+        self.assertFalse(region.in_center(49.87, 8.65))
+        self.assertFalse(region.in_center(49.87 + 0.06, 8.65))
+
+    def test_box_classifies_like_center_box(self):
+        coord_tools = CoordTools({'lat': [49.8, 49.95], 'lon': [8.55, 8.75]}, 0.04)
+        box = [[coord_tools.wthresh, coord_tools.sthresh], [coord_tools.ethresh, coord_tools.sthresh],
+               [coord_tools.ethresh, coord_tools.nthresh], [coord_tools.wthresh, coord_tools.nthresh],
+               [coord_tools.wthresh, coord_tools.sthresh]]
+        region = PolygonRegion({'type': 'Polygon', 'coordinates': [box]})
+        start, end = slice(0, 10000), slice(10000, 20000)
+        np.testing.assert_array_equal(
+            region.classify(self.lat[start], self.lon[start], self.lat[end], self.lon[end]),
+            coord_tools.classify(self.lat[start], self.lon[start], self.lat[end], self.lon[end]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests of the resampling of trips to fixed time or distance steps.
+"""
+
+import unittest
+
+import numpy as np
+
+from src.coordtools import haversine
+from src.resampling import Resampling
+
+
+def trips(*columns_per_trip):
+    """
+    Concatenates trips given as dictionaries of columns and returns the columns and the trip starts.
+    """
+    lengths = [len(trip['lat']) for trip in columns_per_trip]
+    points = {column: np.concatenate([np.asarray(trip[column], dtype=np.float64) for trip in columns_per_trip])
+              for column in columns_per_trip[0]}
+    return points, np.cumsum(lengths) - lengths
+
+
+def straight_trip(seconds, start_lat=49.87):
+    seconds = np.asarray(seconds, dtype=np.float64)
+    # 0.0001 degrees latitude per second, heading north
+    return {'lat': start_lat + 0.0001 * seconds, 'lon': np.full(len(seconds), 8.65),
+            'heading': np.zeros(len(seconds)), 'speed': np.full(len(seconds), 40.0), 'timestamp': 1000 + seconds}
+
+
+class ResamplingTest(unittest.TestCase):
+
+    def test_time_step(self):
+        points, trip_starts = trips(straight_trip([0, 10, 25, 40, 60]), straight_trip([0]),
+                                    straight_trip([0, 5, 15], start_lat=49.9))
+        resampled, new_starts = Resampling('time', 10).apply(points, trip_starts)
+        np.testing.assert_array_equal(new_starts, [0, 7, 8])
+        np.testing.assert_array_equal(resampled['timestamp'],
+                                      1000 + np.array([0, 10, 20, 30, 40, 50, 60, 0, 0, 10]))
+        np.testing.assert_allclose(resampled['lat'][:7], 49.87 + 0.0001 * np.arange(0, 70, 10))
+        np.testing.assert_allclose(resampled['lat'][8:], 49.9 + 0.0001 * np.array([0, 10]))
+
+    def test_distance_step(self):
+        points, trip_starts = trips(straight_trip([0, 10, 20, 30, 40]), straight_trip([0, 30]))
+        resampled, new_starts = Resampling('distance', 50).apply(points, trip_starts)
+        lengths = np.diff(np.append(new_starts, len(resampled['lat'])))
+        expected_lengths = [int(haversine(49.87, 8.65, 49.87 + 0.0001 * span, 8.65) // 50) + 1 for span in (40, 30)]
+        np.testing.assert_array_equal(lengths, expected_lengths)
+        first = resampled['lat'][:lengths[0]]
+        np.testing.assert_allclose(haversine(first[:-1], 8.65, first[1:], 8.65), 50, rtol=1e-6)
+        np.testing.assert_allclose(resampled['lat'][new_starts], [49.87, 49.87])
+
+    def test_max_points_keeps_the_first_points(self):
+        points, trip_starts = trips(straight_trip(np.arange(0, 100, 10)), straight_trip([0, 10]))
+        full, _ = Resampling('time', 5).apply(points, trip_starts)
+        capped, new_starts = Resampling('time', 5, max_points=4).apply(points, trip_starts)
+        np.testing.assert_array_equal(new_starts, [0, 4])
+        np.testing.assert_array_equal(capped['timestamp'][:4], full['timestamp'][:4])
+        np.testing.assert_array_equal(capped['timestamp'][4:], full['timestamp'][19:23])
+
+    def test_heading_wraps_around(self):
+        trip = straight_trip([0, 10])
+        trip['heading'] = np.array([350.0, 10.0])
+        resampled, _ = Resampling('time', 5).apply(*trips(trip))
+        np.testing.assert_allclose(resampled['heading'] - np.array([350, 360, 10]), 0, atol=1e-9)
+
+    def test_time_mode_needs_timestamps(self):
+        trip = straight_trip([0, 10])
+        del trip['timestamp']
+        with self.assertRaises(ValueError):
+            Resampling('time', 5).apply(*trips(trip))
+        resampled, _ = Resampling('distance', 50).apply(*trips(trip))
+        self.assertNotIn('timestamp', resampled)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            Resampling('points', 5)
+        with self.assertRaises(ValueError):
+            Resampling('time', 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests of the vectorized trip segmentation against a per-row reference loop, and of the parallel
+segmentation against the single process one.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.cleaning import CleaningRules
+from src.coordtools import CoordTools
+from src.dataloader import load_data
+from src.instrumentation import RunReport
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN, segment_parallel, segment_trips, to_epoch_seconds
+from tests.helpers import add_dirt, fleet_frame, write_fleet
+
+TIME_THRESHOLD = 300
+
+
+def loop_segmentation(data: pd.DataFrame, time_threshold: float, min_data_points: int, coord_tools) -> pd.DataFrame:
+    """
+    Segments the trips row by row like the former extraction scripts did, without their two
+    bugs (dropped last points of a trip and gaps of whole days counted by Timedelta.seconds).
+    """
+    trips = []
+    trip_number = 0
+    for _, group in data.sort_values(['id', 'timestamp'], kind='stable').groupby('id', sort=True):
+        group = group.reset_index(drop=True)
+        trip_start = 0
+        for row in range(1, len(group) + 1):
+            if row == len(group) or \
+                    (group['timestamp'][row] - group['timestamp'][row - 1]).total_seconds() > time_threshold:
+                if row - trip_start > min_data_points:
+                    trip = group.iloc[trip_start:row].copy()
+                    trip[TRIP_COLUMN] = trip_number
+                    trip[TYPE_COLUMN] = coord_tools.to_typ(group.iloc[trip_start], group.iloc[row - 1])
+                    trips.append(trip)
+                    trip_number += 1
+                trip_start = row
+    return pd.concat(trips, ignore_index=True)
+
+
+class SegmentationTest(unittest.TestCase):
+
+    def setUp(self):
+        # a high share of gaps close to the threshold makes the boundary cases frequent
+        self.data = fleet_frame(15, 150, seed=3, near_threshold_share=0.2)
+        self.coord_tools = CoordTools(self.data, 0.04)
+
+    def assert_same_trips(self, trips, expected):
+        pd.testing.assert_frame_equal(trips.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False)
+
+    def test_matches_loop(self):
+        for min_data_points in (1, 5):
+            with self.subTest(min_data_points=min_data_points):
+                self.assert_same_trips(segment_trips(self.data, TIME_THRESHOLD, min_data_points, self.coord_tools),
+                                       loop_segmentation(self.data, TIME_THRESHOLD, min_data_points,
+                                                         self.coord_tools))
+
+    def test_input_order_does_not_matter(self):
+        shuffled = self.data.sample(frac=1, random_state=0)
+        self.assert_same_trips(segment_trips(shuffled, TIME_THRESHOLD, 1, self.coord_tools),
+                               segment_trips(self.data, TIME_THRESHOLD, 1, self.coord_tools))
+
+    def test_first_trip_number(self):
+        trips = segment_trips(self.data, TIME_THRESHOLD, 1, first_trip_number=10)
+        self.assertEqual(trips[TRIP_COLUMN].iloc[0], 10)
+        self.assertTrue(trips[TYPE_COLUMN].isna().all())
+
+    def test_gap_of_whole_days_splits_trips(self):
+        data = pd.DataFrame({'id': ['a'] * 6, 'lat': 49.87, 'lon': 8.65, 'heading': 0, 'speed': 10.0,
+                             'timestamp': pd.to_datetime(['2019-01-01 10:00:00', '2019-01-01 10:01:00',
+                                                          '2019-01-01 10:02:00', '2019-01-02 10:02:30',
+                                                          '2019-01-02 10:03:00', '2019-01-02 10:04:00'])})
+        trips = segment_trips(data, TIME_THRESHOLD, 1)
+        self.assertEqual(trips[TRIP_COLUMN].tolist(), [0, 0, 0, 1, 1, 1])
+
+
+class ParallelSegmentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.folder.name, "fleet.csv")
+        write_fleet(add_dirt(fleet_frame(30, 150, seed=4)), self.csv_path)
+        self.data = load_data(self.csv_path)
+        self.coord_tools = CoordTools(self.data, 0.04)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def segment(self, segmentation, cleaning):
+        # the removed rows are only recorded in an active run report
+        with RunReport("test", self.folder.name) as report:
+            trips = segmentation(cleaning)
+        return trips, report.counters.get('cleaning')
+
+    def test_matches_single_process(self):
+        for cleaning in (None, CleaningRules()):
+            expected, expected_counts = self.segment(
+                lambda rules: segment_trips(self.data, TIME_THRESHOLD, 1, self.coord_tools, cleaning=rules),
+                cleaning)
+            for workers in (2, 3):
+                with self.subTest(workers=workers, cleaning=cleaning is not None):
+                    trips, counts = self.segment(
+                        lambda rules: segment_parallel(self.csv_path, TIME_THRESHOLD, 1, workers, self.coord_tools,
+                                                       rules), cleaning)
+                    pd.testing.assert_frame_equal(trips, expected)
+                    self.assertEqual(counts, expected_counts)
+
+
+class ToEpochSecondsTest(unittest.TestCase):
+
+    def test_formats(self):
+        expected = np.array([1546336800, 1546336810])
+        for timestamps in (pd.Series(expected), pd.Series(pd.to_datetime(expected, unit='s')),
+                           pd.Series(['2019-01-01 10:00:00', '2019-01-01 10:00:10'])):
+            with self.subTest(dtype=timestamps.dtype):
+                np.testing.assert_array_equal(to_epoch_seconds(timestamps), expected)
+
+    def test_missing_timestamp_raises(self):
+        with self.assertRaises(ValueError):
+            to_epoch_seconds(pd.Series([1546336800, np.nan]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Tests of the trip simplification for the trip map.
+"""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.segmentation import TRIP_COLUMN
+from src.trip_rendering import douglas_peucker, simplify_trips
+
+
+def zigzag_trips(trip_count=5, point_count=50):
+    index = np.arange(point_count)
+    return pd.DataFrame({
+        'lat': np.concatenate([49.85 + 0.0001 * index + 0.00002 * (index % 2) for _ in range(trip_count)]),
+        'lon': np.concatenate([8.6 + 0.0001 * index + 0.001 * trip for trip in range(trip_count)]),
+        TRIP_COLUMN: np.repeat(np.arange(trip_count), point_count),
+    })
+
+
+class TripRenderingTest(unittest.TestCase):
+
+    def test_douglas_peucker_drops_points_on_a_line(self):
+        x = np.array([0.0, 1.0, 2.0, 3.0, 3.0, 3.0])
+        y = np.array([0.0, 0.0, 0.0, 0.0, 1.0, 2.0])
+        keep = douglas_peucker(x, y, np.array([0]), 0.1)
+        self.assertEqual(np.flatnonzero(keep).tolist(), [0, 3, 5])
+
+    def test_zero_tolerance_fits_the_budget(self):
+        trips = zigzag_trips()
+        self.assertEqual(len(simplify_trips(trips, 0.0)), len(trips))
+        simplified = simplify_trips(trips, 0.0, max_vertices=20)
+        self.assertLessEqual(len(simplified), 20)
+        self.assertEqual(simplified[TRIP_COLUMN].nunique(), 5)
+
+    def test_budget_below_the_minimum_keeps_start_and_end(self):
+        simplified = simplify_trips(zigzag_trips(), 0.0, max_vertices=1)
+        self.assertEqual(len(simplified), 10)
+
+    def test_negative_tolerance(self):
+        with self.assertRaises(ValueError):
+            simplify_trips(zigzag_trips(), -1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+Tests of the reproducible train, test and validation split by trip.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.trip_split import SPLITS, TripSplit
+
+SEED = 191285461
+
+
+class TripSplitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.index_path = os.path.join(self.folder.name, "trip_split.npz")
+        self.trip_numbers = np.arange(10000)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_assignment_is_deterministic(self):
+        codes = TripSplit(SEED).assign(self.trip_numbers)
+        np.testing.assert_array_equal(codes, TripSplit(SEED).assign(self.trip_numbers))
+        # the split of a trip does not depend on the other trips or their order
+        np.testing.assert_array_equal(codes[::-1], TripSplit(SEED).assign(self.trip_numbers[::-1]))
+        np.testing.assert_array_equal(codes[5000:], TripSplit(SEED).assign(self.trip_numbers[5000:]))
+        self.assertFalse(np.array_equal(codes, TripSplit(SEED + 1).assign(self.trip_numbers)))
+
+    def test_fractions(self):
+        codes = TripSplit(SEED, (0.6, 0.2, 0.2)).assign(self.trip_numbers)
+        shares = np.bincount(codes, minlength=len(SPLITS)) / len(codes)
+        np.testing.assert_allclose(shares, [0.6, 0.2, 0.2], atol=0.02)
+        self.assertFalse(np.any(TripSplit(SEED, (0.8, 0.2, 0)).assign(self.trip_numbers) == 2))
+
+    def test_index_file_is_reused_and_extended(self):
+        first = TripSplit.load_or_create(self.index_path, self.trip_numbers[:100], SEED)
+        codes = first.split_of(self.trip_numbers[:100])
+        extended = TripSplit.load_or_create(self.index_path, self.trip_numbers[:200], SEED)
+        np.testing.assert_array_equal(extended.split_of(self.trip_numbers[:100]), codes)
+        reloaded = TripSplit.load(self.index_path)
+        np.testing.assert_array_equal(reloaded.trip_numbers, self.trip_numbers[:200])
+        np.testing.assert_array_equal(reloaded.split_of(self.trip_numbers[:200]),
+                                      extended.split_of(self.trip_numbers[:200]))
+
+    def test_index_file_of_other_seed_is_replaced(self):
+        TripSplit.load_or_create(self.index_path, self.trip_numbers[:100], SEED)
+        other = TripSplit.load_or_create(self.index_path, self.trip_numbers[:100], SEED + 1)
+        self.assertEqual(TripSplit.load(self.index_path).seed, SEED + 1)
+        np.testing.assert_array_equal(other.split_of(self.trip_numbers[:100]),
+                                      TripSplit(SEED + 1).assign(self.trip_numbers[:100]))
+
+    def test_masks_partition_the_trips(self):
+        trip_split = TripSplit(SEED)
+        masks = np.array([trip_split.mask(self.trip_numbers, split) for split in SPLITS])
+        np.testing.assert_array_equal(masks.sum(axis=0), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
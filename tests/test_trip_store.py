@@ -0,0 +1,85 @@
+"""
+Tests of the binary trip store.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.coordtools import CoordTools
+from src.segmentation import TRIP_COLUMN, TYPE_COLUMN, segment_trips
+from src.trip_store import TripStore, truncate_trip_store, write_trip_store
+from src.windowing import store_features, trip_features
+from tests.helpers import fleet_frame
+
+
+class TripStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.folder.name, "trips.trips")
+        fleet = fleet_frame(seed=6)
+        self.coord_tools = CoordTools(fleet, 0.04)
+        self.trips = segment_trips(fleet, 300, 1, self.coord_tools)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_round_trip(self):
+        write_trip_store(self.trips, self.store_path)
+        frame = TripStore(self.store_path).to_frame()
+        expected = self.trips[frame.columns].astype({column: np.float32 for column in
+                                                      ['lat', 'lon', 'heading', 'speed']})
+        pd.testing.assert_frame_equal(frame, expected, check_dtype=False)
+
+    def test_random_access(self):
+        write_trip_store(self.trips, self.store_path)
+        store = TripStore(self.store_path)
+        trip_number = self.trips[TRIP_COLUMN].iloc[-1] // 2
+        expected = self.trips[self.trips[TRIP_COLUMN] == trip_number]
+        np.testing.assert_array_equal(store.trip(trip_number)['lat'], expected['lat'].to_numpy(dtype=np.float32))
+        with self.assertRaises(KeyError):
+            store.trip(len(store))
+
+    def test_trips_of_type(self):
+        write_trip_store(self.trips, self.store_path)
+        store = TripStore(self.store_path)
+        first_points = self.trips.drop_duplicates(TRIP_COLUMN)
+        for typ in ['innen', 'raus', 'rein', 'durch', None]:
+            expected = first_points[first_points[TYPE_COLUMN] == typ][TRIP_COLUMN] if typ is not None \
+                else first_points[first_points[TYPE_COLUMN].isna()][TRIP_COLUMN]
+            np.testing.assert_array_equal(store.trips_of_type(typ), expected.to_numpy())
+
+    def test_append_and_truncate(self):
+        half = self.trips[TRIP_COLUMN].nunique() // 2
+        write_trip_store(self.trips[self.trips[TRIP_COLUMN] < half], self.store_path)
+        write_trip_store(self.trips[self.trips[TRIP_COLUMN] >= half], self.store_path, append=True)
+        pd.testing.assert_frame_equal(TripStore(self.store_path).metadata(),
+                                      self.full_store().metadata())
+        with self.assertRaises(ValueError):
+            write_trip_store(self.trips[self.trips[TRIP_COLUMN] == 0], self.store_path, append=True)
+
+        truncate_trip_store(self.store_path, half)
+        store = TripStore(self.store_path)
+        self.assertEqual(len(store), half)
+        self.assertEqual(store.point_count, int((self.trips[TRIP_COLUMN] < half).sum()))
+        self.assertTrue(np.all(store.trips_of_type('durch') < half))
+
+    def test_features_match_the_csv_path(self):
+        write_trip_store(self.trips, self.store_path)
+        features, trip_starts = store_features(TripStore(self.store_path), self.coord_tools)
+        expected_features, expected_starts = trip_features(self.trips, self.coord_tools)
+        np.testing.assert_array_equal(features, expected_features)
+        np.testing.assert_array_equal(trip_starts, expected_starts)
+
+    def full_store(self):
+        store_path = os.path.join(self.folder.name, "full.trips")
+        write_trip_store(self.trips, store_path)
+        return TripStore(store_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
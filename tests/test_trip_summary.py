@@ -0,0 +1,86 @@
+"""
+Tests of the trip summary, in particular of appending the trips of incremental runs.
+"""
+
+import os
+import tempfile
+import unittest
+
+from src.segmentation import TRIP_COLUMN, segment_trips
+from src.trip_store import TripStore, truncate_trip_store, write_trip_store
+from src.trip_summary import get_summary_path, write_trip_summary
+from tests.helpers import fleet_frame
+
+
+class TripSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.trips = segment_trips(fleet_frame(seed=1), 300, 1)
+        self.trip_count = self.trips[TRIP_COLUMN].nunique()
+        self.csv_path = os.path.join(self.folder.name, "trips.csv")
+        self.store_path = os.path.join(self.folder.name, "trips.trips")
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def trips_before(self, trip_number):
+        return self.trips[self.trips[TRIP_COLUMN] < trip_number]
+
+    def trips_from(self, trip_number):
+        return self.trips[self.trips[TRIP_COLUMN] >= trip_number]
+
+    def read_summary(self, csv_path=None):
+        with open(get_summary_path(csv_path or self.csv_path), 'r') as file:
+            return file.read()
+
+    def full_summary(self):
+        csv_path = os.path.join(self.folder.name, "full.csv")
+        store_path = os.path.join(self.folder.name, "full.trips")
+        write_trip_store(self.trips, store_path)
+        write_trip_summary(TripStore(store_path), csv_path)
+        return self.read_summary(csv_path)
+
+    def test_append_only_new_trips(self):
+        half = self.trip_count // 2
+        write_trip_store(self.trips_before(half), self.store_path)
+        write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)
+        write_trip_store(self.trips_from(half), self.store_path, append=True)
+        appended = write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)
+        self.assertEqual(appended[TRIP_COLUMN].tolist(), list(range(half, self.trip_count)))
+        self.assertEqual(self.read_summary(), self.full_summary())
+
+    def test_nothing_new(self):
+        write_trip_store(self.trips, self.store_path)
+        write_trip_summary(TripStore(self.store_path), self.csv_path)
+        self.assertEqual(len(write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)), 0)
+        self.assertEqual(self.read_summary(), self.full_summary())
+
+    def test_partial_last_row_is_replaced(self):
+        half = self.trip_count // 2
+        write_trip_store(self.trips_before(half), self.store_path)
+        write_trip_summary(TripStore(self.store_path), self.csv_path)
+        with open(get_summary_path(self.csv_path), 'a') as file:
+            file.write(f"{half},car")
+        write_trip_store(self.trips_from(half), self.store_path, append=True)
+        write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)
+        self.assertEqual(self.read_summary(), self.full_summary())
+
+    def test_rebuild_after_truncated_store(self):
+        write_trip_store(self.trips, self.store_path)
+        write_trip_summary(TripStore(self.store_path), self.csv_path)
+        truncate_trip_store(self.store_path, 3)
+        rebuilt = write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)
+        self.assertEqual(rebuilt[TRIP_COLUMN].tolist(), [0, 1, 2])
+
+    def test_rebuild_after_rebuilt_store(self):
+        write_trip_store(self.trips, self.store_path)
+        write_trip_summary(TripStore(self.store_path), self.csv_path)
+        other_trips = segment_trips(fleet_frame(points_per_car=300, seed=2), 300, 1)
+        write_trip_store(other_trips, self.store_path)
+        rebuilt = write_trip_summary(TripStore(self.store_path), self.csv_path, append=True)
+        self.assertEqual(len(rebuilt), other_trips[TRIP_COLUMN].nunique())
+
+
+if __name__ == '__main__':
+    unittest.main()